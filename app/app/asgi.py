@@ -13,4 +13,15 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up by get_asgi_application.
+from django.conf import settings  # noqa: E402
+from server.events import events_application  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """Serve the change event stream, and Django for everything else."""
+    if scope['type'] == 'http' and scope['path'] == settings.EVENTS_PATH:
+        return await events_application(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -54,6 +54,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.probe_middleware",
+    "core.middleware.request_metrics_middleware",
+    "core.middleware.query_inspector_middleware",
+    "core.middleware.replica_routing_middleware",
+    "core.middleware.rate_limit_headers_middleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -83,6 +88,8 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "app.wsgi.application"
 
+TEST_RUNNER = "core.testing.TestRunner"
+
 
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
@@ -94,9 +101,34 @@ DATABASES = {
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        # Persistent connections, opened by each worker after fork.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        # Fail fast when the database is unreachable.
+        'OPTIONS': {
+            'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 3)),
+        },
     }
 }
 
+# Read replicas, as comma separated host[:port] entries. They share the
+# primary's name and credentials; tests mirror them to the primary.
+REPLICA_DATABASES = []
+for index, replica in enumerate(
+    filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')),
+    start=1,
+):
+    host, _, port = replica.strip().partition(':')
+    alias = f'replica_{index}'
+    DATABASES[alias] = dict(
+        DATABASES['default'],
+        HOST=host,
+        PORT=port,
+        TEST={'MIRROR': 'default'},
+    )
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -136,6 +168,12 @@ MEDIA_URL = '/static/media/'
 
 MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
+# ManifestStaticFilesStorage adds a content hash to the collected names,
+# which the proxy serves as immutable.
+STATICFILES_STORAGE = os.environ.get(
+    'STATICFILES_STORAGE',
+    'django.contrib.staticfiles.storage.StaticFilesStorage',
+)
 
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
@@ -144,8 +182,211 @@ AUTH_USER_MODEL = "core.User"
 
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.instrumentation.TimedJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_THROTTLE_CLASSES": [
+        "core.throttles.RequestBudgetThrottle",
+    ],
+    "DEFAULT_THROTTLE_RATES": {
+        "login_ip": os.environ.get("LOGIN_RATE_IP", "30/min"),
+        "login_email": os.environ.get("LOGIN_RATE_EMAIL", "10/min"),
+        # Token buckets of core.throttles: "<requests>/<period>[:<burst>]".
+        "read": os.environ.get("RATE_READ", "600/min:100"),
+        "write": os.environ.get("RATE_WRITE", "120/min:30"),
+        "upload_image": os.environ.get("RATE_UPLOAD_IMAGE", "10/min:5"),
+    },
 }
 
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
 }
+
+# Fraction of requests recorded by core.middleware.request_metrics_middleware.
+METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', 1))
+# Directory shared by the workers where each writes its metrics, at most
+# every METRICS_FLUSH_SECONDS, for /metrics to add up (core.metrics);
+# empty serves the answering process's metrics only.
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', 5))
+# Readers of /metrics besides staff users: comma separated addresses or
+# networks scraping the app directly (loopback and private networks, as
+# the scraper shares the deployment's network), and a bearer token for
+# scrapers elsewhere. The proxy does not serve /metrics; uwsgi serves it
+# over HTTP on UWSGI_HTTP_SOCKET (run.sh).
+METRICS_ALLOWED_IPS = [
+    network.strip() for network in os.environ.get(
+        'METRICS_ALLOWED_IPS',
+        '127.0.0.1,::1,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16,fc00::/7',
+    ).split(',') if network.strip()
+]
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Development and test mode of core.middleware.query_inspector_middleware.
+QUERY_INSPECTOR_ENABLED = bool(
+    int(os.environ.get('QUERY_INSPECTOR', int(DEBUG)))
+)
+QUERY_INSPECTOR_RAISE = bool(int(os.environ.get('QUERY_INSPECTOR_RAISE', 0)))
+QUERY_INSPECTOR_N_PLUS_ONE = int(os.environ.get('QUERY_INSPECTOR_N_PLUS_ONE', 5))
+QUERY_INSPECTOR_SLOW_MS = int(os.environ.get('QUERY_INSPECTOR_SLOW_MS', 100))
+
+# Route I/O-bound endpoints to server.async_views (ASGI deployments), and
+# the largest streamed body (CSV export) they build in memory.
+ASYNC_VIEWS = bool(int(os.environ.get('ASYNC_VIEWS', 0)))
+ASYNC_BUFFER_MAX_BYTES = int(
+    os.environ.get('ASYNC_BUFFER_MAX_BYTES', 20 * 1024 * 1024)
+)
+
+# Local per-process caches unless noted; "throttle" backs the login rate
+# limits.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'throttle': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'throttle',
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+    # Shared by all processes, as retries may reach another worker; the
+    # table is made by createcachetable (prestart).
+    'idempotency': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'idempotency_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': int(
+                os.environ.get('IDEMPOTENCY_MAX_ENTRIES', 10000)
+            ),
+        },
+    },
+    # Clients that just wrote, read by every process routing to replicas.
+    'sticky': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'replica_sticky_cache',
+    },
+}
+
+# Password hashing policy: PASSWORD_HASHER picks the hasher for new
+# passwords, the others still verify older hashes and are rehashed on login.
+_PASSWORD_HASHERS = {
+    'argon2': 'core.hashers.Argon2PasswordHasher',
+    'bcrypt': 'core.hashers.BCryptSHA256PasswordHasher',
+    'pbkdf2': 'core.hashers.PBKDF2PasswordHasher',
+}
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'argon2')
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    path for name, path in _PASSWORD_HASHERS.items()
+    if name != PASSWORD_HASHER
+]
+PASSWORD_ARGON2_TIME_COST = int(os.environ.get('PASSWORD_ARGON2_TIME_COST', 2))
+PASSWORD_ARGON2_MEMORY_KIB = int(
+    os.environ.get('PASSWORD_ARGON2_MEMORY_KIB', 19456)
+)
+PASSWORD_ARGON2_PARALLELISM = int(
+    os.environ.get('PASSWORD_ARGON2_PARALLELISM', 1)
+)
+PASSWORD_BCRYPT_ROUNDS = int(os.environ.get('PASSWORD_BCRYPT_ROUNDS', 12))
+PASSWORD_PBKDF2_ITERATIONS = int(
+    os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 260000)
+)
+
+# Concurrent password hashes per process, and seconds a login waits for one.
+PASSWORD_HASH_CONCURRENCY = int(os.environ.get('PASSWORD_HASH_CONCURRENCY', 1))
+PASSWORD_HASH_WAIT = float(os.environ.get('PASSWORD_HASH_WAIT', 2))
+
+# Lifetime of signed auth tokens (user.tokens), in seconds.
+TOKEN_TTL = int(os.environ.get('TOKEN_TTL', 24 * 60 * 60))
+# Seconds between refreshes of the in-memory token revocation list.
+TOKEN_REVOCATION_REFRESH = int(os.environ.get('TOKEN_REVOCATION_REFRESH', 5))
+# Seconds a token's user is kept in memory, sparing the user query; a
+# deactivated user is refused by other processes after at most this long.
+TOKEN_USER_CACHE_TTL = int(os.environ.get('TOKEN_USER_CACHE_TTL', 5))
+# Accept stored rest_framework.authtoken keys issued before signed tokens.
+TOKEN_ALLOW_LEGACY = bool(int(os.environ.get('TOKEN_ALLOW_LEGACY', 1)))
+
+# Bulk provisioning (user.provisioning): users per API request, users
+# with a password per API request, and worker processes hashing passwords
+# for the API. Hashing runs in the request, so keep the passwords well
+# within the uwsgi harakiri budget; larger password imports go through
+# the provision_users command, and API users are sent invites instead.
+PROVISION_MAX_USERS = int(os.environ.get('PROVISION_MAX_USERS', 5000))
+PROVISION_MAX_PASSWORDS = int(os.environ.get('PROVISION_MAX_PASSWORDS', 20))
+PROVISION_HASH_WORKERS = int(os.environ.get('PROVISION_HASH_WORKERS', 1))
+
+# Readiness probe (core.health): query run against the database, seconds
+# it may take, and seconds a probe result is reused.
+READINESS_DB_QUERY = os.environ.get('READINESS_DB_QUERY', 'SELECT 1')
+READINESS_DB_TIMEOUT = float(os.environ.get('READINESS_DB_TIMEOUT', 2))
+READINESS_CACHE_SECONDS = float(os.environ.get('READINESS_CACHE_SECONDS', 2))
+
+# Seconds a client's reads stay on the primary after it wrote, and the
+# cache alias remembering it; it must be shared by all processes (not
+# locmem), as the next read may reach another worker.
+REPLICA_STICKY_SECONDS = float(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+REPLICA_STICKY_CACHE = os.environ.get('REPLICA_STICKY_CACHE', 'sticky')
+
+# Upper bounds of the price buckets in the server statistics.
+SERVER_PRICE_BUCKETS = [
+    int(bound) for bound in
+    os.environ.get('SERVER_PRICE_BUCKETS', '10,50,100,500').split(',')
+]
+
+# Admin changelists estimated above this many rows are not counted exactly.
+ADMIN_EXACT_COUNT_LIMIT = int(os.environ.get('ADMIN_EXACT_COUNT_LIMIT', 10000))
+
+# Most servers one batch retrieve (GET servers/batch/) may ask for.
+SERVER_BATCH_MAX_IDS = int(os.environ.get('SERVER_BATCH_MAX_IDS', 100))
+
+# Change feed (server.changes): seconds changes and tombstones are kept,
+# seconds a change waits before it is served, and changes per page.
+CHANGE_RETENTION = int(os.environ.get('CHANGE_RETENTION', 30 * 24 * 60 * 60))
+CHANGE_FEED_SETTLE = int(os.environ.get('CHANGE_FEED_SETTLE', 2))
+CHANGE_FEED_PAGE_SIZE = int(os.environ.get('CHANGE_FEED_PAGE_SIZE', 500))
+
+# Change event stream (server.events, single ASGI worker only): path
+# served (empty turns the stream off), events queued per stream before it
+# is reset, streams per process, seconds between keepalive comments, and
+# seconds a stream ticket is valid.
+EVENTS_PATH = os.environ.get('EVENTS_PATH', '/api/server/events/')
+EVENTS_QUEUE_SIZE = int(os.environ.get('EVENTS_QUEUE_SIZE', 100))
+EVENTS_MAX_SUBSCRIBERS = int(os.environ.get('EVENTS_MAX_SUBSCRIBERS', 1000))
+EVENTS_HEARTBEAT = float(os.environ.get('EVENTS_HEARTBEAT', 15))
+EVENTS_TICKET_TTL = int(os.environ.get('EVENTS_TICKET_TTL', 30))
+
+# Background purge of deleted users, tags and components (purge_deleted):
+# rows deleted per transaction, seconds between batches, and seconds
+# between polls when no deletion is queued.
+PURGE_BATCH_SIZE = int(os.environ.get('PURGE_BATCH_SIZE', 500))
+PURGE_BATCH_PAUSE = float(os.environ.get('PURGE_BATCH_PAUSE', 0.1))
+PURGE_IDLE_SECONDS = float(os.environ.get('PURGE_IDLE_SECONDS', 5))
+
+# Where the request budget buckets live: "local" for each process, or a
+# cache alias shared by all processes.
+THROTTLE_STORE = os.environ.get('THROTTLE_STORE', 'local')
+
+# Idempotency keys (core.idempotency): cache alias of the kept responses,
+# which must be shared by all processes, seconds they are kept, seconds a
+# retry waits for the request still running, and seconds before an
+# abandoned in-flight claim expires.
+IDEMPOTENCY_CACHE = os.environ.get('IDEMPOTENCY_CACHE', 'idempotency')
+IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL', 24 * 60 * 60))
+IDEMPOTENCY_WAIT = float(os.environ.get('IDEMPOTENCY_WAIT', 10))
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.environ.get('IDEMPOTENCY_LOCK_TIMEOUT', 60))
+
+# Single-flight coalescing of identical reads (core.coalescing): whether
+# it is on, a cache alias shared by all processes to coalesce across them
+# (empty for this process only), seconds a read waits for another
+# process, and seconds a result stays shared in that cache.
+COALESCE_READS = bool(int(os.environ.get('COALESCE_READS', 1)))
+COALESCE_CACHE = os.environ.get('COALESCE_CACHE', '')
+COALESCE_WAIT = float(os.environ.get('COALESCE_WAIT', 5))
+COALESCE_SHARED_TTL = int(os.environ.get('COALESCE_SHARED_TTL', 1))
+
+# Server images are served by the proxy from this internal location, named
+# in X-Accel-Redirect, once the API checked the owner. Without the proxy
+# (MEDIA_ACCEL_REDIRECT=0, the default with DEBUG) Django sends the file.
+MEDIA_ACCEL_REDIRECT = bool(
+    int(os.environ.get('MEDIA_ACCEL_REDIRECT', int(not DEBUG)))
+)
+MEDIA_ACCEL_PREFIX = os.environ.get('MEDIA_ACCEL_PREFIX', '/protected/media/')
@@ -14,3 +14,17 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_wsgi_application()
+
+try:
+    # Only importable inside uwsgi, which loads the app once in the master
+    # and forks the workers from it.
+    from uwsgidecorators import postfork
+except ImportError:
+    pass
+else:
+    from django.db import connections
+
+    @postfork
+    def close_inherited_connections():
+        """Give every worker its own database connections."""
+        connections.close_all()
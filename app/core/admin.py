@@ -1,18 +1,54 @@
 """
 Django admin customization.
 """
+import json
+
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 
 from core import models
 
 
+class EstimatedCountPaginator(Paginator):
+    """Paginator using the planner's row estimate for large results.
+
+    On PostgreSQL the count comes from EXPLAIN; results estimated below
+    ADMIN_EXACT_COUNT_LIMIT rows, and other databases, are counted exactly.
+    """
+
+    def estimate(self):
+        """Return the planner's estimate of the rows, or None."""
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql":
+            return None
+        sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    @cached_property
+    def count(self):
+        estimate = self.estimate()
+        if estimate is None or estimate < settings.ADMIN_EXACT_COUNT_LIMIT:
+            return super().count
+        return estimate
+
+
 class UserAdmin(BaseUserAdmin):
     """Define the admin pages for users."""
 
     ordering = ["id"]
     list_display = ["email", "name"]
+    search_fields = ["email__startswith"]
     fieldsets = (
         (None, {"fields": ("email", "password")}),
         (_("Personal Info"), {"fields": ("name",)}),
@@ -48,7 +84,36 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
+class LargeTableAdmin(admin.ModelAdmin):
+    """Base admin for tables too large to count or list in a select.
+
+    Searches use prefix lookups the column indexes can serve.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_select_related = ["user"]
+    autocomplete_fields = ["user"]
+
+
+class ServerAdmin(LargeTableAdmin):
+    """Define the admin pages for servers."""
+
+    ordering = ["-id"]
+    list_display = ["title", "user", "price"]
+    search_fields = ["title__startswith"]
+    autocomplete_fields = ["user", "tags", "components"]
+
+
+class ServerAttrAdmin(LargeTableAdmin):
+    """Define the admin pages for tags and components."""
+
+    ordering = ["name"]
+    list_display = ["name", "user"]
+    search_fields = ["name__startswith"]
+
+
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.Server)
-admin.site.register(models.Tag)
-admin.site.register(models.Component)
+admin.site.register(models.Server, ServerAdmin)
+admin.site.register(models.Tag, ServerAttrAdmin)
+admin.site.register(models.Component, ServerAttrAdmin)
@@ -0,0 +1,417 @@
+"""
+Data seeding, load generation and reporting for API benchmarks.
+"""
+import http.client
+import io
+import json
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from urllib import (
+    error as urlerror,
+    parse as urlparse,
+    request as urlrequest,
+)
+from wsgiref.util import setup_testing_defaults
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from core.models import (
+    Server,
+    Tag,
+    Component,
+)
+from server.stats import reconcile as reconcile_stats
+
+
+BENCH_EMAIL = 'bench-user-{}@example.com'
+BENCH_PASSWORD = 'bench-pass-123'
+SERVERS_URL = '/api/server/servers/'
+
+
+def percentile(values, pct):
+    """Return the pct percentile of values with linear interpolation."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def seed_data(users, servers, tags, components, seed=0):
+    """Create a deterministic benchmark data set and return its size.
+
+    Existing benchmark users and everything they own are replaced, so
+    running the seeder twice with the same arguments gives the same data.
+    """
+    rng = random.Random(seed)
+    user_model = get_user_model()
+    password = make_password(BENCH_PASSWORD)
+    with transaction.atomic():
+        user_model.objects.filter(
+            email__startswith='bench-user-',
+            email__endswith='@example.com',
+        ).delete()
+        user_model.objects.bulk_create(
+            user_model(
+                email=BENCH_EMAIL.format(index),
+                name=f'Bench User {index}',
+                password=password,
+            )
+            for index in range(users)
+        )
+        user_objs = user_model.objects.filter(
+            email__in=[BENCH_EMAIL.format(index) for index in range(users)],
+        ).order_by('id')
+        tag_through = Server.tags.through
+        component_through = Server.components.through
+        for user in user_objs:
+            Tag.objects.bulk_create(
+                Tag(user=user, name=f'tag-{index}') for index in range(tags)
+            )
+            Component.objects.bulk_create(
+                Component(user=user, name=f'component-{index}')
+                for index in range(components)
+            )
+            Server.objects.bulk_create(
+                Server(
+                    user=user,
+                    title=f'Server {index}',
+                    description=f'Benchmark server {index}',
+                    price=Decimal(rng.randint(100, 500000)) / 100,
+                    link=f'https://example.com/{index}',
+                )
+                for index in range(servers)
+            )
+            # Read the rows back so ids are known on every database backend.
+            tag_objs = list(Tag.objects.filter(user=user).order_by('id'))
+            component_objs = list(
+                Component.objects.filter(user=user).order_by('id')
+            )
+            server_objs = Server.objects.filter(user=user).order_by('id')
+            tag_links = []
+            component_links = []
+            for server in server_objs:
+                for tag in rng.sample(tag_objs, min(3, len(tag_objs))):
+                    tag_links.append(
+                        tag_through(server_id=server.id, tag_id=tag.id)
+                    )
+                for component in rng.sample(
+                    component_objs,
+                    min(3, len(component_objs)),
+                ):
+                    component_links.append(
+                        component_through(
+                            server_id=server.id,
+                            component_id=component.id,
+                        )
+                    )
+            tag_through.objects.bulk_create(tag_links)
+            component_through.objects.bulk_create(component_links)
+        # bulk_create skips the signals maintaining the statistics.
+        reconcile_stats(list(user_objs))
+
+    return {
+        'users': users,
+        'servers': users * servers,
+        'tags': users * tags,
+        'components': users * components,
+    }
+
+
+def _multipart(field, filename, content):
+    """Encode a single file field as multipart/form-data."""
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\n'
+        f'Content-Disposition: form-data; name="{field}"; '
+        f'filename="{filename}"\r\n'
+        'Content-Type: application/octet-stream\r\n\r\n'
+    ).encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def _sample_image():
+    """Return the bytes of a small JPEG image."""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64)).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+class Scenarios:
+    """Request factories for the benchmarked endpoints.
+
+    Each factory takes a seeded ``random.Random`` and returns
+    ``(method, path, body, content_type)``.
+    """
+
+    NAMES = ['list', 'filter', 'create', 'update', 'upload']
+
+    def __init__(self, server_ids, tag_ids):
+        self.server_ids = list(server_ids)
+        self.tag_ids = list(tag_ids)
+        self._image = None
+
+    def list(self, rng):
+        """List servers."""
+        return 'GET', SERVERS_URL, b'', None
+
+    def filter(self, rng):
+        """List servers filtered by two tags."""
+        tag_ids = rng.sample(self.tag_ids, min(2, len(self.tag_ids)))
+        query = ','.join(str(tag_id) for tag_id in tag_ids)
+        return 'GET', f'{SERVERS_URL}?tags={query}', b'', None
+
+    def create(self, rng):
+        """Create a server with a tag."""
+        body = json.dumps({
+            'title': f'Bench server {rng.randint(0, 10 ** 6)}',
+            'price': '9.99',
+            'tags': [{'name': f'tag-{rng.randint(0, 9)}'}],
+        }).encode()
+        return 'POST', SERVERS_URL, body, 'application/json'
+
+    def update(self, rng):
+        """Rename a server."""
+        server_id = rng.choice(self.server_ids)
+        body = json.dumps({'title': f'Updated {rng.randint(0, 10 ** 6)}'})
+        return (
+            'PATCH',
+            f'{SERVERS_URL}{server_id}/',
+            body.encode(),
+            'application/json',
+        )
+
+    def upload(self, rng):
+        """Upload an image to a server."""
+        if self._image is None:
+            self._image = _sample_image()
+        server_id = rng.choice(self.server_ids)
+        body, content_type = _multipart('image', 'bench.jpg', self._image)
+        return (
+            'POST',
+            f'{SERVERS_URL}{server_id}/upload-image/',
+            body,
+            content_type,
+        )
+
+
+class WSGITransport:
+    """Send requests to a WSGI application in this process."""
+
+    def __init__(self, application, token, host='localhost'):
+        self.application = application
+        self.token = token
+        self.host = host
+
+    def send(self, method, path, body=b'', content_type=None):
+        """Run the request and return the response status code."""
+        path, _, query = path.partition('?')
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'HTTP_HOST': self.host,
+            'HTTP_AUTHORIZATION': f'Token {self.token}',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': io.BytesIO(body),
+        }
+        if content_type:
+            environ['CONTENT_TYPE'] = content_type
+        setup_testing_defaults(environ)
+        status = []
+
+        def start_response(status_line, headers, exc_info=None):
+            status.append(int(status_line.split(' ', 1)[0]))
+
+        result = self.application(environ, start_response)
+        try:
+            for _ in result:
+                pass
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return status[0]
+
+
+class HTTPTransport:
+    """Send requests over HTTP, for example to uwsgi or the proxy."""
+
+    def __init__(self, base_url, token, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.token = token
+        self.timeout = timeout
+
+    def send(self, method, path, body=b'', content_type=None):
+        """Run the request and return the response status code."""
+        req = urlrequest.Request(
+            self.base_url + path,
+            data=body or None,
+            method=method,
+        )
+        req.add_header('Authorization', f'Token {self.token}')
+        if content_type:
+            req.add_header('Content-Type', content_type)
+        try:
+            with urlrequest.urlopen(req, timeout=self.timeout) as res:
+                res.read()
+                return res.status
+        except urlerror.HTTPError as exc:
+            return exc.code
+
+
+def run_scenario(transport, factory, requests, concurrency, seed=0):
+    """Send requests built by factory and summarise the latencies."""
+
+    def one(index):
+        rng = random.Random(seed * 1000003 + index)
+        method, path, body, content_type = factory(rng)
+        start = time.perf_counter()
+        try:
+            status = transport.send(method, path, body, content_type)
+        except OSError:
+            status = 599
+        return time.perf_counter() - start, status
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - start
+
+    latencies = [elapsed * 1000 for elapsed, _ in results]
+    return {
+        'requests': requests,
+        'errors': sum(1 for _, status in results if status >= 400),
+        'rps': requests / wall if wall else 0.0,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+    }
+
+
+def slow_request(base_url, token, request, duration, chunks=20):
+    """Send a request whose body trickles in over duration seconds.
+
+    Returns the response status, or 599 when the connection failed.
+    """
+    method, path, body, content_type = request
+    url = urlparse.urlsplit(base_url)
+    connection = http.client.HTTPConnection(
+        url.hostname,
+        url.port,
+        timeout=duration + 60,
+    )
+    try:
+        connection.putrequest(method, path)
+        connection.putheader('Authorization', f'Token {token}')
+        connection.putheader('Content-Type', content_type)
+        connection.putheader('Content-Length', str(len(body)))
+        connection.endheaders()
+        step = max(1, len(body) // chunks)
+        for offset in range(0, len(body), step):
+            connection.send(body[offset:offset + step])
+            time.sleep(duration / chunks)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    except OSError:
+        return 599
+    finally:
+        connection.close()
+
+
+def run_concurrency(base_url, token, scenarios, clients, duration):
+    """Measure list latency while slow clients upload images.
+
+    Starts ``clients`` uploads that each take ``duration`` seconds to send
+    their body, and probes the list endpoint until they have finished. A
+    server that holds a worker per slow client shows rising probe latency
+    and errors once ``clients`` exceeds its worker count.
+    """
+    transport = HTTPTransport(base_url, token, timeout=duration + 60)
+    statuses = []
+
+    def upload(index):
+        request = scenarios.upload(random.Random(index))
+        statuses.append(slow_request(base_url, token, request, duration))
+
+    threads = [
+        threading.Thread(target=upload, args=(index,))
+        for index in range(clients)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+
+    probes = []
+    probe_errors = 0
+    while any(thread.is_alive() for thread in threads):
+        probe_start = time.perf_counter()
+        try:
+            status = transport.send(*scenarios.list(None))
+        except OSError:
+            status = 599
+        probes.append((time.perf_counter() - probe_start) * 1000)
+        probe_errors += status >= 400
+    for thread in threads:
+        thread.join()
+
+    return {
+        'clients': clients,
+        'uploads_ok': sum(1 for status in statuses if status < 400),
+        'elapsed': time.perf_counter() - start,
+        'probes': len(probes),
+        'probe_errors': probe_errors,
+        'probe_p50': percentile(probes, 50),
+        'probe_p95': percentile(probes, 95),
+    }
+
+
+def save_baseline(path, results):
+    """Write benchmark results to a JSON baseline file."""
+    with open(path, 'w') as baseline_file:
+        json.dump(results, baseline_file, indent=2, sort_keys=True)
+
+
+def load_baseline(path):
+    """Read benchmark results from a JSON baseline file."""
+    with open(path) as baseline_file:
+        return json.load(baseline_file)
+
+
+def compare(results, baseline, tolerance):
+    """Return descriptions of scenarios slower than the baseline.
+
+    A scenario with failed requests is a regression too: throttled or
+    failing requests would otherwise pass as fast ones.
+    """
+    regressions = []
+    for name, result in results.items():
+        if result['errors']:
+            regressions.append(
+                f"{name}: {result['errors']} of {result['requests']} "
+                f"requests failed"
+            )
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['p95'] > base['p95'] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {result['p95']:.1f} ms > "
+                f"baseline {base['p95']:.1f} ms"
+            )
+        if result['rps'] < base['rps'] * (1 - tolerance):
+            regressions.append(
+                f"{name}: {result['rps']:.1f} req/s < "
+                f"baseline {base['rps']:.1f} req/s"
+            )
+    return regressions
@@ -0,0 +1,134 @@
+"""
+Single-flight coalescing of identical concurrent reads.
+
+While a read runs, identical reads arriving in the same process wait for
+it and answer with its result instead of running the query again. The
+key is the view, action, user and query string, so only requests that
+would return the same data share it.
+
+With COALESCE_CACHE set to a cache alias shared by all processes (not
+locmem), the first process to start a read also publishes its result
+there for COALESCE_SHARED_TTL seconds, and other processes wait for it
+rather than running the read too. A reader may see the result of a read
+that started just before its own, which is the price of sharing.
+Coalesced requests are counted in ``api_coalesced_requests_total``.
+"""
+import functools
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from rest_framework.response import Response
+
+from core import metrics
+
+
+class _Call:
+    """A computation in flight and its outcome."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run a function once for concurrent callers of the same key."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        """Return (result, shared); shared is True when another call ran."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self):
+        """Return the number of computations running."""
+        with self._lock:
+            return len(self._calls)
+
+
+FLIGHTS = SingleFlight()
+
+
+def request_key(view_name, request):
+    """Return the key shared by identical reads of a view action."""
+    query = sorted(request.query_params.lists())
+    digest = hashlib.sha256(repr(query).encode()).hexdigest()[:40]
+    user = request.user.pk if request.user.is_authenticated else "anon"
+    return f"coalesce:{view_name}:{user}:{digest}"
+
+
+def _shared(key, compute):
+    """Return (payload, shared), sharing payload across processes."""
+    cache = caches[settings.COALESCE_CACHE]
+    lock_key = f"{key}:lock"
+    deadline = time.monotonic() + settings.COALESCE_WAIT
+    while not cache.add(lock_key, 1, settings.COALESCE_WAIT):
+        payload = cache.get(key)
+        if payload is not None:
+            return payload, True
+        if time.monotonic() >= deadline:
+            return compute(), False
+        time.sleep(0.01)
+    try:
+        payload = compute()
+        if payload["status"] == 200:
+            cache.set(key, payload, settings.COALESCE_SHARED_TTL)
+    finally:
+        cache.delete(lock_key)
+    return payload, False
+
+
+def coalesced(view_method):
+    """Share the response of a read view method with identical reads."""
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        if not settings.COALESCE_READS:
+            return view_method(self, request, *args, **kwargs)
+
+        def compute():
+            response = view_method(self, request, *args, **kwargs)
+            return {"status": response.status_code, "data": response.data}
+
+        def run():
+            if settings.COALESCE_CACHE:
+                return _shared(key, compute)
+            return compute(), False
+
+        view = f"{self.__class__.__name__}.{self.action}"
+        key = request_key(view, request)
+        (payload, shared_by_process), shared = FLIGHTS.do(key, run)
+        if shared:
+            metrics.COALESCED_REQUESTS.inc(view=view, source="worker")
+        elif shared_by_process:
+            metrics.COALESCED_REQUESTS.inc(view=view, source="cache")
+        return Response(payload["data"], status=payload["status"])
+
+    return wrapper
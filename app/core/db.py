@@ -0,0 +1,38 @@
+"""
+Database query observers scoped to the running request.
+
+Every connection gets one permanent execute wrapper that forwards queries
+to the observers of the current context. Context variables follow the
+request through ``sync_to_async`` threads, so observers see the queries of
+a request under both WSGI and ASGI.
+"""
+import contextvars
+import functools
+from contextlib import contextmanager
+
+
+_observers = contextvars.ContextVar('db_observers', default=())
+
+
+def dispatch(execute, sql, params, many, context):
+    """Execute wrapper passing the query through the current observers."""
+    observers = _observers.get()
+    for observer in reversed(observers):
+        execute = functools.partial(observer, execute)
+    return execute(sql, params, many, context)
+
+
+def install(sender, connection, **kwargs):
+    """Add the dispatcher to a new connection (connection_created)."""
+    if dispatch not in connection.execute_wrappers:
+        connection.execute_wrappers.append(dispatch)
+
+
+@contextmanager
+def observe_queries(observer):
+    """Send the queries run in this context through an execute wrapper."""
+    token = _observers.set(_observers.get() + (observer,))
+    try:
+        yield observer
+    finally:
+        _observers.reset(token)
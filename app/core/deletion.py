@@ -0,0 +1,136 @@
+"""
+Deletes of users, tags and components, purged in the background.
+
+A delete marks the row right away (``deleted_at``; users are deactivated
+too) and queues a DeletionJob. ``purge_deleted`` works through the jobs,
+removing the dependents in batches of PURGE_BATCH_SIZE rows, one short
+transaction each, so no request waits for the cascade and no transaction
+holds locks on thousands of rows. Marked tags and components are hidden
+by their default manager until the purge removes them.
+
+A tag or component purge deletes through the models, so the stats and
+change feed handlers see it like any other delete. A user purge drops
+the user's stats and changes first and deletes the rest without
+signals: nobody reads them any more, and the handlers would cost a few
+queries and row locks per server.
+
+The user is deactivated, so the DeletionJob of a user delete can only be
+followed through the 202 response of the delete and by admins.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import (
+    Change,
+    Component,
+    DeletionJob,
+    Server,
+    ServerStat,
+    Tag,
+)
+from server import changes
+
+
+def mark_deleted(instance):
+    """Mark a user, tag or component deleted and queue its purge."""
+    user_model = get_user_model()
+    instance.deleted_at = timezone.now()
+    fields = ["deleted_at"]
+    if isinstance(instance, user_model):
+        kind, user_id = DeletionJob.USER, instance.pk
+        instance.is_active = False
+        fields.append("is_active")
+    else:
+        kind = DeletionJob.TAG if isinstance(instance, Tag) else (
+            DeletionJob.COMPONENT
+        )
+        user_id = instance.user_id
+    with transaction.atomic():
+        instance.save(update_fields=fields)
+        return DeletionJob.objects.create(
+            user_id=user_id, kind=kind, object_id=instance.pk,
+        )
+
+
+def purge_steps(job):
+    """Return the querysets to empty, in order, to purge a job's object."""
+    if job.kind == DeletionJob.USER:
+        user_id = job.object_id
+        return [
+            ServerStat.objects.filter(user_id=user_id),
+            Change.objects.filter(user_id=user_id),
+            Server.tags.through.objects.filter(server__user_id=user_id),
+            Server.components.through.objects.filter(
+                server__user_id=user_id,
+            ),
+            Server.objects.filter(user_id=user_id),
+            Tag.all_objects.filter(user_id=user_id),
+            Component.all_objects.filter(user_id=user_id),
+            get_user_model().objects.filter(pk=user_id),
+        ]
+    if job.kind == DeletionJob.TAG:
+        model, through, field = Tag, Server.tags.through, "tag_id"
+    else:
+        model, through, field = (
+            Component, Server.components.through, "component_id",
+        )
+    return [
+        through.objects.filter(**{field: job.object_id}),
+        model.all_objects.filter(pk=job.object_id),
+    ]
+
+
+def _purge_batch(job, batch_size):
+    """Delete the next batch of a job's rows and update its progress."""
+    if job.status == DeletionJob.PENDING:
+        job.status = DeletionJob.RUNNING
+        job.total = sum(queryset.count() for queryset in purge_steps(job))
+
+    for queryset in purge_steps(job):
+        ids = list(
+            queryset.order_by("pk").values_list("pk", flat=True)[:batch_size]
+        )
+        if ids:
+            batch = queryset.model._base_manager.filter(pk__in=ids)
+            if job.kind == DeletionJob.USER and (
+                queryset.model is not get_user_model()
+            ):
+                # Nothing depends on these rows once the steps before ran.
+                batch._raw_delete(batch.db)
+            else:
+                # Through the model's own manager, so signal handlers see
+                # the delete like any other (tombstones, stats).
+                batch.delete()
+            job.purged += len(ids)
+            return
+
+    job.status = DeletionJob.DONE
+    job.finished_at = timezone.now()
+
+
+def purge_next_batch(batch_size):
+    """Purge one batch of the oldest unfinished job; return the job.
+
+    The job row is locked for the batch, so several workers can run
+    without working on the same job at once. Returns None when no job
+    is left.
+    """
+    with transaction.atomic():
+        job = (
+            DeletionJob.objects.select_for_update(skip_locked=True)
+            .filter(status__in=[DeletionJob.PENDING, DeletionJob.RUNNING])
+            .order_by("id")
+            .first()
+        )
+        if job is None:
+            return None
+        try:
+            with transaction.atomic(), changes.batched():
+                _purge_batch(job, batch_size)
+        except Exception as error:
+            job.status = DeletionJob.FAILED
+            job.error = str(error)
+            job.finished_at = timezone.now()
+        job.save()
+    return job
@@ -0,0 +1,75 @@
+"""
+Password hashers with costs tuned from settings.
+
+The first entry of ``PASSWORD_HASHERS`` hashes new passwords. Stored
+hashes made by another hasher, or with other costs, are verified as usual
+and rehashed by Django on the next successful login.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Argon2 hasher with configurable time, memory and parallelism."""
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_KIB
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
+
+
+class BCryptSHA256PasswordHasher(hashers.BCryptSHA256PasswordHasher):
+    """bcrypt hasher with configurable rounds."""
+
+    @property
+    def rounds(self):
+        return settings.PASSWORD_BCRYPT_ROUNDS
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """PBKDF2 hasher with configurable iterations."""
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
+
+
+class HashingBusy(Exception):
+    """All password hashing slots of the process are taken."""
+
+
+_slots = None
+_slots_lock = threading.Lock()
+
+
+def _get_slots():
+    """Return the process wide semaphore bounding concurrent hashing."""
+    global _slots
+    with _slots_lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(
+                settings.PASSWORD_HASH_CONCURRENCY
+            )
+        return _slots
+
+
+@contextmanager
+def hashing_slot():
+    """Hold a hashing slot, raising HashingBusy if none frees up in time."""
+    slots = _get_slots()
+    if not slots.acquire(timeout=settings.PASSWORD_HASH_WAIT):
+        raise HashingBusy()
+    try:
+        yield
+    finally:
+        slots.release()
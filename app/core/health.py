@@ -0,0 +1,133 @@
+"""
+Readiness probes for the app's dependencies.
+
+Results are cached for ``READINESS_CACHE_SECONDS`` so frequent probes from
+the orchestrator cost a dictionary lookup instead of a database round trip.
+
+The database is pinged from a thread of its own, on a connection opened
+for the ping, and the probe gives up after READINESS_DB_TIMEOUT seconds.
+A database that stops answering thus fails the probe in bounded time
+instead of hanging the request holding the probe lock, and every request
+queued behind it.
+"""
+import os
+import threading
+import time
+from concurrent.futures import (
+    ThreadPoolExecutor,
+    TimeoutError,
+)
+
+from django.conf import settings
+from django.db import (
+    DatabaseError,
+    connections,
+)
+
+
+def ping_database():
+    """Run the probe query on a new connection of the calling thread."""
+    connection = connections['default']
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Also bound the query on the server side.
+                cursor.execute(
+                    'SET statement_timeout = %s',
+                    [int(settings.READINESS_DB_TIMEOUT * 1000)],
+                )
+            cursor.execute(settings.READINESS_DB_QUERY)
+            cursor.fetchone()
+    except DatabaseError as error:
+        return False, str(error).strip() or type(error).__name__
+    finally:
+        connection.close()
+    return True, None
+
+
+class DatabaseProbe:
+    """Ping the database from a probe thread, waiting a bounded time."""
+
+    def __init__(self, ping):
+        self.ping = ping
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='readiness',
+        )
+        self._lock = threading.Lock()
+        self._pending = None
+
+    def __call__(self):
+        with self._lock:
+            if self._pending is not None and not self._pending.done():
+                # A ping that timed out is still waiting on the database.
+                return False, 'Previous database ping has not returned.'
+            self._pending = self._executor.submit(self.ping)
+            pending = self._pending
+        timeout = settings.READINESS_DB_TIMEOUT
+        try:
+            return pending.result(timeout=timeout)
+        except TimeoutError:
+            return False, f'No answer within {timeout:g} seconds.'
+
+
+check_database = DatabaseProbe(ping_database)
+
+
+def check_media():
+    """Check that uploads can be written to the media volume."""
+    if not os.path.isdir(settings.MEDIA_ROOT):
+        return False, 'Media directory does not exist.'
+    if not os.access(settings.MEDIA_ROOT, os.W_OK):
+        return False, 'Media directory is not writable.'
+    return True, None
+
+
+PROBES = {
+    'database': check_database,
+    'media': check_media,
+}
+
+
+class Readiness:
+    """Run the probes, reusing the last result while it is fresh."""
+
+    def __init__(self, probes):
+        self.probes = probes
+        self._lock = threading.Lock()
+        self._result = None
+        self._expires = 0
+
+    def run(self):
+        """Return whether the app is ready, with each probe's outcome."""
+        checks = {}
+        for name, probe in self.probes.items():
+            start = time.perf_counter()
+            ok, error = probe()
+            checks[name] = {
+                'ok': ok,
+                'ms': round((time.perf_counter() - start) * 1000, 2),
+            }
+            if error:
+                checks[name]['error'] = error
+        return all(check['ok'] for check in checks.values()), checks
+
+    def get(self):
+        """Return the cached result, probing again once it expired."""
+        if time.monotonic() < self._expires:
+            return self._result
+        with self._lock:
+            if time.monotonic() >= self._expires:
+                self._result = self.run()
+                self._expires = (
+                    time.monotonic() + settings.READINESS_CACHE_SECONDS
+                )
+        return self._result
+
+    def clear(self):
+        """Forget the cached result."""
+        with self._lock:
+            self._result = None
+            self._expires = 0
+
+
+READINESS = Readiness(PROBES)
@@ -0,0 +1,160 @@
+"""
+Idempotency keys for API writes.
+
+A client sending an ``Idempotency-Key`` header may retry the request
+safely: the first request runs and its response is kept for
+IDEMPOTENCY_TTL seconds in the IDEMPOTENCY_CACHE alias, whose size bounds
+the number of kept responses. Retries with the same key get the kept
+response back without running the view again. A retry arriving while
+the first request still runs waits for it, up to IDEMPOTENCY_WAIT
+seconds, then gets 409. Reusing a key for a different body gets 422.
+
+The alias must be shared by every process, since a retry may reach
+another worker; it defaults to a database cache table, created by
+``createcachetable``. Keys are scoped to the user, method and path.
+Server errors are not kept, so the request can be retried for real.
+"""
+import functools
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.uploadedfile import UploadedFile
+from drf_spectacular.utils import (
+    OpenApiParameter,
+    OpenApiTypes,
+)
+
+from rest_framework import status
+from rest_framework.response import Response
+
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+IDEMPOTENCY_KEY = OpenApiParameter(
+    HEADER,
+    OpenApiTypes.STR,
+    location=OpenApiParameter.HEADER,
+    description="Key making retries of this request safe",
+)
+
+
+def _cache():
+    return caches[settings.IDEMPOTENCY_CACHE]
+
+
+def cache_key(request, key):
+    """Return the cache key of an idempotency key for the request."""
+    user = request.user.pk if request.user.is_authenticated else "anon"
+    digest = hashlib.sha256(
+        f"{request.method}:{request.path}:{key}".encode()
+    ).hexdigest()[:40]
+    return f"idempotency:{user}:{digest}"
+
+
+def fingerprint(request):
+    """Return a hash of the parsed body of the request."""
+    digest = hashlib.sha256()
+    data = request.data
+    if not hasattr(data, "lists"):
+        digest.update(json.dumps(data, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+    for name, values in sorted(data.lists()):
+        for value in values:
+            digest.update(repr(name).encode())
+            if isinstance(value, UploadedFile):
+                for chunk in value.chunks():
+                    digest.update(chunk)
+                value.seek(0)
+            else:
+                digest.update(repr(value).encode())
+    return digest.hexdigest()
+
+
+def in_flight(request_fingerprint):
+    """Return the marker of a request still running."""
+    return {"in_flight": True, "fingerprint": request_fingerprint}
+
+
+def _replay(stored):
+    response = Response(stored["data"], status=stored["status"])
+    for header, value in stored["headers"].items():
+        response[header] = value
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _wait_for(key):
+    """Return the stored response of key once in-flight work finishes."""
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT
+    delay = 0.01
+    while True:
+        stored = _cache().get(key)
+        if stored is None or not stored.get("in_flight"):
+            return stored
+        if time.monotonic() >= deadline:
+            return stored
+        time.sleep(delay)
+        delay = min(delay * 2, 0.25)
+
+
+def idempotent(view_method):
+    """Run a view method once per Idempotency-Key and replay its response.
+    """
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"detail": f"{HEADER} is longer than {MAX_KEY_LENGTH}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        key = cache_key(request, key)
+        request_fingerprint = fingerprint(request)
+        marker = in_flight(request_fingerprint)
+        cache = _cache()
+        while not cache.add(key, marker, settings.IDEMPOTENCY_LOCK_TIMEOUT):
+            stored = cache.get(key)
+            if stored is not None and stored["fingerprint"] != (
+                request_fingerprint
+            ):
+                return Response(
+                    {"detail": f"{HEADER} was used for another request."},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            if stored is not None and stored.get("in_flight"):
+                stored = _wait_for(key)
+            if stored is None:
+                # The first request failed and released the key: run again.
+                continue
+            if stored.get("in_flight"):
+                return Response(
+                    {"detail": "A request with this key is in progress."},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            return _replay(stored)
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except BaseException:
+            cache.delete(key)
+            raise
+        if response.status_code >= 500 or not hasattr(response, "data"):
+            cache.delete(key)
+        else:
+            cache.set(key, {
+                "fingerprint": request_fingerprint,
+                "status": response.status_code,
+                "data": response.data,
+                "headers": dict(response.items()),
+            }, settings.IDEMPOTENCY_TTL)
+        return response
+
+    return wrapper
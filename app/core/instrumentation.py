@@ -0,0 +1,28 @@
+"""
+Django REST framework hooks feeding the request metrics.
+"""
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+from core.metrics import stage
+
+
+class TimedSerializerMixin:
+    """Time serializer output as the serialize stage of the request."""
+
+    @property
+    def data(self):
+        with stage('serialize'):
+            return super().data
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """List serializer timing the output of ``many=True`` serializers."""
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSON renderer timing the render stage of the request."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with stage('render'):
+            return super().render(data, accepted_media_type, renderer_context)
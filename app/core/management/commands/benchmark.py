@@ -0,0 +1,139 @@
+"""
+Django command to benchmark the API against seeded data.
+"""
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+from django.test import override_settings
+
+from core import benchmark
+from core.models import (
+    Server,
+    Tag,
+)
+from user.tokens import issue_token
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure latency percentiles and throughput of the API, in-process '
+        'through the WSGI app or over HTTP (for example against uwsgi).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target',
+            default='wsgi',
+            help='"wsgi" for in-process, or a base URL such as '
+                 'http://localhost:9000.',
+        )
+        parser.add_argument(
+            '--scenarios',
+            default=','.join(benchmark.Scenarios.NAMES),
+            help='Comma separated scenarios to run.',
+        )
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--email',
+            default=benchmark.BENCH_EMAIL.format(0),
+            help='User to authenticate as (see seed_benchmark_data).',
+        )
+        parser.add_argument('--host', default='localhost',
+                            help='Host header for the wsgi target.')
+        parser.add_argument('--baseline',
+                            help='JSON baseline file to compare against.')
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Write the results to --baseline.')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed relative regression.')
+        parser.add_argument(
+            '--throttle',
+            action='store_true',
+            help='Keep the request budgets for the wsgi target. Targets '
+                 'over HTTP keep theirs; raise their RATE_* settings.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        user = get_user_model().objects.filter(email=options['email']).first()
+        if user is None:
+            raise CommandError(
+                f"No user {options['email']}, run seed_benchmark_data first."
+            )
+        token = issue_token(user)
+        scenarios = benchmark.Scenarios(
+            Server.objects.filter(user=user).values_list('id', flat=True),
+            Tag.objects.filter(user=user).values_list('id', flat=True),
+        )
+        transport = self._transport(options, token)
+
+        results = {}
+        with ExitStack() as stack:
+            if options['target'] == 'wsgi' and not options['throttle']:
+                # The request budgets would refuse most of the requests.
+                stack.enter_context(override_settings(REST_FRAMEWORK={
+                    **settings.REST_FRAMEWORK,
+                    'DEFAULT_THROTTLE_RATES': {},
+                }))
+            for name in options['scenarios'].split(','):
+                results[name] = self._run(scenarios, transport, name, options)
+
+        self._handle_baseline(options, results)
+
+    def _run(self, scenarios, transport, name, options):
+        """Run one scenario and print its summary."""
+        if name not in benchmark.Scenarios.NAMES:
+            raise CommandError(f'Unknown scenario {name}.')
+        result = benchmark.run_scenario(
+            transport,
+            getattr(scenarios, name),
+            options['requests'],
+            options['concurrency'],
+            seed=options['seed'],
+        )
+        self.stdout.write(
+            f"{name:<8} {result['rps']:8.1f} req/s  "
+            f"p50 {result['p50']:7.1f} ms  "
+            f"p95 {result['p95']:7.1f} ms  "
+            f"p99 {result['p99']:7.1f} ms  "
+            f"errors {result['errors']}"
+        )
+        return result
+
+    def _transport(self, options, token):
+        """Build the transport for the requested target."""
+        if options['target'] == 'wsgi':
+            from app.wsgi import application
+
+            return benchmark.WSGITransport(application, token, options['host'])
+        return benchmark.HTTPTransport(options['target'], token)
+
+    def _handle_baseline(self, options, results):
+        """Save or compare against the baseline file."""
+        path = options['baseline']
+        if not path:
+            return
+        if options['save_baseline']:
+            benchmark.save_baseline(path, results)
+            self.stdout.write(self.style.SUCCESS(f'Baseline saved to {path}.'))
+            return
+
+        regressions = benchmark.compare(
+            results,
+            benchmark.load_baseline(path),
+            options['tolerance'],
+        )
+        if regressions:
+            raise CommandError(
+                'Performance regressions:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(
+            self.style.SUCCESS('No regressions against baseline.')
+        )
@@ -0,0 +1,69 @@
+"""
+Django command comparing how app servers cope with slow clients.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+
+from core import benchmark
+from core.models import (
+    Server,
+    Tag,
+)
+from user.tokens import issue_token
+
+
+class Command(BaseCommand):
+    help = (
+        'Run slow image uploads against one or more app servers while '
+        'probing the list endpoint, e.g. uwsgi --http-socket vs uvicorn. '
+        'Target the app server directly: nginx buffers request bodies.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'targets',
+            nargs='+',
+            help='Base URLs, e.g. http://app-wsgi:9000 http://app-asgi:9000',
+        )
+        parser.add_argument('--clients', type=int, default=16,
+                            help='Concurrent slow uploads.')
+        parser.add_argument('--duration', type=float, default=10,
+                            help='Seconds each upload takes to send.')
+        parser.add_argument(
+            '--email',
+            default=benchmark.BENCH_EMAIL.format(0),
+            help='User to authenticate as (see seed_benchmark_data).',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        user = get_user_model().objects.filter(email=options['email']).first()
+        if user is None:
+            raise CommandError(
+                f"No user {options['email']}, run seed_benchmark_data first."
+            )
+        token = issue_token(user)
+        scenarios = benchmark.Scenarios(
+            Server.objects.filter(user=user).values_list('id', flat=True),
+            Tag.objects.filter(user=user).values_list('id', flat=True),
+        )
+
+        for target in options['targets']:
+            result = benchmark.run_concurrency(
+                target,
+                token,
+                scenarios,
+                options['clients'],
+                options['duration'],
+            )
+            self.stdout.write(
+                f"{target}: {result['uploads_ok']}/{result['clients']} "
+                f"uploads in {result['elapsed']:.1f} s, "
+                f"{result['probes']} probes "
+                f"p50 {result['probe_p50']:.1f} ms "
+                f"p95 {result['probe_p95']:.1f} ms "
+                f"errors {result['probe_errors']}"
+            )
@@ -0,0 +1,46 @@
+"""
+Django command preparing a new container before the app server starts.
+"""
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from core.startup import (
+    pending_migrations,
+    save_static_fingerprint,
+    static_changed,
+    static_fingerprint,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Wait for the database, then collect static files and migrate, '
+        'skipping each step when nothing changed since the last start, '
+        'and create missing database cache tables.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Run collectstatic and migrate regardless.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        call_command('wait_for_db', stdout=self.stdout)
+
+        fingerprint = static_fingerprint()
+        if options['force'] or static_changed(fingerprint):
+            call_command('collectstatic', interactive=False,
+                         stdout=self.stdout)
+            save_static_fingerprint(fingerprint)
+        else:
+            self.stdout.write('Static files unchanged, skip collectstatic.')
+
+        plan = pending_migrations()
+        if options['force'] or plan:
+            self.stdout.write(f'{len(plan)} migrations to apply.')
+            call_command('migrate', interactive=False, stdout=self.stdout)
+        else:
+            self.stdout.write('No migrations to apply, skip migrate.')
+
+        # Cheap when the tables exist; caches added later get theirs.
+        call_command('createcachetable', stdout=self.stdout)
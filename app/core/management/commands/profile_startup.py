@@ -0,0 +1,74 @@
+"""
+Django command to profile the imports a worker does before serving.
+"""
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+
+from core.startup import (
+    package_totals,
+    parse_importtime,
+)
+
+
+# What a worker does before its first request: load the WSGI app (settings,
+# apps, middleware) and the URLconf, which imports every view.
+WORKER_STARTUP = (
+    'from app.wsgi import application\n'
+    'from django.urls import get_resolver\n'
+    'get_resolver().url_patterns\n'
+)
+
+
+class Command(BaseCommand):
+    help = 'Report the import cost of starting a worker, per module.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=25,
+                            help='Number of modules and packages to list.')
+        parser.add_argument('--sort', choices=['cumulative', 'self'],
+                            default='cumulative')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        start = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', WORKER_STARTUP],
+            cwd=settings.BASE_DIR,
+            env=os.environ.copy(),
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        wall = time.perf_counter() - start
+        rows = parse_importtime(process.stderr.splitlines())
+        if process.returncode or not rows:
+            raise CommandError(f'Worker startup failed:\n{process.stderr}')
+
+        top = options['top']
+        key = f'{options["sort"]}_us'
+        self.stdout.write(
+            f'{"self ms":>9} {"cumul ms":>9}  module (imported by)'
+        )
+        for row in sorted(rows, key=lambda row: getattr(row, key),
+                          reverse=True)[:top]:
+            self.stdout.write(
+                f'{row.self_us / 1000:9.1f} {row.cumulative_us / 1000:9.1f}'
+                f'  {row.name} ({row.parent or "-"})'
+            )
+
+        self.stdout.write(f'\n{"self ms":>9}  package')
+        for package, self_us in package_totals(rows)[:top]:
+            self.stdout.write(f'{self_us / 1000:9.1f}  {package}')
+
+        imports = sum(row.self_us for row in rows) / 1000
+        self.stdout.write(self.style.SUCCESS(
+            f'\n{len(rows)} modules imported in {imports:.0f} ms, '
+            f'worker ready in {wall * 1000:.0f} ms (including interpreter).'
+        ))
@@ -0,0 +1,60 @@
+"""
+Django command to create many users from a CSV file.
+"""
+import csv
+import os
+
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+
+from user.provisioning import provision_users
+
+
+class Command(BaseCommand):
+    help = (
+        'Create users from a CSV file with email, name and optional '
+        'password columns. Users without a password get an invite token.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file with a header row.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Processes hashing passwords.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--invites', metavar='PATH',
+                            help='Write the invite tokens to this CSV file.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        try:
+            with open(options['path'], newline='') as source:
+                entries = list(csv.DictReader(source))
+        except OSError as error:
+            raise CommandError(f'Cannot read {options["path"]}: {error}')
+
+        result = provision_users(
+            entries,
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+        )
+
+        for error in result.errors:
+            self.stderr.write(f'{error["email"]}: {error["error"]}')
+        if options['invites'] and result.invites:
+            with open(options['invites'], 'w', newline='') as target:
+                writer = csv.DictWriter(target, ['email', 'uid', 'token'])
+                writer.writeheader()
+                writer.writerows(result.invites)
+
+        timings = ', '.join(
+            f'{stage} {seconds:.2f}s'
+            for stage, seconds in result.timings.items()
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(result.created)} users in {result.seconds:.2f}s '
+            f'({result.users_per_second:.1f} users/s; {timings}), '
+            f'{len(result.errors)} skipped, '
+            f'{len(result.invites)} invites.'
+        ))
@@ -0,0 +1,28 @@
+"""
+Django command to delete change feed entries past their retention.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from server.changes import prune
+
+
+class Command(BaseCommand):
+    help = 'Delete change feed entries and tombstones past the retention.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float,
+                            help='Keep this many days instead of '
+                                 'CHANGE_RETENTION.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        older_than = None
+        if options['days'] is not None:
+            older_than = timezone.now() - timedelta(days=options['days'])
+        deleted = prune(older_than)
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} changes.'
+        ))
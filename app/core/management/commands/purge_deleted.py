@@ -0,0 +1,50 @@
+"""
+Django command to purge deleted users, tags and components in batches.
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.deletion import purge_next_batch
+from core.models import DeletionJob
+
+
+class Command(BaseCommand):
+    help = (
+        'Purge deleted users, tags and components and their dependents in '
+        'small batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=settings.PURGE_BATCH_SIZE,
+                            help='Rows deleted per transaction.')
+        parser.add_argument('--pause', type=float,
+                            default=settings.PURGE_BATCH_PAUSE,
+                            help='Seconds to wait between batches.')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit when no deletion is left instead '
+                                 'of waiting for new ones.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        while True:
+            job = purge_next_batch(options['batch_size'])
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(settings.PURGE_IDLE_SECONDS)
+                continue
+
+            message = (
+                f'{job.kind} {job.object_id}: {job.purged}/{job.total} '
+                f'rows ({job.status})'
+            )
+            if job.status == DeletionJob.FAILED:
+                self.stderr.write(f'{message}: {job.error}')
+            elif job.status == DeletionJob.DONE:
+                self.stdout.write(self.style.SUCCESS(message))
+            else:
+                self.stdout.write(message)
+            time.sleep(options['pause'])
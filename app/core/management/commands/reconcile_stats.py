@@ -0,0 +1,43 @@
+"""
+Django command to repair drift in the server statistics rollups.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+
+from server.stats import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Recompute the server statistics and fix rollups that drifted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', action='append',
+                            help='Only reconcile this user (repeatable).')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report drift without fixing it.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        users = None
+        if options['email']:
+            users = list(get_user_model().objects.filter(
+                email__in=options['email'],
+            ))
+            if len(users) != len(set(options['email'])):
+                raise CommandError('Unknown user email.')
+
+        drift = reconcile(users, dry_run=options['dry_run'])
+
+        for (user_id, dimension, key), (stored, actual) in sorted(
+            drift.items()
+        ):
+            self.stdout.write(
+                f'user {user_id} {dimension} {key}: {stored} -> {actual}'
+            )
+        verb = 'Found' if options['dry_run'] else 'Repaired'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {len(drift)} drifted rollups.'
+        ))
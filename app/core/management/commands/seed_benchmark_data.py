@@ -0,0 +1,41 @@
+"""
+Django command to seed deterministic benchmark data.
+"""
+from django.core.management.base import BaseCommand
+
+from core.benchmark import (
+    BENCH_EMAIL,
+    BENCH_PASSWORD,
+    seed_data,
+)
+
+
+class Command(BaseCommand):
+    help = 'Replace the benchmark users with a deterministic data set.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--servers', type=int, default=100,
+                            help='Servers per user.')
+        parser.add_argument('--tags', type=int, default=20,
+                            help='Tags per user.')
+        parser.add_argument('--components', type=int, default=20,
+                            help='Components per user.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        counts = seed_data(
+            users=options['users'],
+            servers=options['servers'],
+            tags=options['tags'],
+            components=options['components'],
+            seed=options['seed'],
+        )
+        summary = ', '.join(
+            f'{count} {name}' for name, count in counts.items()
+        )
+        self.stdout.write(self.style.SUCCESS(f'Seeded {summary}.'))
+        self.stdout.write(
+            f'Log in as {BENCH_EMAIL.format(0)} / {BENCH_PASSWORD}.'
+        )
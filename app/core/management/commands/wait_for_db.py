@@ -2,22 +2,58 @@ import time
 
 from psycopg2 import OperationalError as Psycopg2OpError
 
+from django.db import connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
 
 
 class Command(BaseCommand):
+    help = (
+        'Wait until the database accepts connections, retrying with '
+        'exponential backoff.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--timeout', type=float, default=60,
+                            help='Give up after this many seconds (0: never).')
+        parser.add_argument('--interval', type=float, default=0.1,
+                            help='First delay between attempts, in seconds.')
+        parser.add_argument('--max-interval', type=float, default=2,
+                            help='Longest delay between attempts.')
+        parser.add_argument('--query',
+                            help='Probe with this query instead of the '
+                                 'database checks, e.g. "SELECT 1".')
+
+    def probe(self, query):
+        """Raise OperationalError unless the database is usable."""
+        if query is None:
+            self.check(databases=['default'])
+            return
+        with connections['default'].cursor() as cursor:
+            cursor.execute(query)
 
     def handle(self, *args, **options):
         """Entrypoint for command."""
         self.stdout.write('Waiting for database...')
-        db_up = False
-        while db_up is False:
+        deadline = time.monotonic() + options['timeout']
+        interval = options['interval']
+        while True:
             try:
-                self.check(databases=['default'])
-                db_up = True
+                self.probe(options['query'])
+                break
             except (Psycopg2OpError, OperationalError):
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
+                connections['default'].close()
+                if options['timeout'] and time.monotonic() >= deadline:
+                    raise CommandError(
+                        f'Database unavailable after {options["timeout"]}s.'
+                    )
+                self.stdout.write(
+                    f'Database unavailable, waiting {interval:.1f}s...'
+                )
+                time.sleep(interval)
+                interval = min(interval * 2, options['max_interval'])
 
         self.stdout.write(self.style.SUCCESS('Database available!'))
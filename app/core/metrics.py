@@ -0,0 +1,426 @@
+"""
+In-process request metrics exposed in Prometheus text format.
+
+Each process records its own series. With METRICS_DIR set to a directory
+shared by the workers of a deployment, every process also writes a
+snapshot of its series there, at most every METRICS_FLUSH_SECONDS, and
+/metrics renders the sum of all snapshots, whichever worker answers the
+scrape. Snapshots are kept per uwsgi worker slot, and a worker recycled
+into a slot carries on from its predecessor's totals, so series only
+grow and scrapers do not see counter resets.
+"""
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+TIME_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (
+    256, 1024, 4096, 16384, 65536,
+    262144, 1048576, 4194304,
+)
+
+_current_sample = contextvars.ContextVar('metrics_sample', default=None)
+
+
+def _format_value(value):
+    """Format a sample value the way Prometheus expects it."""
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def _format_labels(labels):
+    """Render a label mapping as a Prometheus label set."""
+    if not labels:
+        return ''
+    pairs = []
+    for name, value in labels:
+        value = str(value).replace('\\', r'\\').replace('"', r'\"')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+class Histogram:
+    """Labelled histogram kept in process memory."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets, labelnames=('view',)):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """Record a single observation for the given labels."""
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [
+                    [0] * (len(self.buckets) + 1), 0, 0,
+                ]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self):
+        """Return the recorded series as JSON serializable pairs."""
+        with self._lock:
+            return [
+                [list(key), [list(counts), total, count]]
+                for key, (counts, total, count) in self._series.items()
+            ]
+
+    def merge(self, snapshot):
+        """Add the series of a snapshot to the recorded ones."""
+        with self._lock:
+            for key, (counts, total, count) in snapshot:
+                key = tuple(key)
+                series = self._series.get(key)
+                if series is None:
+                    series = self._series[key] = [
+                        [0] * (len(self.buckets) + 1), 0, 0,
+                    ]
+                series[0] = [a + b for a, b in zip(series[0], counts)]
+                series[1] += total
+                series[2] += count
+
+    def collect(self):
+        """Yield the exposition lines for every labelled series."""
+        with self._lock:
+            snapshot = [
+                (key, list(counts), total, count)
+                for key, (counts, total, count) in self._series.items()
+            ]
+        for key, counts, total, count in sorted(snapshot):
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            bounds = [_format_value(b) for b in self.buckets] + ['+Inf']
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(labels + [('le', bound)])
+                yield f'{self.name}_bucket{bucket_labels} {cumulative}'
+            yield (
+                f'{self.name}_sum{_format_labels(labels)} '
+                f'{_format_value(total)}'
+            )
+            yield f'{self.name}_count{_format_labels(labels)} {count}'
+
+    def clear(self):
+        """Drop every recorded series."""
+        with self._lock:
+            self._series.clear()
+
+
+class Counter:
+    """Labelled counter kept in process memory."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=('view',)):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        """Add amount to the series of the given labels."""
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels):
+        """Return the current value of the series of the given labels."""
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            return self._series.get(key, 0)
+
+    def snapshot(self):
+        """Return the recorded series as JSON serializable pairs."""
+        with self._lock:
+            return [[list(key), value] for key, value in self._series.items()]
+
+    def merge(self, snapshot):
+        """Add the series of a snapshot to the recorded ones."""
+        with self._lock:
+            for key, value in snapshot:
+                key = tuple(key)
+                self._series[key] = self._series.get(key, 0) + value
+
+    def collect(self):
+        """Yield the exposition lines for every labelled series."""
+        with self._lock:
+            snapshot = sorted(self._series.items())
+        for key, value in snapshot:
+            labels = _format_labels(list(zip(self.labelnames, key)))
+            yield f'{self.name}{labels} {_format_value(value)}'
+
+    def clear(self):
+        """Drop every recorded series."""
+        with self._lock:
+            self._series.clear()
+
+
+class Registry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        """Add a metric to the registry and return it."""
+        self._metrics[metric.name] = metric
+        return metric
+
+    def histogram(self, name, documentation, buckets, labelnames=('view',)):
+        """Create and register a histogram."""
+        return self.register(
+            Histogram(name, documentation, buckets, labelnames)
+        )
+
+    def counter(self, name, documentation, labelnames=('view',)):
+        """Create and register a counter."""
+        return self.register(Counter(name, documentation, labelnames))
+
+    def get(self, name):
+        """Return a registered metric by name."""
+        return self._metrics[name]
+
+    def snapshot(self):
+        """Return the recorded series of every metric."""
+        return {
+            name: metric.snapshot() for name, metric in self._metrics.items()
+        }
+
+    def merge(self, snapshot):
+        """Add the series of a registry snapshot to the recorded ones."""
+        for name, series in snapshot.items():
+            if name in self._metrics:
+                self._metrics[name].merge(series)
+
+    def empty_copy(self):
+        """Return a registry of the same metrics with no series."""
+        copy = Registry()
+        for metric in self._metrics.values():
+            if metric.kind == 'histogram':
+                copy.histogram(
+                    metric.name, metric.documentation, metric.buckets,
+                    metric.labelnames,
+                )
+            else:
+                copy.counter(
+                    metric.name, metric.documentation, metric.labelnames,
+                )
+        return copy
+
+    def clear(self):
+        """Drop the recorded series of every metric."""
+        for metric in self._metrics.values():
+            metric.clear()
+
+    def render(self):
+        """Render all metrics in the Prometheus text format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def worker_slot():
+    """Return the name of the snapshot file of this process."""
+    try:
+        import uwsgi
+    except ImportError:
+        return f'pid-{os.getpid()}.json'
+    return f'worker-{uwsgi.worker_id()}.json'
+
+
+class SharedSnapshots:
+    """Snapshots of the registry of every process, kept in METRICS_DIR."""
+
+    def __init__(self, registry):
+        self.registry = registry
+        self._lock = threading.Lock()
+        self._pid = None
+        self._flushed_at = 0.0
+
+    def _read(self, path):
+        try:
+            with open(path) as source:
+                return json.load(source)
+        except (OSError, ValueError):
+            return {}
+
+    def flush(self, force=False):
+        """Write this process's snapshot when due, or now with force."""
+        directory = settings.METRICS_DIR
+        if not directory:
+            return
+        now = time.monotonic()
+        due = now - self._flushed_at >= settings.METRICS_FLUSH_SECONDS
+        if not force and not due:
+            return
+        with self._lock:
+            path = os.path.join(directory, worker_slot())
+            if self._pid != os.getpid():
+                # First flush of this process: carry on from the totals of
+                # the worker it replaced in the slot.
+                self.registry.merge(self._read(path))
+                self._pid = os.getpid()
+            temporary = f'{path}.{os.getpid()}.tmp'
+            with open(temporary, 'w') as target:
+                json.dump(self.registry.snapshot(), target)
+            os.replace(temporary, path)
+            self._flushed_at = now
+
+    def render(self):
+        """Render the sum of the snapshots of every process."""
+        if not settings.METRICS_DIR:
+            return self.registry.render()
+        self.flush(force=True)
+        total = self.registry.empty_copy()
+        for name in sorted(os.listdir(settings.METRICS_DIR)):
+            if name.endswith('.json'):
+                total.merge(
+                    self._read(os.path.join(settings.METRICS_DIR, name))
+                )
+        return total.render()
+
+
+SHARED = SharedSnapshots(REGISTRY)
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    'api_request_duration_seconds',
+    'Wall clock time spent handling the request.',
+    TIME_BUCKETS,
+)
+DB_QUERIES = REGISTRY.histogram(
+    'api_db_queries',
+    'Number of database queries executed per request.',
+    COUNT_BUCKETS,
+)
+DB_SECONDS = REGISTRY.histogram(
+    'api_db_duration_seconds',
+    'Time spent waiting on the database per request.',
+    TIME_BUCKETS,
+)
+SERIALIZE_SECONDS = REGISTRY.histogram(
+    'api_serialize_duration_seconds',
+    'Time spent in serializer to_representation per request.',
+    TIME_BUCKETS,
+)
+RENDER_SECONDS = REGISTRY.histogram(
+    'api_render_duration_seconds',
+    'Time spent rendering the response body per request.',
+    TIME_BUCKETS,
+)
+RESPONSE_BYTES = REGISTRY.histogram(
+    'api_response_size_bytes',
+    'Size of the response body.',
+    SIZE_BUCKETS,
+)
+COALESCED_REQUESTS = REGISTRY.counter(
+    'api_coalesced_requests_total',
+    'Requests answered with the result of an identical request in flight.',
+    ('view', 'source'),
+)
+
+
+class RequestSample:
+    """Timings collected for a single sampled request.
+
+    Instances are used as a database query observer, so every query run
+    while the sample is active is counted and timed.
+    """
+
+    def __init__(self):
+        self.view = 'unmatched'
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.stages = {'serialize': 0.0, 'render': 0.0}
+        self._active_stage = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_queries += 1
+            self.db_seconds += time.perf_counter() - start
+
+    def record(self, duration, response_size):
+        """Publish the sample to the registered histograms."""
+        view = self.view
+        REQUEST_SECONDS.observe(duration, view=view)
+        DB_QUERIES.observe(self.db_queries, view=view)
+        DB_SECONDS.observe(self.db_seconds, view=view)
+        SERIALIZE_SECONDS.observe(self.stages['serialize'], view=view)
+        RENDER_SECONDS.observe(self.stages['render'], view=view)
+        RESPONSE_BYTES.observe(response_size, view=view)
+
+
+@contextmanager
+def sampling(sample):
+    """Make the sample current for the code run inside the block."""
+    token = _current_sample.set(sample)
+    try:
+        yield sample
+    finally:
+        _current_sample.reset(token)
+
+
+def current_sample():
+    """Return the sample for the running request, if it is sampled."""
+    return _current_sample.get()
+
+
+@contextmanager
+def stage(name):
+    """Add the time spent in the block to a stage of the current sample.
+
+    Nested blocks for a stage that is already being timed are ignored so
+    nested serializers are not counted twice.
+    """
+    sample = _current_sample.get()
+    if sample is None or sample._active_stage is not None:
+        yield
+        return
+    sample._active_stage = name
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        sample.stages[name] += time.perf_counter() - start
+        sample._active_stage = None
+
+
+def view_name(request, view_func):
+    """Return a low cardinality name such as ``ServerViewSet.list``."""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        module = getattr(view_func, '__module__', '')
+        return f"{module}.{getattr(view_func, '__name__', 'view')}"
+    method = request.method.lower()
+    actions = getattr(view_func, 'actions', None) or {}
+    return f'{cls.__name__}.{actions.get(method, method)}'
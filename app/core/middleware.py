@@ -0,0 +1,190 @@
+"""
+Middleware for the app.
+
+The middleware here supports both WSGI and ASGI, so running under ASGI
+does not force the request chain back onto a single sync thread.
+"""
+import asyncio
+import random
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+from core import (
+    metrics,
+    routers,
+    views,
+)
+from core.db import observe_queries
+from core.queries import QueryInspector
+
+
+PROBES = {
+    '/healthz': views.healthz,
+    '/readyz': views.readyz,
+}
+
+
+@sync_and_async_middleware
+def probe_middleware(get_response):
+    """Answer health probes before host validation and other middleware.
+
+    Orchestrators probe by pod address, which is not an allowed host, and
+    the probes need none of the sessions, auth or metrics further down.
+    """
+
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            probe = PROBES.get(request.path_info)
+            if probe is None:
+                return await get_response(request)
+            return await sync_to_async(probe, thread_sensitive=True)(request)
+    else:
+        def middleware(request):
+            probe = PROBES.get(request.path_info)
+            if probe is None:
+                return get_response(request)
+            return probe(request)
+
+    return middleware
+
+
+def _response_size(response):
+    """Return the body size without consuming streaming responses."""
+    if response.streaming:
+        return int(response.get('Content-Length', 0))
+    return len(response.content)
+
+
+def _start_sample():
+    """Return a new sample if this request is sampled."""
+    sample_rate = settings.METRICS_SAMPLE_RATE
+    if sample_rate <= 0 or random.random() >= sample_rate:
+        return None
+    return metrics.RequestSample()
+
+
+def _finish_sample(sample, request, response, start):
+    """Record the sample against the view that handled the request."""
+    match = getattr(request, 'resolver_match', None)
+    if match is not None:
+        sample.view = metrics.view_name(request, match.func)
+    sample.record(time.perf_counter() - start, _response_size(response))
+
+
+@sync_and_async_middleware
+def request_metrics_middleware(get_response):
+    """Record per view timings for a sample of requests."""
+
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            sample = _start_sample()
+            if sample is None:
+                response = await get_response(request)
+            else:
+                start = time.perf_counter()
+                with metrics.sampling(sample), observe_queries(sample):
+                    response = await get_response(request)
+                _finish_sample(sample, request, response, start)
+            metrics.SHARED.flush()
+            return response
+    else:
+        def middleware(request):
+            sample = _start_sample()
+            if sample is None:
+                response = get_response(request)
+            else:
+                start = time.perf_counter()
+                with metrics.sampling(sample), observe_queries(sample):
+                    response = get_response(request)
+                _finish_sample(sample, request, response, start)
+            metrics.SHARED.flush()
+            return response
+
+    return middleware
+
+
+def _report_queries(inspector, request):
+    """Log or raise for the queries captured during the request."""
+    inspector.report(
+        f'{request.method} {request.path}',
+        raise_errors=settings.QUERY_INSPECTOR_RAISE,
+    )
+
+
+@sync_and_async_middleware
+def query_inspector_middleware(get_response):
+    """Report slow queries and N+1 patterns in development and tests."""
+
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            if not settings.QUERY_INSPECTOR_ENABLED:
+                return await get_response(request)
+            with QueryInspector() as inspector:
+                response = await get_response(request)
+            _report_queries(inspector, request)
+            return response
+    else:
+        def middleware(request):
+            if not settings.QUERY_INSPECTOR_ENABLED:
+                return get_response(request)
+            with QueryInspector() as inspector:
+                response = get_response(request)
+            _report_queries(inspector, request)
+            return response
+
+    return middleware
+
+
+def _finish_routing(request, response):
+    """Pin the client to the primary after requests that wrote."""
+    unsafe = request.method not in routers.SAFE_METHODS
+    if unsafe and response.status_code < 400:
+        routers.mark_sticky(request, response)
+    return response
+
+
+@sync_and_async_middleware
+def replica_routing_middleware(get_response):
+    """Route the reads of safe requests to a read replica."""
+
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            with routers.routing(routers.state_for(request)):
+                response = await get_response(request)
+            return _finish_routing(request, response)
+    else:
+        def middleware(request):
+            with routers.routing(routers.state_for(request)):
+                response = get_response(request)
+            return _finish_routing(request, response)
+
+    return middleware
+
+
+def _add_rate_limit_headers(request, response):
+    """Describe the request budget the throttle charged, if any."""
+    limit = getattr(request, 'rate_limit', None)
+    if limit is not None:
+        response['RateLimit-Limit'] = str(limit.limit)
+        response['RateLimit-Remaining'] = str(limit.remaining)
+        response['RateLimit-Reset'] = str(limit.reset)
+    return response
+
+
+@sync_and_async_middleware
+def rate_limit_headers_middleware(get_response):
+    """Send the state of the request budget with every API response."""
+
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            response = await get_response(request)
+            return _add_rate_limit_headers(request, response)
+    else:
+        def middleware(request):
+            response = get_response(request)
+            return _add_rate_limit_headers(request, response)
+
+    return middleware
@@ -44,6 +44,13 @@ class UserManager(BaseUserManager):
         return user
 
 
+class LiveManager(models.Manager):
+    """Manager leaving out rows marked deleted and waiting for a purge."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class User(AbstractBaseUser, PermissionsMixin):
     """User in the system."""
 
@@ -51,6 +58,7 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    deleted_at = models.DateTimeField(null=True, blank=True)
 
     objects = UserManager()
 
@@ -64,7 +72,7 @@ class Server(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
-    title = models.CharField(max_length=255)
+    title = models.CharField(max_length=255, db_index=True)
     description = models.TextField(blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     link = models.CharField(max_length=255, blank=True)
@@ -79,11 +87,15 @@ class Server(models.Model):
 class Tag(models.Model):
     """Tag for filtering servers."""
 
-    name = models.CharField(max_length=255)
+    name = models.CharField(max_length=255, db_index=True)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
 
     def __str__(self):
         return self.name
@@ -92,11 +104,153 @@ class Tag(models.Model):
 class Component(models.Model):
     """Component for servers."""
 
-    name = models.CharField(max_length=255)
+    name = models.CharField(max_length=255, db_index=True)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
 
     def __str__(self):
         return self.name
+
+
+class RevokedToken(models.Model):
+    """Signed auth token revoked before it expires."""
+
+    jti = models.CharField(max_length=32, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return self.jti
+
+
+class ServerStat(models.Model):
+    """Rollup of a user's servers per tag, component or price bucket."""
+
+    TAG = "tag"
+    COMPONENT = "component"
+    PRICE = "price"
+    DIMENSIONS = [
+        (TAG, "Tag"),
+        (COMPONENT, "Component"),
+        (PRICE, "Price bucket"),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+    dimension = models.CharField(max_length=16, choices=DIMENSIONS)
+    key = models.CharField(max_length=64)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "dimension", "key"],
+                name="unique_server_stat",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.dimension} {self.key}: {self.count}"
+
+
+class Change(models.Model):
+    """Entry of a user's server, tag and component change feed.
+
+    The id is the change sequence number. Rows are kept after their user
+    is deleted, so the user is not a database constraint.
+    """
+
+    SERVER = "server"
+    TAG = "tag"
+    COMPONENT = "component"
+    KINDS = [
+        (SERVER, "Server"),
+        (TAG, "Tag"),
+        (COMPONENT, "Component"),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+    )
+    kind = models.CharField(max_length=16, choices=KINDS)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "id"], name="change_user_seq"),
+        ]
+
+    def __str__(self):
+        action = "deleted" if self.deleted else "changed"
+        return f"{self.id}: {self.kind} {self.object_id} {action}"
+
+
+class DeletionJob(models.Model):
+    """Purge of a deleted user, tag or component and its dependents."""
+
+    USER = "user"
+    TAG = "tag"
+    COMPONENT = "component"
+    KINDS = [
+        (USER, "User"),
+        (TAG, "Tag"),
+        (COMPONENT, "Component"),
+    ]
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+    )
+    kind = models.CharField(max_length=16, choices=KINDS)
+    object_id = models.BigIntegerField()
+    status = models.CharField(
+        max_length=16, choices=STATUSES, default=PENDING,
+    )
+    total = models.IntegerField(default=0)
+    purged = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "id"], name="deletion_job_queue"),
+        ]
+
+    @property
+    def progress(self):
+        if self.status == self.DONE:
+            return 1.0
+        if not self.total:
+            return 0.0
+        return min(self.purged / self.total, 1.0)
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}: {self.status}"
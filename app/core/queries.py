@@ -0,0 +1,151 @@
+"""
+SQL capture with slow query and N+1 detection.
+"""
+import logging
+import re
+import time
+import traceback
+from contextlib import ExitStack
+
+from django.conf import settings
+
+from core import (
+    db,
+    metrics,
+)
+from core.db import observe_queries
+
+
+logger = logging.getLogger(__name__)
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_PLACEHOLDERS = re.compile(r'%s|%\(\w+\)s')
+# Query observers; their frames are on the stack of every query they see.
+_OWN_FILES = {__file__, db.__file__, metrics.__file__}
+
+
+class NPlusOneError(AssertionError):
+    """Raised when a query shape repeats from the same call site."""
+
+
+def query_shape(sql):
+    """Return the SQL with literals and placeholders normalised."""
+    shape = _STRINGS.sub('?', sql)
+    shape = _PLACEHOLDERS.sub('?', shape)
+    shape = _NUMBERS.sub('?', shape)
+    return _IN_LISTS.sub('(...)', shape)
+
+
+def _project_frames():
+    """Return the stack frames that belong to the project's own code."""
+    base_dir = str(settings.BASE_DIR)
+    frames = []
+    for frame in traceback.extract_stack():
+        filename = frame.filename
+        if not filename.startswith(base_dir) or filename in _OWN_FILES:
+            continue
+        if 'site-packages' in filename:
+            continue
+        frames.append(frame)
+    return frames
+
+
+class CapturedQuery:
+    """A query run while a QueryInspector was installed."""
+
+    def __init__(self, sql, duration, frames):
+        self.sql = sql
+        self.shape = query_shape(sql)
+        self.duration = duration
+        self.frames = frames
+
+    @property
+    def call_site(self):
+        """Return ``file:line`` of the innermost project frame."""
+        if not self.frames:
+            return '<unknown>'
+        frame = self.frames[-1]
+        return f'{frame.filename}:{frame.lineno}'
+
+    def format_stack(self):
+        """Return the project part of the stack that issued the query."""
+        return ''.join(traceback.format_list(self.frames))
+
+
+class QueryInspector:
+    """Execute wrapper collecting the queries run in the current context."""
+
+    def __init__(self, threshold=None, slow_ms=None):
+        if threshold is None:
+            threshold = settings.QUERY_INSPECTOR_N_PLUS_ONE
+        if slow_ms is None:
+            slow_ms = settings.QUERY_INSPECTOR_SLOW_MS
+        self.threshold = threshold
+        self.slow_ms = slow_ms
+        self.queries = []
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.queries.append(
+                CapturedQuery(sql, duration, _project_frames())
+            )
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        self._stack.enter_context(observe_queries(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+        self._stack = None
+
+    def repeated(self):
+        """Return the (first query, count) of shapes repeated per site."""
+        groups = {}
+        for query in self.queries:
+            key = (query.shape, query.call_site)
+            first, count = groups.get(key, (query, 0))
+            groups[key] = (first, count + 1)
+        return [
+            (first, count) for first, count in groups.values()
+            if count >= self.threshold
+        ]
+
+    def slow(self):
+        """Return the queries that took longer than the slow threshold."""
+        limit = self.slow_ms / 1000
+        return [query for query in self.queries if query.duration >= limit]
+
+    def describe_repeated(self):
+        """Return a readable report of the repeated query shapes."""
+        lines = []
+        for query, count in self.repeated():
+            lines.append(
+                f'{count} queries with the same shape from '
+                f'{query.call_site}:\n    {query.shape}\n'
+                f'{query.format_stack()}'
+            )
+        return '\n'.join(lines)
+
+    def report(self, label, raise_errors=False):
+        """Log slow queries and log or raise for repeated shapes."""
+        for query in self.slow():
+            logger.warning(
+                'Slow query (%.1f ms) in %s from %s: %s',
+                query.duration * 1000, label, query.call_site, query.sql,
+            )
+        if not self.repeated():
+            return
+        message = f'Possible N+1 queries in {label}:\n' + (
+            self.describe_repeated()
+        )
+        if raise_errors:
+            raise NPlusOneError(message)
+        logger.warning(message)
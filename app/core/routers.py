@@ -0,0 +1,122 @@
+"""
+Database routing to read replicas.
+
+Reads go to a replica only inside a request marked safe by
+``core.middleware.replica_routing_middleware``: a GET, HEAD or OPTIONS
+request from a client that has not written within the sticky window.
+Everything else, including management commands, uses the primary. Once a
+request writes, its remaining reads use the primary too.
+"""
+import contextvars
+import hashlib
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+PRIMARY = 'default'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+STICKY_COOKIE = 'primary_db'
+
+
+class RoutingState:
+    """Database routing of one request."""
+
+    def __init__(self, replica=None):
+        self.replica = replica
+        self.wrote = False
+
+    @property
+    def read_alias(self):
+        if self.wrote or self.replica is None:
+            return PRIMARY
+        return self.replica
+
+
+_state = contextvars.ContextVar('db_routing', default=None)
+
+
+@contextmanager
+def routing(state):
+    """Route the queries of the current context with state."""
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+def current_state():
+    """Return the routing state of the current request, if any."""
+    return _state.get()
+
+
+def _client_key(request):
+    """Return a cache key identifying the client, or None."""
+    credentials = request.META.get('HTTP_AUTHORIZATION')
+    if not credentials:
+        return None
+    digest = hashlib.sha256(credentials.encode()).hexdigest()[:32]
+    return f'db-sticky:{digest}'
+
+
+def is_sticky(request):
+    """Return whether the client wrote within the sticky window."""
+    if request.COOKIES.get(STICKY_COOKIE):
+        return True
+    key = _client_key(request)
+    return bool(key and caches[settings.REPLICA_STICKY_CACHE].get(key))
+
+
+def mark_sticky(request, response):
+    """Keep the client's reads on the primary for the sticky window."""
+    seconds = settings.REPLICA_STICKY_SECONDS
+    if seconds <= 0 or not settings.REPLICA_DATABASES:
+        return
+    key = _client_key(request)
+    if key:
+        caches[settings.REPLICA_STICKY_CACHE].set(key, True, seconds)
+    response.set_cookie(
+        STICKY_COOKIE, '1', max_age=seconds, httponly=True, samesite='Lax',
+    )
+
+
+def state_for(request):
+    """Return the routing state for a new request."""
+    replicas = settings.REPLICA_DATABASES
+    if (
+        not replicas
+        or request.method not in SAFE_METHODS
+        or is_sticky(request)
+    ):
+        return RoutingState()
+    return RoutingState(replica=random.choice(replicas))
+
+
+class ReplicaRouter:
+    """Send safe reads to the request's replica, the rest to the primary."""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None:
+            return PRIMARY
+        return state.read_alias
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *settings.REPLICA_DATABASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.REPLICA_DATABASES:
+            return False
+        return None
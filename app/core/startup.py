@@ -0,0 +1,117 @@
+"""
+Helpers to profile and shorten worker and container startup.
+"""
+import hashlib
+import os
+import re
+from collections import defaultdict
+
+from django.conf import settings
+
+
+_IMPORT_LINE = re.compile(
+    r'^import time:\s+(?P<self>\d+) \|\s+(?P<cumulative>\d+) \|'
+    r'(?P<indent>\s*)(?P<name>\S+)$'
+)
+
+
+class ImportTime:
+    """Cost of importing one module, in microseconds."""
+
+    def __init__(self, name, self_us, cumulative_us, depth):
+        self.name = name
+        self.self_us = self_us
+        self.cumulative_us = cumulative_us
+        self.depth = depth
+        self.parent = None
+
+    @property
+    def package(self):
+        return self.name.split('.')[0]
+
+
+def parse_importtime(lines):
+    """Parse ``python -X importtime`` output into ImportTime rows.
+
+    Modules are reported after everything they import, so a row becomes
+    the parent of the pending rows one level deeper.
+    """
+    rows = []
+    pending = defaultdict(list)
+    for line in lines:
+        match = _IMPORT_LINE.match(line.rstrip('\n'))
+        if match is None:
+            continue
+        row = ImportTime(
+            match['name'],
+            int(match['self']),
+            int(match['cumulative']),
+            (len(match['indent']) - 1) // 2,
+        )
+        for child in pending.pop(row.depth + 1, []):
+            child.parent = row.name
+        pending[row.depth].append(row)
+        rows.append(row)
+    return rows
+
+
+def package_totals(rows):
+    """Return the self import time per top level package, largest first."""
+    totals = defaultdict(int)
+    for row in rows:
+        totals[row.package] += row.self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def static_fingerprint():
+    """Hash the static files collectstatic would copy."""
+    from django.contrib.staticfiles.finders import get_finders
+
+    digest = hashlib.sha256()
+    seen = set()
+    for finder in get_finders():
+        for path, storage in finder.list(['CVS', '.*', '*~']):
+            prefix = getattr(storage, 'prefix', None) or ''
+            name = os.path.join(prefix, path)
+            if name in seen:
+                continue
+            seen.add(name)
+            digest.update(name.encode())
+            with storage.open(path) as source:
+                for chunk in iter(lambda: source.read(65536), b''):
+                    digest.update(chunk)
+    digest.update(settings.STATICFILES_STORAGE.encode())
+    return digest.hexdigest()
+
+
+def fingerprint_path():
+    """Return where the fingerprint of the collected files is kept."""
+    return os.path.join(settings.STATIC_ROOT, '.collectstatic.sha256')
+
+
+def static_changed(fingerprint):
+    """Return whether collected static files differ from the fingerprint."""
+    try:
+        with open(fingerprint_path()) as stored:
+            return stored.read().strip() != fingerprint
+    except OSError:
+        return True
+
+
+def save_static_fingerprint(fingerprint):
+    """Record the fingerprint of the files just collected."""
+    with open(fingerprint_path(), 'w') as stored:
+        stored.write(fingerprint)
+
+
+def pending_migrations(database='default'):
+    """Return the migrations migrate would apply, in order."""
+    from django.db import connections
+    from django.db.migrations.executor import MigrationExecutor
+
+    executor = MigrationExecutor(connections[database])
+    targets = executor.loader.graph.leaf_nodes()
+    return [
+        migration for migration, backwards in
+        executor.migration_plan(targets)
+    ]
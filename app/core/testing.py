@@ -0,0 +1,58 @@
+"""
+Helpers shared by the test suites.
+"""
+import unittest
+from contextlib import contextmanager
+
+from django.test.runner import DiscoverRunner
+
+from core import throttles
+from core.queries import QueryInspector
+
+
+class IsolatedTestResult(unittest.TextTestResult):
+    """Test result resetting process-wide state before every test."""
+
+    def startTest(self, test):
+        # Request budgets outlive test transactions, and reused user ids
+        # would share their buckets.
+        throttles.LOCAL_STORE.clear()
+        super().startTest(test)
+
+
+class TestRunner(DiscoverRunner):
+    """Test runner isolating each test from process-wide state."""
+
+    def get_resultclass(self):
+        resultclass = super().get_resultclass()
+        if resultclass is None:
+            return IsolatedTestResult
+        return type(
+            resultclass.__name__, (IsolatedTestResult, resultclass), {},
+        )
+
+
+class QueryBudgetMixin:
+    """Assertions on the queries run by a block of test code."""
+
+    @contextmanager
+    def assertQueryBudget(self, max_queries, n_plus_one_threshold=3):
+        """Fail if the block runs too many queries or repeats a shape."""
+        with QueryInspector(threshold=n_plus_one_threshold) as inspector:
+            yield inspector
+
+        queries = inspector.queries
+        if len(queries) > max_queries:
+            statements = '\n'.join(
+                f'{index}. {query.sql}'
+                for index, query in enumerate(queries, start=1)
+            )
+            self.fail(
+                f'{len(queries)} queries executed, budget is {max_queries}:'
+                f'\n{statements}'
+            )
+        if inspector.repeated():
+            self.fail(
+                'Repeated query shapes (N+1):\n'
+                + inspector.describe_repeated()
+            )
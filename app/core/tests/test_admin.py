@@ -1,11 +1,17 @@
 """
 Tests for the Django admin modifications.
 """
-from django.test import TestCase
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import Client
 
+from core import models
+from core.admin import EstimatedCountPaginator
+
 
 class AdminSiteTests(TestCase):
     """Tests for Django admin."""
@@ -45,3 +51,89 @@ class AdminSiteTests(TestCase):
         res = self.client.get(url)
 
         self.assertEqual(res.status_code, 200)
+
+
+class LargeTableAdminTests(TestCase):
+    """Tests for the server, tag and component admin pages."""
+
+    def setUp(self):
+        self.client = Client()
+        self.admin_user = get_user_model().objects.create_superuser(
+            email='admin@example.com',
+            password='testpass123',
+        )
+        self.client.force_login(self.admin_user)
+        self.tag = models.Tag.objects.create(
+            user=self.admin_user, name='Fast',
+        )
+        self.unused_tag = models.Tag.objects.create(
+            user=self.admin_user, name='Unused',
+        )
+        self.server = models.Server.objects.create(
+            user=self.admin_user,
+            title='Gaming Server',
+            price=Decimal('5.00'),
+        )
+        self.server.tags.add(self.tag)
+
+    def test_changelists(self):
+        """Test the server, tag and component changelists load."""
+        for model in ('server', 'tag', 'component'):
+            url = reverse(f'admin:core_{model}_changelist')
+            res = self.client.get(url)
+
+            self.assertEqual(res.status_code, 200)
+        self.assertContains(
+            self.client.get(reverse('admin:core_server_changelist')),
+            self.server.title,
+        )
+
+    def test_change_form_uses_autocomplete(self):
+        """Test relations render as autocomplete, not full selects."""
+        url = reverse('admin:core_server_change', args=[self.server.id])
+        res = self.client.get(url)
+
+        self.assertContains(res, 'admin-autocomplete')
+        self.assertContains(res, self.tag.name)
+        self.assertNotContains(res, self.unused_tag.name)
+
+    def test_search_by_prefix(self):
+        """Test searching servers by the start of their title."""
+        url = reverse('admin:core_server_changelist')
+
+        self.assertContains(self.client.get(url, {'q': 'Gam'}), 'Gaming')
+        self.assertNotContains(
+            self.client.get(url, {'q': 'Video'}), 'Gaming Server',
+        )
+
+    def test_autocomplete_tags(self):
+        """Test the tag autocomplete endpoint searches by name."""
+        res = self.client.get(reverse('admin:autocomplete'), {
+            'term': 'Fa',
+            'app_label': 'core',
+            'model_name': 'server',
+            'field_name': 'tags',
+        })
+
+        self.assertEqual(
+            [item['text'] for item in res.json()['results']], ['Fast'],
+        )
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=1000)
+    def test_paginator_estimate(self):
+        """Test large estimates are used instead of an exact count."""
+        tags = models.Tag.objects.order_by('id')
+        with patch.object(
+            EstimatedCountPaginator, 'estimate', return_value=50000,
+        ):
+            self.assertEqual(EstimatedCountPaginator(tags, 100).count, 50000)
+        with patch.object(
+            EstimatedCountPaginator, 'estimate', return_value=10,
+        ):
+            self.assertEqual(EstimatedCountPaginator(tags, 100).count, 2)
+
+    def test_paginator_exact_without_postgres(self):
+        """Test databases without estimates are counted exactly."""
+        tags = models.Tag.objects.order_by('id')
+
+        self.assertEqual(EstimatedCountPaginator(tags, 100).count, 2)
@@ -0,0 +1,113 @@
+"""
+Tests for the benchmark suite.
+"""
+import random
+from io import StringIO
+
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+)
+
+from core import benchmark
+from core.models import (
+    Server,
+    Tag,
+)
+
+
+class FakeTransport:
+    """Transport answering every request with a fixed status."""
+
+    def __init__(self, status=200):
+        self.status = status
+        self.requests = []
+
+    def send(self, method, path, body=b'', content_type=None):
+        self.requests.append((method, path))
+        return self.status
+
+
+class BenchmarkReportTests(SimpleTestCase):
+    """Test latency reporting and baseline comparison."""
+
+    def test_percentile(self):
+        """Test percentiles interpolate between samples."""
+        values = list(range(1, 101))
+
+        self.assertEqual(benchmark.percentile(values, 50), 50.5)
+        self.assertAlmostEqual(benchmark.percentile(values, 99), 99.01)
+        self.assertEqual(benchmark.percentile([], 95), 0.0)
+
+    def test_run_scenario_counts_errors(self):
+        """Test a scenario summary includes errors and percentiles."""
+        transport = FakeTransport(status=500)
+        scenarios = benchmark.Scenarios([1], [1, 2])
+
+        result = benchmark.run_scenario(transport, scenarios.filter, 10, 2)
+
+        self.assertEqual(result['requests'], 10)
+        self.assertEqual(result['errors'], 10)
+        self.assertEqual(len(transport.requests), 10)
+        self.assertIn('?tags=', transport.requests[0][1])
+        for key in ('rps', 'p50', 'p95', 'p99'):
+            self.assertIn(key, result)
+
+    def test_scenarios_deterministic(self):
+        """Test the same seed produces the same requests."""
+        scenarios = benchmark.Scenarios(range(100), range(10))
+
+        first = scenarios.update(random.Random(3))
+        second = scenarios.update(random.Random(3))
+
+        self.assertEqual(first, second)
+
+    def test_compare_reports_regressions(self):
+        """Test slower latency and lower throughput are reported."""
+        baseline = {'list': {'p95': 10.0, 'rps': 100.0}}
+        results = {
+            'list': {'p95': 13.0, 'rps': 70.0, 'errors': 0, 'requests': 10},
+        }
+
+        regressions = benchmark.compare(results, baseline, 0.2)
+
+        self.assertEqual(len(regressions), 2)
+        self.assertEqual(benchmark.compare(results, baseline, 0.5), [])
+
+    def test_compare_reports_errors(self):
+        """Test failed requests are a regression even when fast."""
+        baseline = {'list': {'p95': 10.0, 'rps': 100.0}}
+        results = {
+            'list': {'p95': 1.0, 'rps': 900.0, 'errors': 3, 'requests': 10},
+        }
+
+        regressions = benchmark.compare(results, baseline, 0.2)
+
+        self.assertEqual(regressions, ['list: 3 of 10 requests failed'])
+
+
+class SeedBenchmarkDataTests(TestCase):
+    """Test the benchmark data seeder."""
+
+    def test_seed_is_deterministic(self):
+        """Test seeding twice replaces the data with the same data set."""
+        args = ['--users', 2, '--servers', 5, '--tags', 4,
+                '--components', 4, '--seed', 7]
+        call_command('seed_benchmark_data', *args, stdout=StringIO())
+        first = list(
+            Server.objects.order_by('id').values_list('title', 'price')
+        )
+        first_links = Server.tags.through.objects.count()
+
+        call_command('seed_benchmark_data', *args, stdout=StringIO())
+
+        self.assertEqual(get_user_model().objects.count(), 2)
+        self.assertEqual(Tag.objects.count(), 8)
+        self.assertEqual(
+            list(Server.objects.order_by('id').values_list('title', 'price')),
+            first,
+        )
+        self.assertEqual(Server.tags.through.objects.count(), first_links)
+        self.assertEqual(first_links, 2 * 5 * 3)
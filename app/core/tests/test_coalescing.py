@@ -0,0 +1,167 @@
+"""
+Tests for single-flight coalescing of reads.
+"""
+import threading
+import time
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.http import QueryDict
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import (
+    coalescing,
+    metrics,
+)
+from core.models import Server
+
+
+SERVERS_URL = reverse("server:server-list")
+
+
+class SingleFlightTests(SimpleTestCase):
+    """Test running a function once for concurrent callers."""
+
+    def run_concurrently(self, flights, func, callers=5):
+        """Call func through flights from several threads at once."""
+        release = threading.Event()
+        results = []
+
+        def blocked():
+            release.wait()
+            return func()
+
+        def call():
+            try:
+                results.append(flights.do("key", blocked))
+            except Exception as error:
+                results.append(error)
+
+        threads = [threading.Thread(target=call) for _ in range(callers)]
+        threads[0].start()
+        while not flights.in_flight():
+            time.sleep(0.001)
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_callers_share_result(self):
+        """Test concurrent callers of a key run the function once."""
+        flights = coalescing.SingleFlight()
+        calls = []
+
+        results = self.run_concurrently(
+            flights, lambda: calls.append(1) or "result",
+        )
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(
+            sorted(results), [("result", False)] + [("result", True)] * 4,
+        )
+        self.assertEqual(flights.in_flight(), 0)
+
+    def test_error_reaches_every_caller(self):
+        """Test an error raised by the function is raised to all callers."""
+        flights = coalescing.SingleFlight()
+
+        def fail():
+            raise ValueError("boom")
+
+        results = self.run_concurrently(flights, fail, callers=3)
+
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+        self.assertEqual(flights.in_flight(), 0)
+
+    def test_counter_render(self):
+        """Test counters are rendered with their labels."""
+        registry = metrics.Registry()
+        counter = registry.counter("test_total", "Test.", ("view",))
+        counter.inc(view="A.list")
+        counter.inc(2, view="A.list")
+
+        output = registry.render()
+
+        self.assertIn("# TYPE test_total counter", output)
+        self.assertIn('test_total{view="A.list"} 3', output)
+
+
+class CoalescedListTests(TestCase):
+    """Test coalescing the server list."""
+
+    def setUp(self):
+        metrics.REGISTRY.clear()
+        caches["default"].clear()
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com",
+            password="test123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.server = Server.objects.create(
+            user=self.user, title="Gaming", price=Decimal("5.00"),
+        )
+
+    def coalesced_count(self, source):
+        return metrics.COALESCED_REQUESTS.value(
+            view="ServerViewSet.list", source=source,
+        )
+
+    def test_follower_gets_leader_result(self):
+        """Test a request that joins a read in flight is answered by it."""
+        with patch.object(
+            coalescing.FLIGHTS, "do",
+            side_effect=lambda key, func: (func(), True),
+        ):
+            res = self.client.get(SERVERS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data[0]["id"], self.server.id)
+        self.assertEqual(self.coalesced_count("worker"), 1)
+
+    def test_lone_request_not_counted(self):
+        """Test a read nobody else runs is not counted as coalesced."""
+        res = self.client.get(SERVERS_URL)
+
+        self.assertEqual(res.data[0]["id"], self.server.id)
+        self.assertEqual(self.coalesced_count("worker"), 0)
+
+    @override_settings(COALESCE_CACHE="default")
+    def test_result_shared_across_processes(self):
+        """Test a read running in another process is waited for."""
+        request = SimpleNamespace(
+            user=self.user, query_params=QueryDict("tags=1"),
+        )
+        key = coalescing.request_key("ServerViewSet.list", request)
+        caches["default"].set(f"{key}:lock", 1)
+        caches["default"].set(key, {"status": 200, "data": [{"id": 99}]})
+
+        res = self.client.get(SERVERS_URL, {"tags": "1"})
+
+        self.assertEqual(res.data, [{"id": 99}])
+        self.assertEqual(self.coalesced_count("cache"), 1)
+
+    @override_settings(COALESCE_CACHE="default")
+    def test_result_published_to_cache(self):
+        """Test the first process publishes its result for the others."""
+        self.client.get(SERVERS_URL)
+
+        request = SimpleNamespace(user=self.user, query_params=QueryDict())
+        key = coalescing.request_key("ServerViewSet.list", request)
+        payload = caches["default"].get(key)
+        self.assertEqual(payload["data"][0]["id"], self.server.id)
+        self.assertIsNone(caches["default"].get(f"{key}:lock"))
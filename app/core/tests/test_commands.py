@@ -1,13 +1,18 @@
 """
 Test custom Django management commands.
 """
+from io import StringIO
 from unittest.mock import patch
 
 from psycopg2 import OperationalError as Psycopg2OpError
 
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+)
 
 
 @patch('core.management.commands.wait_for_db.Command.check')
@@ -32,3 +37,42 @@ class CommandTests(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+    @patch('time.sleep')
+    def test_wait_for_db_backoff(self, patched_sleep, patched_check):
+        """Test the delay between attempts doubles up to the maximum."""
+        patched_check.side_effect = [OperationalError] * 5 + [True]
+
+        call_command('wait_for_db', '--interval', '0.5', '--max-interval',
+                     '2', stdout=StringIO())
+
+        delays = [args[0] for args, _ in patched_sleep.call_args_list]
+        self.assertEqual(delays, [0.5, 1, 2, 2, 2])
+
+    @patch('time.monotonic')
+    @patch('time.sleep')
+    def test_wait_for_db_timeout(self, patched_sleep, patched_monotonic,
+                                 patched_check):
+        """Test giving up once the timeout has passed."""
+        patched_check.side_effect = OperationalError
+        patched_monotonic.side_effect = [0, 1, 2, 3, 4]
+
+        with self.assertRaises(CommandError):
+            call_command('wait_for_db', '--timeout', '3', stdout=StringIO())
+
+        self.assertEqual(patched_check.call_count, 3)
+
+
+class WaitForDbQueryTests(TestCase):
+    """Test probing the database with a query."""
+
+    def test_wait_for_db_query(self):
+        """Test the probe query is run instead of the checks."""
+        out = StringIO()
+
+        with patch('core.management.commands.wait_for_db.Command.check') \
+                as patched_check, self.assertNumQueries(1):
+            call_command('wait_for_db', '--query', 'SELECT 1', stdout=out)
+
+        patched_check.assert_not_called()
+        self.assertIn('Database available!', out.getvalue())
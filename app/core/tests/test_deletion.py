@@ -0,0 +1,199 @@
+"""
+Tests for background deletes.
+"""
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import deletion
+from core.models import (
+    Change,
+    Component,
+    DeletionJob,
+    Server,
+    ServerStat,
+    Tag,
+)
+from user.tokens import issue_token
+
+ME_URL = reverse("user:me")
+DELETIONS_URL = reverse("user:deletions")
+SERVERS_URL = reverse("server:server-list")
+
+
+def tag_url(tag_id):
+    """Create and return a tag detail URL."""
+    return reverse("server:tag-detail", args=[tag_id])
+
+
+class DeletionTests(TestCase):
+    """Test marking rows deleted and purging them in batches."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com",
+            password="test123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name="Fast")
+        self.servers = []
+        for index in range(5):
+            server = Server.objects.create(
+                user=self.user,
+                title=f"Server {index}",
+                price=Decimal("5.00"),
+            )
+            server.tags.add(self.tag)
+            self.servers.append(server)
+
+    def purge(self, batch_size=500):
+        out = StringIO()
+        call_command(
+            "purge_deleted", "--once", "--pause=0",
+            f"--batch-size={batch_size}", stdout=out, stderr=out,
+        )
+        return out.getvalue()
+
+    def test_delete_tag_marks_and_queues(self):
+        """Test deleting a tag hides it at once and queues its purge."""
+        res = self.client.delete(tag_url(self.tag.id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Tag.objects.filter(id=self.tag.id).exists())
+        self.assertTrue(Tag.all_objects.filter(id=self.tag.id).exists())
+        self.assertEqual(list(self.servers[0].tags.all()), [])
+        job = DeletionJob.objects.get()
+        self.assertEqual(
+            (job.kind, job.object_id, job.status),
+            (DeletionJob.TAG, self.tag.id, DeletionJob.PENDING),
+        )
+
+    def test_purge_tag_in_batches(self):
+        """Test the purge removes links in batches and reports progress."""
+        self.client.delete(tag_url(self.tag.id))
+
+        output = self.purge(batch_size=2)
+
+        job = DeletionJob.objects.get()
+        self.assertEqual(job.status, DeletionJob.DONE)
+        self.assertEqual((job.purged, job.total), (6, 6))
+        self.assertEqual(job.progress, 1.0)
+        self.assertIn("tag", output)
+        self.assertIn("2/6", output)
+        self.assertFalse(Tag.all_objects.filter(id=self.tag.id).exists())
+        self.assertFalse(
+            Server.tags.through.objects.filter(tag_id=self.tag.id).exists()
+        )
+        self.assertEqual(Server.objects.count(), 5)
+
+    def test_deleted_name_not_reused(self):
+        """Test writing a deleted tag's name creates a new tag."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(SERVERS_URL, {
+                "title": "Warm cache",
+                "price": "1.00",
+                "tags": [{"name": "Fast"}],
+            }, format="json")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(tag_url(self.tag.id))
+
+        res = self.client.post(SERVERS_URL, {
+            "title": "Video Server",
+            "price": "1.00",
+            "tags": [{"name": "Fast"}],
+        }, format="json")
+
+        [tag] = res.data["tags"]
+        self.assertNotEqual(tag["id"], self.tag.id)
+
+    def test_delete_user(self):
+        """Test deleting the user deactivates them and purges their data."""
+        component = Component.objects.create(user=self.user, name="CPU")
+        client = APIClient()
+        token = issue_token(self.user)
+        client.credentials(HTTP_AUTHORIZATION=f"Token {token}")
+
+        res = client.delete(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data["kind"], DeletionJob.USER)
+        self.assertEqual(
+            client.get(ME_URL).status_code, status.HTTP_401_UNAUTHORIZED,
+        )
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+
+        self.purge(batch_size=3)
+
+        self.assertFalse(
+            get_user_model().objects.filter(id=self.user.id).exists()
+        )
+        self.assertFalse(Server.objects.exists())
+        self.assertFalse(Tag.all_objects.exists())
+        self.assertFalse(
+            Component.all_objects.filter(id=component.id).exists()
+        )
+        self.assertEqual(DeletionJob.objects.get().status, DeletionJob.DONE)
+
+    def purge_user_queries(self, email, servers):
+        """Return the queries purging a user with that many servers."""
+        user = get_user_model().objects.create_user(email, "test123")
+        tag = Tag.objects.create(user=user, name="Fast")
+        for index in range(servers):
+            Server.objects.create(
+                user=user, title=f"Server {index}", price=Decimal("1"),
+            ).tags.add(tag)
+        deletion.mark_deleted(user)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.purge()
+        self.assertFalse(ServerStat.objects.filter(user_id=user.id).exists())
+        self.assertFalse(Change.objects.filter(user_id=user.id).exists())
+        self.assertFalse(Server.objects.filter(user_id=user.id).exists())
+        return [query["sql"] for query in queries.captured_queries]
+
+    def test_user_purge_skips_row_handlers(self):
+        """Test a user purge costs the same for any number of servers."""
+        few = self.purge_user_queries("few@example.com", 2)
+        many = self.purge_user_queries("many@example.com", 20)
+
+        self.assertEqual(len(few), len(many))
+        for sql in many:
+            self.assertNotIn('UPDATE "core_serverstat"', sql)
+            self.assertNotIn('INSERT INTO "core_change"', sql)
+
+    def test_list_deletions(self):
+        """Test the user sees the progress of their deletes."""
+        self.client.delete(tag_url(self.tag.id))
+
+        res = self.client.get(DELETIONS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]["object_id"], self.tag.id)
+        self.assertEqual(res.data[0]["status"], DeletionJob.PENDING)
+
+    def test_failed_purge_is_reported(self):
+        """Test a failing purge marks the job failed and moves on."""
+        self.client.delete(tag_url(self.tag.id))
+
+        with patch.object(
+            deletion, "_purge_batch", side_effect=RuntimeError("boom"),
+        ):
+            output = self.purge()
+
+        job = DeletionJob.objects.get()
+        self.assertEqual(job.status, DeletionJob.FAILED)
+        self.assertEqual(job.error, "boom")
+        self.assertIn("boom", output)
+        self.assertTrue(Tag.all_objects.filter(id=self.tag.id).exists())
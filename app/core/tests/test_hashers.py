@@ -0,0 +1,78 @@
+"""
+Tests for the password hashers.
+"""
+import threading
+from unittest.mock import patch
+
+from django.contrib.auth.hashers import (
+    check_password,
+    identify_hasher,
+    make_password,
+)
+from django.test import (
+    SimpleTestCase,
+    override_settings,
+)
+
+from core import hashers
+
+
+class HasherTests(SimpleTestCase):
+    """Test the hashing policy."""
+
+    def test_new_passwords_use_preferred_hasher(self):
+        """Test new passwords are hashed with the tuned argon2 hasher."""
+        encoded = make_password("testpass123")
+
+        hasher = identify_hasher(encoded)
+        self.assertIsInstance(hasher, hashers.Argon2PasswordHasher)
+        self.assertIn("m=19456,t=2,p=1", encoded)
+
+    def test_rehash_when_costs_change(self):
+        """Test hashes with other costs are updated on a correct check."""
+        encoded = make_password("testpass123")
+        updated = []
+
+        with override_settings(PASSWORD_ARGON2_TIME_COST=3):
+            self.assertTrue(check_password(
+                "testpass123", encoded, setter=updated.append,
+            ))
+
+        self.assertEqual(updated, ["testpass123"])
+
+    def test_rehash_legacy_pbkdf2(self):
+        """Test PBKDF2 hashes still verify and are rehashed."""
+        encoded = make_password("testpass123", hasher="pbkdf2_sha256")
+        updated = []
+
+        self.assertTrue(check_password(
+            "testpass123", encoded, setter=updated.append,
+        ))
+        self.assertFalse(check_password("wrongpass", encoded))
+        self.assertEqual(updated, ["testpass123"])
+
+
+class HashingSlotTests(SimpleTestCase):
+    """Test bounding concurrent password hashing."""
+
+    def test_busy_when_no_slot_frees(self):
+        """Test HashingBusy is raised when every slot stays taken."""
+        slots = threading.BoundedSemaphore(1)
+        slots.acquire()
+
+        with patch.object(hashers, "_slots", slots), \
+                override_settings(PASSWORD_HASH_WAIT=0.01):
+            with self.assertRaises(hashers.HashingBusy):
+                with hashers.hashing_slot():
+                    pass
+
+    def test_slot_released(self):
+        """Test the slot is released after use, also on errors."""
+        slots = threading.BoundedSemaphore(1)
+
+        with patch.object(hashers, "_slots", slots):
+            with self.assertRaises(ValueError):
+                with hashers.hashing_slot():
+                    raise ValueError()
+            with hashers.hashing_slot():
+                pass
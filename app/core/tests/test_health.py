@@ -0,0 +1,99 @@
+"""
+Tests for the health and readiness probes.
+"""
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+
+from django.test import (
+    TestCase,
+    override_settings,
+)
+
+from core.health import (
+    READINESS,
+    DatabaseProbe,
+)
+
+
+class HealthTests(TestCase):
+    """Test the probe endpoints."""
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        READINESS.clear()
+        self.addCleanup(READINESS.clear)
+
+    def test_healthz(self):
+        """Test liveness needs no queries, even from unknown hosts."""
+        with self.assertNumQueries(0):
+            res = self.client.get('/healthz', HTTP_HOST='10.0.0.7')
+
+        self.assertEqual(res.status_code, 200)
+
+    def test_readyz(self):
+        """Test readiness when the database and media are usable."""
+        with override_settings(MEDIA_ROOT=self.media.name):
+            res = self.client.get('/readyz', HTTP_HOST='10.0.0.7')
+
+        self.assertEqual(res.status_code, 200)
+        checks = res.json()['checks']
+        self.assertTrue(checks['database']['ok'])
+        self.assertTrue(checks['media']['ok'])
+
+    def test_readyz_cached(self):
+        """Test probe results are reused while fresh."""
+        with override_settings(MEDIA_ROOT=self.media.name):
+            self.client.get('/readyz')
+
+            with self.assertNumQueries(0):
+                res = self.client.get('/readyz')
+
+        self.assertEqual(res.status_code, 200)
+
+    def test_readyz_database_down(self):
+        """Test readiness fails when the database probe fails."""
+        with override_settings(MEDIA_ROOT=self.media.name), \
+                patch.dict('core.health.PROBES',
+                           {'database': lambda: (False, 'down')}):
+            res = self.client.get('/readyz')
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res.json()['checks']['database']['error'], 'down')
+
+    @override_settings(READINESS_DB_TIMEOUT=0.05)
+    def test_readyz_database_hanging(self):
+        """Test a database that stops answering fails the probe quickly."""
+        release = threading.Event()
+        self.addCleanup(release.set)
+        probe = DatabaseProbe(lambda: (release.wait(), (True, None))[1])
+
+        start = time.monotonic()
+        with override_settings(MEDIA_ROOT=self.media.name), \
+                patch.dict('core.health.PROBES', {'database': probe}):
+            res = self.client.get('/readyz')
+            READINESS.clear()
+            again = self.client.get('/readyz')
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(res.status_code, 503)
+        error = res.json()['checks']['database']['error']
+        self.assertIn('0.05 seconds', error)
+        self.assertEqual(again.status_code, 503)
+        error = again.json()['checks']['database']['error']
+        self.assertIn('not returned', error)
+        self.assertLess(elapsed, 1)
+
+        release.set()
+        probe._pending.result(timeout=1)
+        self.assertEqual(probe(), (True, None))
+
+    def test_readyz_media_missing(self):
+        """Test readiness fails when the media volume is missing."""
+        with override_settings(MEDIA_ROOT='/nonexistent/media'):
+            res = self.client.get('/readyz')
+
+        self.assertEqual(res.status_code, 503)
+        self.assertFalse(res.json()['checks']['media']['ok'])
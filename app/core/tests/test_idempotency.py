@@ -0,0 +1,180 @@
+"""
+Tests for idempotency keys.
+"""
+import threading
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import (
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+from django.utils.datastructures import MultiValueDict
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import idempotency
+from core.models import Server
+from server.views import ServerViewSet
+
+SERVERS_URL = reverse("server:server-list")
+
+PAYLOAD = {"title": "Gaming", "price": "5.00"}
+
+
+class IdempotencyTests(TestCase):
+    """Test replaying writes sent with an Idempotency-Key."""
+
+    def setUp(self):
+        caches["idempotency"].clear()
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com",
+            password="test123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create(self, key, payload=PAYLOAD, client=None):
+        client = client or self.client
+        return client.post(
+            SERVERS_URL, payload, format="json", HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def key_for(self, key):
+        request = SimpleNamespace(
+            user=self.user, method="POST", path=SERVERS_URL,
+        )
+        return idempotency.cache_key(request, key)
+
+    def fingerprint(self, payload=PAYLOAD):
+        return idempotency.fingerprint(SimpleNamespace(data=payload))
+
+    def in_flight(self):
+        return idempotency.in_flight(self.fingerprint())
+
+    def test_retry_is_replayed(self):
+        """Test a retry gets the first response without writing again."""
+        first = self.create("abc")
+        retry = self.create("abc")
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Server.objects.count(), 1)
+
+    def test_key_reused_for_other_body(self):
+        """Test a key sent with a different body is refused."""
+        self.create("abc")
+
+        res = self.create("abc", payload={**PAYLOAD, "title": "Other"})
+
+        self.assertEqual(
+            res.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+        self.assertEqual(Server.objects.count(), 1)
+
+    def test_fingerprint_hashes_uploads(self):
+        """Test uploads with other file contents differ, and stay readable."""
+        def upload(content):
+            data = MultiValueDict({
+                "image": [SimpleUploadedFile("a.jpg", content)],
+            })
+            return SimpleNamespace(data=data)
+
+        first = upload(b"one")
+
+        self.assertEqual(
+            idempotency.fingerprint(first),
+            idempotency.fingerprint(upload(b"one")),
+        )
+        self.assertNotEqual(
+            idempotency.fingerprint(first),
+            idempotency.fingerprint(upload(b"two")),
+        )
+        self.assertEqual(first.data["image"].read(), b"one")
+
+    def test_keys_are_separate(self):
+        """Test other keys, and requests without one, write again."""
+        self.create("abc")
+        self.create("def")
+        self.client.post(SERVERS_URL, PAYLOAD, format="json")
+        self.client.post(SERVERS_URL, PAYLOAD, format="json")
+
+        self.assertEqual(Server.objects.count(), 4)
+
+    def test_keys_are_per_user(self):
+        """Test a key used by another user does not replay their response."""
+        other = get_user_model().objects.create_user(
+            email="other@example.com",
+            password="test123",
+        )
+        client = APIClient()
+        client.force_authenticate(other)
+        self.create("abc")
+
+        res = self.create("abc", client=client)
+
+        self.assertNotIn("Idempotent-Replayed", res)
+        self.assertEqual(Server.objects.filter(user=other).count(), 1)
+
+    @override_settings(IDEMPOTENCY_CACHE="default")
+    def test_retry_waits_for_in_flight(self):
+        """Test a retry waits for the running request and replays it."""
+        # The database cache cannot be written from another thread while
+        # the test transaction is open, so this test uses locmem.
+        caches["default"].clear()
+        key = self.key_for("abc")
+        caches["default"].add(key, self.in_flight())
+        stored = {
+            "fingerprint": self.fingerprint(),
+            "status": status.HTTP_201_CREATED,
+            "data": {"id": 1},
+            "headers": {},
+        }
+        finish = threading.Timer(
+            0.05, caches["default"].set, args=(key, stored),
+        )
+        finish.start()
+
+        res = self.create("abc")
+        finish.join()
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data, {"id": 1})
+        self.assertFalse(Server.objects.exists())
+
+    @override_settings(IDEMPOTENCY_WAIT=0.05)
+    def test_retry_conflicts_when_still_running(self):
+        """Test a retry gets 409 when the first request runs too long."""
+        caches["idempotency"].add(self.key_for("abc"), self.in_flight())
+
+        res = self.create("abc")
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Server.objects.exists())
+
+    def test_failed_request_releases_key(self):
+        """Test a request that raises can be retried with the same key."""
+        with patch.object(
+            ServerViewSet, "perform_create", side_effect=ValueError("boom"),
+        ):
+            with self.assertRaises(ValueError):
+                self.create("abc")
+
+        res = self.create("abc")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn("Idempotent-Replayed", res)
+
+    def test_long_key_rejected(self):
+        """Test keys over the length limit are refused."""
+        res = self.create("k" * (idempotency.MAX_KEY_LENGTH + 1))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Server.objects.exists())
@@ -0,0 +1,164 @@
+"""
+Tests for request metrics.
+"""
+import json
+import os
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.models import Server
+
+
+SERVERS_URL = reverse('server:server-list')
+METRICS_URL = reverse('metrics')
+
+
+class HistogramTests(SimpleTestCase):
+    """Test the in-process histogram."""
+
+    def test_render_cumulative_buckets(self):
+        """Test buckets are rendered cumulatively with sum and count."""
+        registry = metrics.Registry()
+        histogram = registry.histogram('test_seconds', 'Test.', (0.1, 1.0))
+        histogram.observe(0.05, view='A.list')
+        histogram.observe(0.5, view='A.list')
+        histogram.observe(5, view='A.list')
+
+        output = registry.render()
+
+        self.assertIn('# TYPE test_seconds histogram', output)
+        self.assertIn('test_seconds_bucket{view="A.list",le="0.1"} 1', output)
+        self.assertIn('test_seconds_bucket{view="A.list",le="1.0"} 2', output)
+        self.assertIn('test_seconds_bucket{view="A.list",le="+Inf"} 3', output)
+        self.assertIn('test_seconds_sum{view="A.list"} 5.55', output)
+        self.assertIn('test_seconds_count{view="A.list"} 3', output)
+
+
+class SharedSnapshotsTests(SimpleTestCase):
+    """Test sharing metrics between worker processes."""
+
+    def test_recycled_worker_continues_totals(self):
+        """Test a new process in a worker slot adds to its totals."""
+        registry = metrics.Registry()
+        counter = registry.counter('test_total', 'Test.')
+        shared = metrics.SharedSnapshots(registry)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, metrics.worker_slot())
+            with open(path, 'w') as f:
+                json.dump({'test_total': [[['A.list'], 3]]}, f)
+            counter.inc(view='A.list')
+
+            with override_settings(METRICS_DIR=directory):
+                shared.flush()
+                shared.flush(force=True)
+                output = shared.render()
+
+        self.assertEqual(counter.value(view='A.list'), 4)
+        self.assertIn('test_total{view="A.list"} 4', output)
+
+
+class RequestMetricsTests(TestCase):
+    """Test the request metrics middleware."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        metrics.REGISTRY.clear()
+
+    def test_records_view_action_and_queries(self):
+        """Test a request is recorded against its view and action."""
+        Server.objects.create(user=self.user, title='S', price=Decimal('1'))
+
+        self.client.get(SERVERS_URL)
+        output = self.client.get(METRICS_URL).content.decode()
+
+        self.assertIn(
+            'api_request_duration_seconds_count{view="ServerViewSet.list"} 1',
+            output,
+        )
+        self.assertIn(
+            'api_db_queries_count{view="ServerViewSet.list"} 1',
+            output,
+        )
+        self.assertNotIn(
+            'api_db_queries_sum{view="ServerViewSet.list"} 0\n',
+            output,
+        )
+
+    def test_metrics_denied_to_other_addresses(self):
+        """Test metrics are refused outside the allowed addresses."""
+        res = self.client.get(METRICS_URL, REMOTE_ADDR='203.0.113.5')
+
+        self.assertEqual(res.status_code, 403)
+
+    @override_settings(
+        METRICS_ALLOWED_IPS=['10.0.0.0/8'], METRICS_TOKEN='scrape-key',
+    )
+    def test_metrics_allowed_by_network_or_token(self):
+        """Test allowed networks and the scrape token read metrics."""
+        client = APIClient()
+
+        by_network = client.get(METRICS_URL, REMOTE_ADDR='10.1.2.3')
+        by_token = client.get(
+            METRICS_URL,
+            REMOTE_ADDR='203.0.113.5',
+            HTTP_AUTHORIZATION='Bearer scrape-key',
+        )
+        wrong_token = client.get(
+            METRICS_URL,
+            REMOTE_ADDR='203.0.113.5',
+            HTTP_AUTHORIZATION='Bearer other',
+        )
+
+        self.assertEqual(by_network.status_code, 200)
+        self.assertEqual(by_token.status_code, 200)
+        self.assertEqual(wrong_token.status_code, 403)
+
+    def test_scraped_from_deployment_network(self):
+        """Test a scraper on the deployment's private network reads them."""
+        res = self.client.get(METRICS_URL, REMOTE_ADDR='172.18.0.5')
+
+        self.assertEqual(res.status_code, 200)
+
+    def test_metrics_summed_across_workers(self):
+        """Test a scrape adds up the snapshots of every worker."""
+        other = metrics.REGISTRY.empty_copy()
+        other.get('api_request_duration_seconds').observe(
+            0.5, view='ServerViewSet.list',
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, 'worker-2.json'), 'w') as f:
+                json.dump(other.snapshot(), f)
+
+            with override_settings(METRICS_DIR=directory):
+                self.client.get(SERVERS_URL)
+                output = self.client.get(METRICS_URL).content.decode()
+
+        self.assertIn(
+            'api_request_duration_seconds_count{view="ServerViewSet.list"} 2',
+            output,
+        )
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_sample_rate_zero_records_nothing(self):
+        """Test requests are not recorded when sampling is disabled."""
+        self.client.get(SERVERS_URL)
+
+        output = metrics.REGISTRY.render()
+
+        self.assertNotIn('ServerViewSet.list', output)
@@ -0,0 +1,119 @@
+"""
+Tests for the slow query and N+1 detector.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.db import observe_queries
+from core.models import (
+    Server,
+    Tag,
+)
+from core.queries import (
+    NPlusOneError,
+    QueryInspector,
+    query_shape,
+)
+
+
+class QueryShapeTests(SimpleTestCase):
+    """Test SQL normalisation."""
+
+    def test_literals_and_in_lists_normalised(self):
+        """Test queries differing only in values share a shape."""
+        first = query_shape(
+            "SELECT * FROM t WHERE id IN (1, 2, 3) AND name = 'a'"
+        )
+        second = query_shape("SELECT * FROM t WHERE id IN (4) AND name = 'b'")
+
+        self.assertEqual(first, second)
+        self.assertEqual(
+            first,
+            'SELECT * FROM t WHERE id IN (...) AND name = ?',
+        )
+
+
+class QueryInspectorTests(TestCase):
+    """Test capturing and inspecting queries."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+
+    def test_repeated_shape_from_same_site_detected(self):
+        """Test a query issued in a loop is reported with its stack."""
+        tags = [
+            Tag.objects.create(user=self.user, name=f'Tag{i}')
+            for i in range(4)
+        ]
+
+        with QueryInspector(threshold=3) as inspector:
+            for tag in tags:
+                Tag.objects.filter(id=tag.id).exists()
+
+        repeated = inspector.repeated()
+        self.assertEqual(len(repeated), 1)
+        query, count = repeated[0]
+        self.assertEqual(count, 4)
+        self.assertIn('test_queries.py', query.call_site)
+        self.assertIn('test_queries.py', inspector.describe_repeated())
+
+    def test_call_site_skips_metrics_sample(self):
+        """Test the call site is the caller when requests are sampled."""
+        sample = metrics.RequestSample()
+        with observe_queries(sample), QueryInspector() as inspector:
+            Tag.objects.exists()
+
+        [query] = inspector.queries
+        self.assertIn('test_queries.py', query.call_site)
+
+    def test_report_raises_when_configured(self):
+        """Test report raises NPlusOneError when asked to."""
+        with QueryInspector(threshold=2) as inspector:
+            for _ in range(2):
+                get_user_model().objects.filter(id=self.user.id).exists()
+
+        with self.assertRaises(NPlusOneError):
+            inspector.report('test', raise_errors=True)
+
+    def test_slow_queries(self):
+        """Test queries over the slow threshold are reported."""
+        with QueryInspector(slow_ms=0) as inspector:
+            Tag.objects.exists()
+
+        self.assertEqual(len(inspector.slow()), 1)
+
+    @override_settings(
+        QUERY_INSPECTOR_ENABLED=True,
+        QUERY_INSPECTOR_RAISE=True,
+        QUERY_INSPECTOR_N_PLUS_ONE=3,
+    )
+    def test_middleware_allows_prefetched_list(self):
+        """Test the server list passes the inspector in raise mode."""
+        tag = Tag.objects.create(user=self.user, name='Fast')
+        for index in range(5):
+            server = Server.objects.create(
+                user=self.user,
+                title=f'Server {index}',
+                price=Decimal('1.00'),
+            )
+            server.tags.add(tag)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        res = client.get(reverse('server:server-list'))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
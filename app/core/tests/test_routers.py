@@ -0,0 +1,131 @@
+"""
+Tests for read replica routing.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import routers
+from core.middleware import replica_routing_middleware
+from core.models import Server
+from user.tokens import issue_token
+
+
+SERVERS_URL = reverse("server:server-list")
+
+
+@override_settings(
+    REPLICA_DATABASES=['replica_1'], REPLICA_STICKY_CACHE='default',
+)
+class ReplicaRouterTests(SimpleTestCase):
+    """Test choosing the database per request."""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def read_alias(self, request):
+        """Return the read database chosen for the request."""
+        aliases = []
+
+        def view(request):
+            aliases.append(Server.objects.all().db)
+            return HttpResponse()
+
+        replica_routing_middleware(view)(request)
+        return aliases[0]
+
+    def test_outside_requests_use_primary(self):
+        """Test commands and shells read from the primary."""
+        self.assertEqual(Server.objects.all().db, 'default')
+
+    def test_safe_request_reads_replica(self):
+        """Test GET requests read from a replica."""
+        self.assertEqual(self.read_alias(self.factory.get('/')), 'replica_1')
+
+    def test_unsafe_request_uses_primary(self):
+        """Test writing requests also read from the primary."""
+        self.assertEqual(self.read_alias(self.factory.post('/')), 'default')
+
+    def test_reads_after_write_use_primary(self):
+        """Test a request reads from the primary once it has written."""
+        state = routers.RoutingState(replica='replica_1')
+        router = routers.ReplicaRouter()
+
+        with routers.routing(state):
+            self.assertEqual(router.db_for_read(Server), 'replica_1')
+            router.db_for_write(Server)
+            self.assertEqual(router.db_for_read(Server), 'default')
+
+    def test_sticky_after_write(self):
+        """Test the writing client reads from the primary for a while."""
+        headers = {'HTTP_AUTHORIZATION': 'Token abc'}
+        middleware = replica_routing_middleware(lambda request: HttpResponse())
+
+        response = middleware(self.factory.post('/', **headers))
+
+        self.assertIn(routers.STICKY_COOKIE, response.cookies)
+        self.assertEqual(
+            self.read_alias(self.factory.get('/', **headers)), 'default',
+        )
+        self.assertEqual(
+            self.read_alias(self.factory.get('/', HTTP_AUTHORIZATION='x')),
+            'replica_1',
+        )
+
+    def test_no_replicas(self):
+        """Test everything uses the primary without replicas."""
+        with override_settings(REPLICA_DATABASES=[]):
+            self.assertEqual(self.read_alias(self.factory.get('/')), 'default')
+
+    def test_no_replicas_not_sticky(self):
+        """Test writes set no sticky cookie or key without replicas."""
+        headers = {'HTTP_AUTHORIZATION': 'Token abc'}
+        middleware = replica_routing_middleware(lambda request: HttpResponse())
+
+        with override_settings(REPLICA_DATABASES=[]):
+            response = middleware(self.factory.post('/', **headers))
+
+        self.assertNotIn(routers.STICKY_COOKIE, response.cookies)
+        self.assertFalse(routers.is_sticky(self.factory.get('/', **headers)))
+
+    def test_migrate_only_primary(self):
+        """Test migrations are not run on replicas."""
+        router = routers.ReplicaRouter()
+
+        self.assertFalse(router.allow_migrate('replica_1', 'core'))
+        self.assertIsNone(router.allow_migrate('default', 'core'))
+
+
+@override_settings(REPLICA_DATABASES=['replica_1'])
+class ReplicaApiTests(TestCase):
+    """Test read-after-write through the API."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123',
+        )
+        token = issue_token(user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+
+    def test_list_after_create_reads_primary(self):
+        """Test a server created by the client is listed right away."""
+        payload = {'title': 'Server', 'price': '5.00'}
+
+        res = self.client.post(SERVERS_URL, payload)
+        self.assertEqual(res.status_code, 201)
+        self.client.cookies.clear()
+        res = self.client.get(SERVERS_URL)
+
+        self.assertEqual([server['title'] for server in res.data], ['Server'])
@@ -0,0 +1,104 @@
+"""
+Tests for the startup helpers and commands.
+"""
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import (
+    SimpleTestCase,
+    override_settings,
+)
+
+from core import startup
+
+
+IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:       100 |        100 |     yaml.error
+import time:       300 |        400 |   yaml
+import time:        50 |         50 |   rest_framework.compat
+import time:       200 |        650 | rest_framework
+import time:        20 |         20 | app
+"""
+
+
+class ImportTimeTests(SimpleTestCase):
+    """Test parsing import time reports."""
+
+    def test_parse_importtime(self):
+        """Test rows get their costs, depth and importing module."""
+        rows = startup.parse_importtime(IMPORTTIME.splitlines())
+
+        by_name = {row.name: row for row in rows}
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(by_name['yaml'].cumulative_us, 400)
+        self.assertEqual(by_name['yaml.error'].parent, 'yaml')
+        self.assertEqual(by_name['yaml'].parent, 'rest_framework')
+        self.assertIsNone(by_name['rest_framework'].parent)
+
+    def test_package_totals(self):
+        """Test self time is summed per top level package."""
+        rows = startup.parse_importtime(IMPORTTIME.splitlines())
+
+        self.assertEqual(
+            startup.package_totals(rows),
+            [('yaml', 400), ('rest_framework', 250), ('app', 20)],
+        )
+
+
+class PrestartTests(SimpleTestCase):
+    """Test skipping unchanged collectstatic and migrate steps."""
+
+    def setUp(self):
+        self.static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.static_root.cleanup)
+
+    def run_prestart(self, plan, *args):
+        with override_settings(STATIC_ROOT=self.static_root.name), \
+                patch('core.management.commands.prestart.call_command') \
+                as patched_call, \
+                patch('core.management.commands.prestart.static_fingerprint',
+                      return_value='abc'), \
+                patch('core.management.commands.prestart.pending_migrations',
+                      return_value=plan):
+            call_command('prestart', *args, stdout=StringIO())
+        return [args[0] for args, _ in patched_call.call_args_list]
+
+    def test_first_start(self):
+        """Test the first start collects static files and migrates."""
+        commands = self.run_prestart(['0001_initial'])
+
+        self.assertEqual(commands, [
+            'wait_for_db', 'collectstatic', 'migrate', 'createcachetable',
+        ])
+
+    def test_unchanged_start(self):
+        """Test a start with nothing changed skips both steps."""
+        self.run_prestart(['0001_initial'])
+
+        commands = self.run_prestart([])
+
+        self.assertEqual(commands, ['wait_for_db', 'createcachetable'])
+
+    def test_force(self):
+        """Test --force runs both steps regardless."""
+        self.run_prestart([])
+
+        commands = self.run_prestart([], '--force')
+
+        self.assertEqual(commands, [
+            'wait_for_db', 'collectstatic', 'migrate', 'createcachetable',
+        ])
+
+    def test_static_fingerprint_tracks_files(self):
+        """Test the fingerprint changes with the static files."""
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(STATICFILES_DIRS=[directory]):
+                before = startup.static_fingerprint()
+                with open(f'{directory}/app.css', 'w') as handle:
+                    handle.write('body {}')
+                after = startup.static_fingerprint()
+
+        self.assertNotEqual(before, after)
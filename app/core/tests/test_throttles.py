@@ -0,0 +1,156 @@
+"""
+Tests for the token bucket request budgets.
+"""
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import throttles
+from core.models import Server
+
+SERVERS_URL = reverse("server:server-list")
+TAGS_URL = reverse("server:tag-list")
+
+
+def rates(**scopes):
+    """Return REST_FRAMEWORK settings with the given throttle rates."""
+    return {
+        **settings.REST_FRAMEWORK,
+        "DEFAULT_THROTTLE_RATES": {
+            **settings.REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"],
+            **scopes,
+        },
+    }
+
+
+class TokenBucketTests(SimpleTestCase):
+    """Test the GCRA token bucket."""
+
+    def test_parse_rate(self):
+        """Test rates with and without an explicit burst."""
+        self.assertEqual(throttles.parse_rate("60/min"), (60, 60, 60))
+        self.assertEqual(throttles.parse_rate("10/s:3"), (10, 1, 3))
+        self.assertEqual(
+            throttles.parse_rate("100/hour:20"), (100, 3600, 20),
+        )
+
+    def test_burst_then_refill(self):
+        """Test a bucket allows its burst, then refills over time."""
+        store = throttles.LocalStore()
+        results = [
+            throttles.take(store, "k", 60, 60, 3, now=100.0)
+            for _ in range(4)
+        ]
+
+        self.assertEqual([r.remaining for r in results[:3]], [2, 1, 0])
+        self.assertIsNone(results[2].retry_after)
+        self.assertAlmostEqual(results[3].retry_after, 1.0)
+
+        later = throttles.take(store, "k", 60, 60, 3, now=101.0)
+        self.assertIsNone(later.retry_after)
+        self.assertEqual(later.remaining, 0)
+
+    def test_local_store_culls_full_buckets(self):
+        """Test buckets that refilled are dropped when the store is full."""
+        store = throttles.LocalStore(max_entries=2)
+        store.set("old", 1.0, 1)
+        store.set("new", 10 ** 12, 1)
+        store.set("newer", 10 ** 12, 1)
+
+        self.assertIsNone(store.get("old"))
+        self.assertIsNotNone(store.get("newer"))
+
+
+class RequestBudgetTests(TestCase):
+    """Test request budgets on the API."""
+
+    def setUp(self):
+        throttles.LOCAL_STORE.clear()
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com",
+            password="test123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        throttles.LOCAL_STORE.clear()
+
+    @override_settings(REST_FRAMEWORK=rates(read="2/min"))
+    def test_reads_limited_with_headers(self):
+        """Test reads past the budget get 429 with Retry-After."""
+        first = self.client.get(SERVERS_URL)
+        second = self.client.get(SERVERS_URL)
+        third = self.client.get(SERVERS_URL)
+
+        self.assertEqual(first["RateLimit-Limit"], "2")
+        self.assertEqual(first["RateLimit-Remaining"], "1")
+        self.assertEqual(second["RateLimit-Remaining"], "0")
+        self.assertEqual(third.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(third["Retry-After"], "30")
+
+    @override_settings(REST_FRAMEWORK=rates(read="1/min"))
+    def test_budgets_per_endpoint_and_user(self):
+        """Test endpoints and users have buckets of their own."""
+        self.client.get(SERVERS_URL)
+
+        self.assertEqual(
+            self.client.get(TAGS_URL).status_code, status.HTTP_200_OK,
+        )
+        other = APIClient()
+        other.force_authenticate(get_user_model().objects.create_user(
+            email="other@example.com",
+            password="test123",
+        ))
+        self.assertEqual(
+            other.get(SERVERS_URL).status_code, status.HTTP_200_OK,
+        )
+
+    @override_settings(REST_FRAMEWORK=rates(
+        read="1/min", write="5/min", upload_image="1/min",
+    ))
+    def test_separate_read_write_and_upload_budgets(self):
+        """Test writes and image uploads do not spend the read budget."""
+        self.client.get(SERVERS_URL)
+        res = self.client.post(
+            SERVERS_URL, {"title": "Gaming", "price": "5.00"},
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        server = Server.objects.create(
+            user=self.user, title="Video", price=Decimal("5.00"),
+        )
+        url = reverse("server:server-upload-image", args=[server.id])
+        first = self.client.post(url, {"image": "notanimage"})
+        second = self.client.post(url, {"image": "notanimage"})
+
+        self.assertEqual(first.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            second.status_code, status.HTTP_429_TOO_MANY_REQUESTS,
+        )
+
+    @override_settings(
+        REST_FRAMEWORK=rates(read="1/min"), THROTTLE_STORE="throttle",
+    )
+    def test_shared_store(self):
+        """Test buckets can live in a shared cache."""
+        caches["throttle"].clear()
+
+        with patch.object(throttles, "LOCAL_STORE") as local:
+            self.client.get(SERVERS_URL)
+            res = self.client.get(SERVERS_URL)
+
+        local.get.assert_not_called()
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
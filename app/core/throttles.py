@@ -0,0 +1,160 @@
+"""
+Token bucket request budgets per user and endpoint.
+
+Buckets use GCRA: a bucket is the single timestamp at which it would be
+full again, so a request costs one read and one write, and no counter
+needs a lock or a refill timer. Each scope has a rate and a burst, written
+``"<requests>/<period>"`` or ``"<requests>/<period>:<burst>"`` in
+DEFAULT_THROTTLE_RATES; the burst defaults to the number of requests.
+
+Buckets live in the process (the default, THROTTLE_STORE = "local") or in
+a cache alias shared by every process. Neither store is transactional:
+concurrent requests for one bucket may each pass on the same token, which
+lets through at most one extra request per racing thread.
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """Return (requests, period seconds, burst) of a rate string."""
+    rate, _, burst = rate.partition(":")
+    requests, period = rate.split("/")
+    requests = int(requests)
+    return requests, PERIODS[period[0]], int(burst or requests)
+
+
+class LocalStore:
+    """Bucket timestamps kept in this process."""
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._buckets = {}
+        self._cull_lock = threading.Lock()
+
+    def get(self, key):
+        return self._buckets.get(key)
+
+    def set(self, key, value, timeout):
+        self._buckets[key] = value
+        if len(self._buckets) > self.max_entries:
+            self._cull()
+
+    def _cull(self):
+        """Drop buckets that are full again, which hold no state."""
+        if not self._cull_lock.acquire(blocking=False):
+            return
+        try:
+            now = time.time()
+            for key, value in list(self._buckets.items()):
+                if value <= now:
+                    self._buckets.pop(key, None)
+        finally:
+            self._cull_lock.release()
+
+    def clear(self):
+        self._buckets.clear()
+
+
+class CacheStore:
+    """Bucket timestamps kept in a cache shared by all processes."""
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def get(self, key):
+        return caches[self.alias].get(key)
+
+    def set(self, key, value, timeout):
+        caches[self.alias].set(key, value, timeout)
+
+    def clear(self):
+        caches[self.alias].clear()
+
+
+LOCAL_STORE = LocalStore()
+
+
+def get_store():
+    """Return the store configured by THROTTLE_STORE."""
+    if settings.THROTTLE_STORE == "local":
+        return LOCAL_STORE
+    return CacheStore(settings.THROTTLE_STORE)
+
+
+class RateLimit:
+    """State of a bucket after a request, for the rate limit headers."""
+
+    def __init__(self, limit, remaining, reset, retry_after=None):
+        self.limit = limit
+        self.remaining = remaining
+        self.reset = reset
+        self.retry_after = retry_after
+
+
+def take(store, key, requests, period, burst, now=None):
+    """Take a token from a bucket; return its RateLimit.
+
+    ``retry_after`` is set when the bucket is empty and the request must
+    be refused.
+    """
+    now = time.time() if now is None else now
+    interval = period / requests
+    capacity = interval * burst
+    full_at = max(store.get(key) or now, now)
+    next_full_at = full_at + interval
+    if next_full_at - now > capacity:
+        return RateLimit(
+            burst, 0, math.ceil(full_at - now),
+            retry_after=next_full_at - capacity - now,
+        )
+    store.set(key, next_full_at, math.ceil(next_full_at - now))
+    remaining = int((capacity - (next_full_at - now)) // interval)
+    return RateLimit(burst, remaining, math.ceil(next_full_at - now))
+
+
+class RequestBudgetThrottle(BaseThrottle):
+    """Token bucket per user (or client IP) and endpoint.
+
+    Safe requests use the ``read`` scope and the others ``write``; views
+    give an action its own budget through ``throttle_scopes``.
+    """
+
+    def get_scope(self, request, view):
+        scopes = getattr(view, "throttle_scopes", {})
+        action = getattr(view, "action", None)
+        if action in scopes:
+            return scopes[action]
+        return "read" if request.method in SAFE_METHODS else "write"
+
+    def get_ident_for(self, request):
+        if request.user and request.user.is_authenticated:
+            return f"user:{request.user.pk}"
+        return f"ip:{self.get_ident(request)}"
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(request, view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if rate is None:
+            return True
+        key = (
+            f"bucket:{scope}:{view.__class__.__name__}:"
+            f"{self.get_ident_for(request)}"
+        )
+        self.limit = take(get_store(), key, *parse_rate(rate))
+        request._request.rate_limit = self.limit
+        return self.limit.retry_after is None
+
+    def wait(self):
+        return math.ceil(self.limit.retry_after)
@@ -0,0 +1,67 @@
+"""
+Operational views for the app.
+"""
+import ipaddress
+
+from django.conf import settings
+from django.http import (
+    HttpResponse,
+    HttpResponseForbidden,
+    JsonResponse,
+)
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+
+from core.health import READINESS
+from core.metrics import SHARED
+
+
+def metrics_allowed(request):
+    """Return whether the request may read the metrics.
+
+    Scrapers either connect from METRICS_ALLOWED_IPS or send
+    METRICS_TOKEN as a bearer token; staff users may read them too.
+    """
+    token = settings.METRICS_TOKEN
+    keyword, _, key = request.headers.get('Authorization', '').partition(' ')
+    if token and keyword.lower() == 'bearer' and constant_time_compare(
+        key, token,
+    ):
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        address = None
+    if address is not None and any(
+        address in ipaddress.ip_network(network, strict=False)
+        for network in settings.METRICS_ALLOWED_IPS
+    ):
+        return True
+    return request.user.is_authenticated and request.user.is_staff
+
+
+@require_GET
+def metrics(request):
+    """Expose the metrics of every worker in Prometheus text format."""
+    if not metrics_allowed(request):
+        return HttpResponseForbidden('forbidden', content_type='text/plain')
+    return HttpResponse(
+        SHARED.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+
+@require_GET
+def healthz(request):
+    """Liveness probe: the process is up and serving requests."""
+    return HttpResponse('ok', content_type='text/plain')
+
+
+@require_GET
+def readyz(request):
+    """Readiness probe: the database and media volume are usable."""
+    ready, checks = READINESS.get()
+    return JsonResponse(
+        {'status': 'ok' if ready else 'unavailable', 'checks': checks},
+        status=200 if ready else 503,
+    )
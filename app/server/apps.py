@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class ServerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'server'
+
+    def ready(self):
+        from server import (
+            changes,
+            stats,
+        )
+
+        stats.connect()
+        changes.connect()
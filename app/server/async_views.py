@@ -0,0 +1,88 @@
+"""
+Async entry points for the I/O-bound server endpoints.
+
+Under ASGI, Django runs every sync view on one shared thread per process
+and the server reads request bodies without holding a thread. These
+wrappers run the DRF views in the executor's thread pool instead, so slow
+uploads and long exports proceed concurrently without blocking the other
+requests of the process. They are routed when ``ASYNC_VIEWS`` is enabled.
+
+Django 3.2 iterates streaming responses on the event loop, where the ORM
+cannot run, so streamed bodies (the CSV export) are built in memory by
+the thread instead. Bodies over ASYNC_BUFFER_MAX_BYTES are refused with
+400, bounding the memory a request takes; larger exports need filters,
+or the uwsgi deployment, which streams them.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import (
+    HttpResponse,
+    JsonResponse,
+)
+
+from server.views import ServerViewSet
+
+
+def _run_view(view, request, *args, **kwargs):
+    """Run a sync view to a fully rendered, non-streaming response."""
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, "render"):
+            response.render()
+        if response.streaming:
+            response = _buffer(response)
+        return response
+    finally:
+        close_old_connections()
+
+
+def _buffer(response):
+    """Return a streaming response built in memory, or 400 if too large."""
+    parts = []
+    size = 0
+    try:
+        for part in response:
+            size += len(part)
+            if size > settings.ASYNC_BUFFER_MAX_BYTES:
+                return JsonResponse({
+                    "detail": "Response too large to serve here, narrow "
+                              "it with filters.",
+                }, status=400)
+            parts.append(part)
+    finally:
+        response.close()
+    buffered = HttpResponse(b"".join(parts), status=response.status_code)
+    for header, value in response.items():
+        buffered[header] = value
+    return buffered
+
+
+def run_in_thread_pool(view):
+    """Wrap a sync view so ASGI runs it in the shared thread pool."""
+    run = sync_to_async(_run_view, thread_sensitive=False)
+
+    @functools.wraps(view)
+    async def async_view(request, *args, **kwargs):
+        return await run(view, request, *args, **kwargs)
+
+    return async_view
+
+
+upload_image = run_in_thread_pool(
+    ServerViewSet.as_view(
+        {"post": "upload_image"},
+        detail=True,
+        basename="server",
+    )
+)
+export = run_in_thread_pool(
+    ServerViewSet.as_view(
+        {"get": "export"},
+        detail=False,
+        basename="server",
+    )
+)
@@ -0,0 +1,256 @@
+"""
+Change feed of a user's servers, tags and components.
+
+Signal handlers append a Change row on every write, including changes to
+the tags and components linked to a server; the row id is the change
+sequence number. Clients read the changes after an opaque cursor, so
+syncing costs what changed rather than the whole inventory.
+
+Writes made of several saves (a server with its tags and components, a
+purge batch) run inside ``batched()``, which collects their changes and
+inserts them with one query.
+
+Changes are also published to the live streams of ``server.events``.
+
+Only changes older than CHANGE_FEED_SETTLE seconds are served, giving
+transactions that took a lower sequence number time to commit before a
+cursor moves past it. Rows older than CHANGE_RETENTION seconds are
+removed by ``prune_changes``; a cursor whose next unread change may have
+been pruned asks for a resync.
+"""
+import contextvars
+import functools
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.db.models import Max
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+)
+from django.utils import timezone
+
+from core.models import (
+    Change,
+    Component,
+    Server,
+    Tag,
+)
+from server import events
+
+
+SALT = "server.changes"
+KINDS = {
+    Server: Change.SERVER,
+    Tag: Change.TAG,
+    Component: Change.COMPONENT,
+}
+
+
+class InvalidCursor(Exception):
+    """Cursor that was not issued by the feed."""
+
+
+_batch = contextvars.ContextVar("change_batch", default=None)
+
+
+def write(changes):
+    """Insert Change rows, dropping repeats, and publish them on commit."""
+    unique = {}
+    for change in changes:
+        key = (change.user_id, change.kind, change.object_id)
+        unique.pop(key, None)
+        unique[key] = change
+    Change.objects.bulk_create(unique.values())
+
+    published = {}
+    for change in unique.values():
+        published.setdefault(change.user_id, []).append({
+            "kind": change.kind,
+            "id": change.object_id,
+            "deleted": change.deleted,
+        })
+    for user_id, user_changes in published.items():
+        transaction.on_commit(
+            functools.partial(events.publish, user_id, user_changes),
+        )
+
+
+@contextmanager
+def batched():
+    """Collect the changes recorded in the block and write them at once.
+
+    The changes are written when the block exits without error, so the
+    block should run in the transaction of its writes. Nested blocks
+    join the outer one.
+    """
+    if _batch.get() is not None:
+        yield
+        return
+    pending = []
+    token = _batch.set(pending)
+    try:
+        yield
+    finally:
+        _batch.reset(token)
+    if pending:
+        write(pending)
+
+
+def record(user_id, kind, object_ids, deleted=False):
+    """Append changes of objects of one kind to a user's feed."""
+    changes = [
+        Change(
+            user_id=user_id,
+            kind=kind,
+            object_id=object_id,
+            deleted=deleted,
+        )
+        for object_id in object_ids
+    ]
+    pending = _batch.get()
+    if pending is not None:
+        pending.extend(changes)
+    elif changes:
+        write(changes)
+
+
+def object_saved(sender, instance, **kwargs):
+    """Record a created, updated or marked deleted object (post_save)."""
+    deleted = getattr(instance, "deleted_at", None) is not None
+    record(instance.user_id, KINDS[sender], [instance.pk], deleted=deleted)
+
+
+def object_deleted(sender, instance, **kwargs):
+    """Record the tombstone of a deleted object (post_delete)."""
+    record(instance.user_id, KINDS[sender], [instance.pk], deleted=True)
+
+
+def links_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Record servers whose tags or components changed (m2m_changed).
+
+    ``instance`` is the server, or the tag or component when the change
+    is made from their side (reverse).
+    """
+    if not reverse:
+        if action in ("post_add", "post_remove") and pk_set:
+            record(instance.user_id, Change.SERVER, [instance.pk])
+        elif action == "post_clear":
+            record(instance.user_id, Change.SERVER, [instance.pk])
+        return
+
+    field = "tag_id" if sender is Server.tags.through else "component_id"
+    if action in ("post_add", "post_remove") and pk_set:
+        record(instance.user_id, Change.SERVER, sorted(pk_set))
+    elif action == "pre_clear":
+        instance._changes_cleared = list(
+            sender.objects.filter(**{field: instance.pk})
+            .values_list("server_id", flat=True)
+        )
+    elif action == "post_clear":
+        cleared = instance.__dict__.pop("_changes_cleared", [])
+        record(instance.user_id, Change.SERVER, cleared)
+
+
+def connect():
+    """Connect the change recording handlers to the model signals."""
+    for model in KINDS:
+        post_save.connect(object_saved, sender=model)
+        post_delete.connect(object_deleted, sender=model)
+    m2m_changed.connect(links_changed, sender=Server.tags.through)
+    m2m_changed.connect(links_changed, sender=Server.components.through)
+
+
+def make_cursor(seq, since=None):
+    """Return the opaque cursor of a sequence number.
+
+    ``since`` is the time of the oldest change the cursor has still to
+    read, and the cursor expires when that change is pruned. It defaults
+    to the oldest change not settled yet.
+    """
+    if since is None:
+        since = time.time() - settings.CHANGE_FEED_SETTLE
+    return signing.dumps({"seq": seq, "since": int(since)}, salt=SALT)
+
+
+def read_cursor(cursor):
+    """Return the sequence number of a cursor, or None if it expired."""
+    try:
+        data = signing.loads(cursor, salt=SALT)
+        seq, since = int(data["seq"]), int(data["since"])
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        raise InvalidCursor(cursor)
+    if time.time() - since >= settings.CHANGE_RETENTION:
+        return None
+    return seq
+
+
+def settled_changes(user):
+    """Return the user's changes old enough to be served."""
+    cutoff = timezone.now() - timedelta(seconds=settings.CHANGE_FEED_SETTLE)
+    return Change.objects.filter(user=user, changed_at__lte=cutoff)
+
+
+def head(user):
+    """Return the sequence number of the user's latest served change."""
+    return settled_changes(user).aggregate(seq=Max("id"))["seq"] or 0
+
+
+class ChangePage:
+    """Objects changed and deleted in one page of the feed."""
+
+    def __init__(self, seq, more, since=None):
+        self.seq = seq
+        self.more = more
+        # Time of the oldest change left to read when there are more.
+        self.since = since
+        self.changed = {kind: [] for kind, _ in Change.KINDS}
+        self.deleted = {kind: [] for kind, _ in Change.KINDS}
+
+
+def read_changes(user, seq, limit):
+    """Return the page of the user's changes after a sequence number.
+
+    An object changed several times in the page is reported once, as
+    changed or deleted depending on its latest change.
+    """
+    rows = list(
+        settled_changes(user)
+        .filter(id__gt=seq)
+        .order_by("id")
+        .values_list(
+            "id", "kind", "object_id", "deleted", "changed_at",
+        )[:limit + 1]
+    )
+    page = ChangePage(seq, more=len(rows) > limit)
+    if page.more:
+        page.since = rows[limit][4].timestamp()
+    rows = rows[:limit]
+    if rows:
+        page.seq = rows[-1][0]
+
+    latest = {}
+    for _, kind, object_id, deleted, _ in rows:
+        latest.pop((kind, object_id), None)
+        latest[(kind, object_id)] = deleted
+    for (kind, object_id), deleted in latest.items():
+        if deleted:
+            page.deleted[kind].append(object_id)
+        else:
+            page.changed[kind].append(object_id)
+    return page
+
+
+def prune(older_than=None):
+    """Delete changes older than the retention; return how many."""
+    if older_than is None:
+        older_than = timezone.now() - timedelta(
+            seconds=settings.CHANGE_RETENTION,
+        )
+    deleted, _ = Change.objects.filter(changed_at__lt=older_than).delete()
+    return deleted
@@ -0,0 +1,242 @@
+"""
+Server-Sent Events stream of a user's inventory changes.
+
+Every change recorded for the change feed (``server.changes``) is also
+published, once its transaction commits, to the subscribers of its user.
+``events_application`` is the ASGI app streaming them; ``app.asgi``
+routes ``EVENTS_PATH`` to it ahead of Django.
+
+The broker is a fan-out within the process, standing in for a shared
+broker: streams only see changes written by the same process, so the
+stream needs an ASGI deployment running a single worker, which serves
+the writes too (``scripts/run_asgi.sh`` refuses more). Each
+subscriber has a bounded queue. A consumer too slow to keep up has its
+pending events replaced by one ``reset`` event, telling it to catch up
+through the change feed, instead of growing the queue without bound.
+
+Streams authenticate with the ``Authorization`` header or, since
+EventSource cannot set headers, with a ``ticket`` query parameter: a
+signed user id valid for EVENTS_TICKET_TTL seconds and only accepted
+here, issued by ``EventTicketView``. Tokens never appear in the URL, so
+they stay out of access logs.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+
+from rest_framework import exceptions
+
+from user.authentication import (
+    SignedTokenAuthentication,
+    get_active_user,
+)
+
+
+RESET = {"type": "reset"}
+TICKET_SALT = "server.events.ticket"
+
+
+class Subscriber:
+    """Bounded queue of the events of one stream."""
+
+    def __init__(self, user_id, loop, size):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=size)
+        self.overflows = 0
+
+    def offer(self, event):
+        """Queue an event, or a reset if the consumer fell behind."""
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.overflows += 1
+            event = RESET
+        self.queue.put_nowait(event)
+
+
+class Broker:
+    """In-process fan-out of events to the subscribers of each user."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, user_id):
+        """Return a subscriber for the running loop, or None when full."""
+        with self._lock:
+            total = sum(len(subs) for subs in self._subscribers.values())
+            if total >= settings.EVENTS_MAX_SUBSCRIBERS:
+                return None
+            subscriber = Subscriber(
+                user_id,
+                asyncio.get_running_loop(),
+                settings.EVENTS_QUEUE_SIZE,
+            )
+            self._subscribers[user_id].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            subs = self._subscribers.get(subscriber.user_id, set())
+            subs.discard(subscriber)
+            if not subs:
+                self._subscribers.pop(subscriber.user_id, None)
+
+    def publish(self, user_id, events):
+        """Hand events to the user's subscribers, from any thread."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscriber in subscribers:
+            for event in events:
+                try:
+                    subscriber.loop.call_soon_threadsafe(
+                        subscriber.offer, event,
+                    )
+                except RuntimeError:
+                    # The stream's loop is closed; it is going away.
+                    self.unsubscribe(subscriber)
+                    break
+
+
+BROKER = Broker()
+
+
+def publish(user_id, events):
+    """Publish events to the streams of a user."""
+    BROKER.publish(user_id, events)
+
+
+def encode(event):
+    """Return the SSE message of an event."""
+    kind = event.get("type", "change")
+    data = json.dumps(
+        {key: value for key, value in event.items() if key != "type"},
+        separators=(",", ":"),
+    )
+    return f"event: {kind}\ndata: {data}\n\n".encode()
+
+
+def issue_ticket(user):
+    """Return a short-lived ticket opening a stream for the user."""
+    return signing.dumps(user.pk, salt=TICKET_SALT)
+
+
+def _ticket_user(ticket):
+    """Return the active user of a ticket, or None."""
+    try:
+        user_id = signing.loads(
+            ticket, salt=TICKET_SALT, max_age=settings.EVENTS_TICKET_TTL,
+        )
+    except signing.BadSignature:
+        return None
+    return get_active_user(user_id)
+
+
+def _token_user(key):
+    """Return the active user of a token, or None."""
+    try:
+        user, _ = SignedTokenAuthentication().authenticate_credentials(key)
+    except exceptions.AuthenticationFailed:
+        return None
+    return user
+
+
+def _authenticate(scope):
+    """Return the user of the request's token header or ticket, or None."""
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            keyword, _, key = value.decode("latin-1").partition(" ")
+            if keyword.lower() == "token" and key:
+                return _token_user(key)
+    query = parse_qs(scope.get("query_string", b"").decode())
+    ticket = query.get("ticket", [None])[0]
+    return ticket and _ticket_user(ticket)
+
+
+def _head_cursor(user):
+    """Return the change feed cursor at the user's latest change."""
+    # Deferred: server.changes publishes through this module.
+    from server import changes
+
+    return changes.make_cursor(changes.head(user))
+
+
+async def _respond(send, status, body):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json")],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _stream(subscriber, send):
+    """Send queued events, with a comment line when the stream is idle."""
+    while True:
+        try:
+            event = await asyncio.wait_for(
+                subscriber.queue.get(), settings.EVENTS_HEARTBEAT,
+            )
+        except asyncio.TimeoutError:
+            body = b": ping\n\n"
+        else:
+            body = encode(event)
+        await send({
+            "type": "http.response.body",
+            "body": body,
+            "more_body": True,
+        })
+
+
+async def _until_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def events_application(scope, receive, send):
+    """ASGI app streaming the changes of the authenticated user."""
+    user = await sync_to_async(_authenticate)(scope)
+    if not user:
+        await _respond(send, 401, b'{"detail":"Invalid token or ticket."}')
+        return
+
+    subscriber = BROKER.subscribe(user.id)
+    if subscriber is None:
+        await _respond(send, 503, b'{"detail":"Too many streams."}')
+        return
+    try:
+        cursor = await sync_to_async(_head_cursor)(user)
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+            ],
+        })
+        await send({
+            "type": "http.response.body",
+            "body": encode({"type": "ready", "cursor": cursor}),
+            "more_body": True,
+        })
+        tasks = [
+            asyncio.ensure_future(_stream(subscriber, send)),
+            asyncio.ensure_future(_until_disconnect(receive)),
+        ]
+        done, pending = await asyncio.wait(
+            tasks, return_when=asyncio.FIRST_COMPLETED,
+        )
+        for task in pending:
+            task.cancel()
+        for task in done:
+            task.result()
+    finally:
+        BROKER.unsubscribe(subscriber)
@@ -0,0 +1,46 @@
+"""
+CSV export of servers.
+"""
+import csv
+
+
+EXPORT_FIELDS = [
+    "id",
+    "title",
+    "price",
+    "link",
+    "description",
+    "tags",
+    "components",
+]
+
+
+class _Echo:
+    """File-like object returning what is written, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def server_csv_rows(queryset, batch_size=500):
+    """Yield CSV lines for the servers, read in keyset pages by id."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+
+    queryset = queryset.order_by("-id")
+    page = queryset
+    while True:
+        batch = list(page[:batch_size])
+        if not batch:
+            return
+        for server in batch:
+            yield writer.writerow([
+                server.id,
+                server.title,
+                server.price,
+                server.link,
+                server.description,
+                ";".join(tag.name for tag in server.tags.all()),
+                ";".join(comp.name for comp in server.components.all()),
+            ])
+        page = queryset.filter(id__lt=batch[-1].id)
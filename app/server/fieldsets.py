@@ -0,0 +1,63 @@
+"""
+Sparse fieldsets for the server endpoints.
+
+Clients choose the fields of a response with query parameters:
+
+* ``fields=id,title`` returns only the named fields,
+* ``omit=tags`` drops fields from the default set,
+* ``expand=description`` adds fields left out by default.
+
+The view trims its queryset to the chosen fields as well, so omitted
+relations are not prefetched and omitted columns are not read.
+"""
+from rest_framework.exceptions import ValidationError
+
+
+def parse_names(value):
+    """Return the field names of a comma separated parameter."""
+    if not value:
+        return []
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+def select_fields(params, available, default):
+    """Return the fields of available chosen by the query parameters.
+
+    ``default`` are the fields returned when no parameter is given;
+    names outside ``available`` are rejected.
+    """
+    chosen = {
+        param: parse_names(params.get(param))
+        for param in ("fields", "omit", "expand")
+    }
+    unknown = {}
+    for param, names in chosen.items():
+        extra = sorted(set(names) - set(available))
+        if extra:
+            unknown[param] = f"Unknown fields: {', '.join(extra)}."
+    if unknown:
+        raise ValidationError(unknown)
+
+    if chosen["fields"]:
+        wanted = set(chosen["fields"])
+    else:
+        wanted = set(default) | set(chosen["expand"])
+    wanted -= set(chosen["omit"])
+    return [name for name in available if name in wanted]
+
+
+class SparseFieldsMixin:
+    """Serializer mixin keeping only the fields chosen for the request.
+
+    The view puts the chosen names in the ``fields`` context key; without
+    it every field is serialized.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        names = self.context.get("fields")
+        if names is None:
+            return fields
+        return {
+            name: field for name, field in fields.items() if name in names
+        }
@@ -1,34 +1,110 @@
 """
 Serializers for server APIs
 """
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+
 from rest_framework import serializers
 
+from core.instrumentation import (
+    TimedSerializerMixin,
+    TimedListSerializer,
+)
 from core.models import (
     Server,
     Tag,
     Component,
 )
-
-
-class ComponentSerializer(serializers.ModelSerializer):
+from server import changes
+from server.fieldsets import SparseFieldsMixin
+
+
+def ids_for_names(model, user, names):
+    """Return the user's ids for names, creating missing objects.
+
+    Existing names are found with one query; only missing ones are
+    created one by one.
+    """
+    names = list(dict.fromkeys(names))
+    if not names:
+        return []
+    ids = {}
+    for obj_id, name in (
+        model.objects.filter(user=user, name__in=names)
+        .order_by("id")
+        .values_list("id", "name")
+    ):
+        ids.setdefault(name, obj_id)
+    for name in names:
+        if name not in ids:
+            obj, _ = model.objects.get_or_create(user=user, name=name)
+            ids[name] = obj.id
+    return [ids[name] for name in names]
+
+
+class ProtectedImageField(serializers.ImageField):
+    """Image field linking to the access checked image endpoint."""
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        url = reverse("server:server-image", args=[value.instance.pk])
+        request = self.context.get("request")
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+
+class ComponentSerializer(
+    TimedSerializerMixin,
+    serializers.ModelSerializer,
+):
     """Serializer for components."""
 
     class Meta:
         model = Component
         fields = ["id", "name"]
         read_only_fields = ["id"]
+        list_serializer_class = TimedListSerializer
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(
+    TimedSerializerMixin,
+    serializers.ModelSerializer,
+):
     """Serializer for tags."""
 
     class Meta:
         model = Tag
         fields = ["id", "name"]
         read_only_fields = ["id"]
+        list_serializer_class = TimedListSerializer
+
+
+class ComponentUsageSerializer(ComponentSerializer):
+    """Serializer for components with the number of servers using them."""
+
+    server_count = serializers.IntegerField(read_only=True)
+
+    class Meta(ComponentSerializer.Meta):
+        fields = ComponentSerializer.Meta.fields + ["server_count"]
 
 
-class ServerSerializer(serializers.ModelSerializer):
+class TagUsageSerializer(TagSerializer):
+    """Serializer for tags with the number of servers using them."""
+
+    server_count = serializers.IntegerField(read_only=True)
+
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ["server_count"]
+
+
+class ServerSerializer(
+    SparseFieldsMixin,
+    TimedSerializerMixin,
+    serializers.ModelSerializer,
+):
     """Serializer for servers."""
 
     tags = TagSerializer(many=True, required=False)
@@ -45,34 +121,30 @@ class ServerSerializer(serializers.ModelSerializer):
             "components",
         ]
         read_only_fields = ["id"]
+        list_serializer_class = TimedListSerializer
 
     def _get_or_create_tags(self, tags, server):
         """Handle getting or creating tags as needed."""
         auth_user = self.context["request"].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag,
-            )
-            server.tags.add(tag_obj)
+        server.tags.add(*ids_for_names(
+            Tag, auth_user, [tag["name"] for tag in tags],
+        ))
 
     def _get_or_create_components(self, components, server):
         """Handle getting or creating components as needed."""
         auth_user = self.context["request"].user
-        for component in components:
-            component_obj, created = Component.objects.get_or_create(
-                user=auth_user,
-                **component,
-            )
-            server.components.add(component_obj)
+        server.components.add(*ids_for_names(
+            Component, auth_user, [item["name"] for item in components],
+        ))
 
     def create(self, validated_data):
         """Create a server."""
         tags = validated_data.pop("tags", [])
         components = validated_data.pop("components", [])
-        server = Server.objects.create(**validated_data)
-        self._get_or_create_tags(tags, server)
-        self._get_or_create_components(components, server)
+        with transaction.atomic(), changes.batched():
+            server = Server.objects.create(**validated_data)
+            self._get_or_create_tags(tags, server)
+            self._get_or_create_components(components, server)
 
         return server
 
@@ -80,32 +152,65 @@ class ServerSerializer(serializers.ModelSerializer):
         """Update server."""
         tags = validated_data.pop("tags", None)
         components = validated_data.pop('components', None)
-        if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
-        if components is not None:
-            instance.components.clear()
-            self._get_or_create_components(components, instance)
-
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-
-        instance.save()
+        with transaction.atomic(), changes.batched():
+            if tags is not None:
+                instance.tags.clear()
+                self._get_or_create_tags(tags, instance)
+            if components is not None:
+                instance.components.clear()
+                self._get_or_create_components(components, instance)
+
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+
+            instance.save()
         return instance
 
 
 class ServerDetailSerializer(ServerSerializer):
     """Serializer for server detail view."""
 
+    image = ProtectedImageField(required=False, allow_null=True)
+
     class Meta(ServerSerializer.Meta):
         fields = ServerSerializer.Meta.fields + ["description", "image"]
 
 
+class ServerChangeSerializer(serializers.ModelSerializer):
+    """Serializer for servers in the change feed, with related IDs."""
+
+    image = ProtectedImageField(read_only=True)
+
+    class Meta:
+        model = Server
+        fields = ServerDetailSerializer.Meta.fields
+        read_only_fields = fields
+
+
+class ServerBatchSerializer(serializers.Serializer):
+    """Serializer for the IDs of a batch server retrieve."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+    )
+
+    def validate_ids(self, ids):
+        """Limit the number of IDs to SERVER_BATCH_MAX_IDS."""
+        limit = settings.SERVER_BATCH_MAX_IDS
+        if len(ids) > limit:
+            raise serializers.ValidationError(
+                f"Ensure this field has no more than {limit} elements."
+            )
+        return ids
+
+
 class ServerImageSerializer(serializers.ModelSerializer):
     """Serializer for uploading images to servers."""
 
+    image = ProtectedImageField(required=True)
+
     class Meta:
         model = Server
         fields = ['id', 'image']
         read_only_fields = ['id']
-        extra_kwargs = {'image': {'required': 'True'}}
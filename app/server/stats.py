@@ -0,0 +1,285 @@
+"""
+Per-user server statistics kept as rollups in ServerStat.
+
+Signal handlers adjust the counts on every write path of servers and their
+tags and components, so reading the statistics costs one row per tag,
+component and price bucket instead of a scan of the servers. Writes that
+skip signals (bulk_create, raw SQL) are repaired by ``reconcile``.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import (
+    Case,
+    CharField,
+    Count,
+    F,
+    Value,
+    When,
+)
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_init,
+    post_save,
+    pre_delete,
+)
+
+from core.models import (
+    Component,
+    Server,
+    ServerStat,
+    Tag,
+)
+
+
+def _buckets():
+    """Yield the label and upper bound of each price bucket."""
+    lower = 0
+    for upper in settings.SERVER_PRICE_BUCKETS:
+        yield f"{lower}-{upper}", upper
+        lower = upper
+    yield f"{lower}+", None
+
+
+def bucket_labels():
+    """Return the price bucket labels in ascending order."""
+    return [label for label, _ in _buckets()]
+
+
+def price_bucket(price):
+    """Return the label of the price bucket the price falls in."""
+    for label, upper in _buckets():
+        if upper is None or price < upper:
+            return label
+
+
+def _price_bucket_expression():
+    """Return a database expression computing price_bucket(price)."""
+    *bounded, (last, _) = _buckets()
+    return Case(
+        *[
+            When(price__lt=upper, then=Value(label))
+            for label, upper in bounded
+        ],
+        default=Value(last),
+        output_field=CharField(),
+    )
+
+
+def bump(user_id, dimension, keys, delta):
+    """Add delta to the counts of keys, creating missing rows."""
+    keys = Counter(str(key) for key in keys)
+    if not keys or not delta:
+        return
+    if delta > 0:
+        ServerStat.objects.bulk_create(
+            [
+                ServerStat(user_id=user_id, dimension=dimension, key=key)
+                for key in keys
+            ],
+            ignore_conflicts=True,
+        )
+    for times in set(keys.values()):
+        ServerStat.objects.filter(
+            user_id=user_id,
+            dimension=dimension,
+            key__in=[key for key, count in keys.items() if count == times],
+        ).update(count=F("count") + delta * times)
+
+
+def remember_price(sender, instance, **kwargs):
+    """Keep the price a server was loaded with (post_init)."""
+    instance._stats_price = instance.__dict__.get("price")
+
+
+def server_saved(sender, instance, created, **kwargs):
+    """Move the server between price buckets (post_save)."""
+    new_bucket = price_bucket(instance.price)
+    if created:
+        bump(instance.user_id, ServerStat.PRICE, [new_bucket], 1)
+    elif instance._stats_price is not None:
+        old_bucket = price_bucket(instance._stats_price)
+        if old_bucket != new_bucket:
+            bump(instance.user_id, ServerStat.PRICE, [old_bucket], -1)
+            bump(instance.user_id, ServerStat.PRICE, [new_bucket], 1)
+    instance._stats_price = instance.price
+
+
+def server_deleting(sender, instance, **kwargs):
+    """Note the price, tags and components of a server (pre_delete)."""
+    instance._stats_price = instance.price
+    instance._stats_relations = {
+        ServerStat.TAG: list(instance.tags.values_list("id", flat=True)),
+        ServerStat.COMPONENT: list(
+            instance.components.values_list("id", flat=True)
+        ),
+    }
+
+
+def server_deleted(sender, instance, **kwargs):
+    """Remove a deleted server from its rollups (post_delete)."""
+    bump(
+        instance.user_id,
+        ServerStat.PRICE,
+        [price_bucket(instance._stats_price)],
+        -1,
+    )
+    for dimension, ids in instance._stats_relations.items():
+        bump(instance.user_id, dimension, ids, -1)
+
+
+def attr_deleted(sender, instance, **kwargs):
+    """Drop the rollups of a deleted tag or component (post_delete)."""
+    dimension = ServerStat.TAG if sender is Tag else ServerStat.COMPONENT
+    ServerStat.objects.filter(
+        user_id=instance.user_id,
+        dimension=dimension,
+        key=str(instance.id),
+    ).delete()
+
+
+def relations_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Count tags and components added to or removed from servers.
+
+    ``instance`` is the server, or the tag or component when the change
+    is made from their side (reverse); both belong to the same user.
+    """
+    if sender is Server.tags.through:
+        dimension, field = ServerStat.TAG, "tag_id"
+    else:
+        dimension, field = ServerStat.COMPONENT, "component_id"
+
+    if action == "post_add":
+        ids = [instance.pk] * len(pk_set) if reverse else pk_set
+        bump(instance.user_id, dimension, ids, 1)
+    elif action in ("pre_remove", "pre_clear"):
+        # pk_set may hold ids that are not linked; count only real links.
+        own, other = (field, "server_id") if reverse else ("server_id", field)
+        links = sender.objects.filter(**{own: instance.pk})
+        if action == "pre_remove":
+            links = links.filter(**{f"{other}__in": pk_set})
+        instance._stats_removed = list(links.values_list(field, flat=True))
+    elif action in ("post_remove", "post_clear"):
+        removed = instance.__dict__.pop("_stats_removed", [])
+        bump(instance.user_id, dimension, removed, -1)
+
+
+def connect():
+    """Connect the rollup handlers to the model signals."""
+    post_init.connect(remember_price, sender=Server)
+    post_save.connect(server_saved, sender=Server)
+    pre_delete.connect(server_deleting, sender=Server)
+    post_delete.connect(server_deleted, sender=Server)
+    post_delete.connect(attr_deleted, sender=Tag)
+    post_delete.connect(attr_deleted, sender=Component)
+    m2m_changed.connect(relations_changed, sender=Server.tags.through)
+    m2m_changed.connect(relations_changed, sender=Server.components.through)
+
+
+def user_stats(user):
+    """Return the statistics of a user's servers."""
+    rows = ServerStat.objects.filter(user=user, count__gt=0)
+    counts = {dimension: {} for dimension, _ in ServerStat.DIMENSIONS}
+    for dimension, key, count in rows.values_list(
+        "dimension", "key", "count",
+    ):
+        counts[dimension][key] = count
+
+    def named(model, dimension):
+        names = dict(
+            model.objects.filter(
+                user=user, id__in=list(counts[dimension]),
+            ).values_list("id", "name")
+        )
+        return [
+            {"id": int(key), "name": names[int(key)], "count": count}
+            for key, count in counts[dimension].items()
+            if int(key) in names
+        ]
+
+    prices = counts[ServerStat.PRICE]
+    return {
+        "servers": sum(prices.values()),
+        "tags": named(Tag, ServerStat.TAG),
+        "components": named(Component, ServerStat.COMPONENT),
+        "price_buckets": [
+            {"bucket": bucket, "count": prices[bucket]}
+            for bucket in bucket_labels() if bucket in prices
+        ],
+    }
+
+
+def expected_counts(users=None):
+    """Compute the true rollups from servers and their relations."""
+    servers = Server.objects.all()
+    tag_links = Server.tags.through.objects.all()
+    component_links = Server.components.through.objects.all()
+    if users is not None:
+        servers = servers.filter(user__in=users)
+        tag_links = tag_links.filter(server__user__in=users)
+        component_links = component_links.filter(server__user__in=users)
+
+    expected = {}
+    for user_id, bucket, count in (
+        servers.annotate(bucket=_price_bucket_expression())
+        .values_list("user_id", "bucket")
+        .annotate(count=Count("id"))
+        .order_by()
+    ):
+        expected[(user_id, ServerStat.PRICE, bucket)] = count
+    for links, dimension, field in (
+        (tag_links, ServerStat.TAG, "tag_id"),
+        (component_links, ServerStat.COMPONENT, "component_id"),
+    ):
+        for user_id, key, count in (
+            links.values_list("server__user_id", field)
+            .annotate(count=Count("id"))
+            .order_by()
+        ):
+            expected[(user_id, dimension, str(key))] = count
+    return expected
+
+
+def reconcile(users=None, dry_run=False):
+    """Repair rollups that drifted; return the keys that were wrong."""
+    expected = expected_counts(users)
+    stored = ServerStat.objects.all()
+    if users is not None:
+        stored = stored.filter(user__in=users)
+    actual = {
+        (stat.user_id, stat.dimension, stat.key): stat
+        for stat in stored
+    }
+
+    drift = {}
+    for key, count in expected.items():
+        stat = actual.get(key)
+        if stat is None or stat.count != count:
+            drift[key] = (stat.count if stat else 0, count)
+    for key, stat in actual.items():
+        if key not in expected and stat.count:
+            drift[key] = (stat.count, 0)
+    if dry_run:
+        return drift
+
+    stale = [stat.id for key, stat in actual.items() if key not in expected]
+    ServerStat.objects.filter(id__in=stale).delete()
+    to_update = []
+    to_create = []
+    for key, (_, count) in drift.items():
+        if key not in expected:
+            continue
+        stat = actual.get(key)
+        if stat is None:
+            user_id, dimension, stat_key = key
+            to_create.append(ServerStat(
+                user_id=user_id, dimension=dimension, key=stat_key,
+                count=count,
+            ))
+        else:
+            stat.count = count
+            to_update.append(stat)
+    ServerStat.objects.bulk_create(to_create)
+    ServerStat.objects.bulk_update(to_update, ["count"])
+    return drift
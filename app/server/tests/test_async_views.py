@@ -0,0 +1,53 @@
+"""
+Tests for the async entry points of the server APIs.
+"""
+import asyncio
+
+from asgiref.sync import async_to_sync
+
+from django.http import StreamingHttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    override_settings,
+)
+
+from server import async_views
+from server.views import ServerViewSet
+
+
+def streaming_view(request):
+    """Return a streaming response."""
+    return StreamingHttpResponse(iter([b"a,b\n", b"1,2\n"]))
+
+
+class AsyncViewTests(SimpleTestCase):
+    """Test wrapping sync views for ASGI."""
+
+    def test_wrapped_views_are_async(self):
+        """Test the wrapped views are coroutines that keep DRF metadata."""
+        for view in (async_views.upload_image, async_views.export):
+            self.assertTrue(asyncio.iscoroutinefunction(view))
+            self.assertIs(view.cls, ServerViewSet)
+            self.assertTrue(view.csrf_exempt)
+
+    def test_streaming_response_buffered(self):
+        """Test streaming responses are built in the worker thread."""
+        view = async_views.run_in_thread_pool(streaming_view)
+        request = RequestFactory().get("/")
+
+        response = async_to_sync(view)(request)
+
+        self.assertFalse(response.streaming)
+        self.assertEqual(response.content, b"a,b\n1,2\n")
+
+    @override_settings(ASYNC_BUFFER_MAX_BYTES=6)
+    def test_large_streaming_response_refused(self):
+        """Test a streamed body over the buffer limit is not served."""
+        view = async_views.run_in_thread_pool(streaming_view)
+        request = RequestFactory().get("/")
+
+        response = async_to_sync(view)(request)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(b"too large", response.content)
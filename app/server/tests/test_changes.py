@@ -0,0 +1,246 @@
+"""
+Tests for the server change feed.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import (
+    TestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Change,
+    Server,
+    Tag,
+)
+from server import changes
+
+CHANGES_URL = reverse("server:changes")
+SERVERS_URL = reverse("server:server-list")
+
+
+def create_server(user, **params):
+    """Create and return a sample server."""
+    defaults = {"title": "Gaming Server", "price": Decimal("5.00")}
+    defaults.update(params)
+    return Server.objects.create(user=user, **defaults)
+
+
+@override_settings(CHANGE_FEED_SETTLE=0)
+class ChangeFeedTests(TestCase):
+    """Test syncing servers, tags and components through the feed."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com",
+            password="test123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sync(self, cursor=None):
+        params = {"cursor": cursor} if cursor else {}
+        res = self.client.get(CHANGES_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_first_sync_resets(self):
+        """Test a sync without cursor asks for a full download."""
+        create_server(self.user)
+
+        data = self.sync()
+
+        self.assertTrue(data["reset"])
+        self.assertEqual(data["changed"]["servers"], [])
+        self.assertEqual(self.sync(data["cursor"])["changed"]["servers"], [])
+
+    def test_changes_after_cursor(self):
+        """Test created servers and tags are returned once."""
+        cursor = self.sync()["cursor"]
+        self.client.post(SERVERS_URL, {
+            "title": "Gaming Server",
+            "price": "5.00",
+            "tags": [{"name": "Fast"}],
+        }, format="json")
+
+        data = self.sync(cursor)
+
+        tag = Tag.objects.get(user=self.user)
+        [server] = data["changed"]["servers"]
+        self.assertFalse(data["reset"])
+        self.assertEqual(server["title"], "Gaming Server")
+        self.assertEqual(server["tags"], [tag.id])
+        self.assertEqual(data["changed"]["tags"], [
+            {"id": tag.id, "name": "Fast"},
+        ])
+        again = self.sync(data["cursor"])
+        self.assertEqual(again["changed"]["servers"], [])
+
+    def test_nested_write_records_one_batch(self):
+        """Test a server written with its links records changes at once."""
+        cursor = self.sync()["cursor"]
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(SERVERS_URL, {
+                "title": "Gaming Server",
+                "price": "5.00",
+                "tags": [{"name": "Fast"}, {"name": "Cheap"}],
+                "components": [{"name": "CPU"}],
+            }, format="json")
+
+        inserts = [
+            query for query in queries
+            if query["sql"].startswith('INSERT INTO "core_change"')
+        ]
+        self.assertEqual(len(inserts), 1)
+        data = self.sync(cursor)
+        self.assertEqual(len(data["changed"]["servers"]), 1)
+        self.assertEqual(len(data["changed"]["tags"]), 2)
+        self.assertEqual(len(data["changed"]["components"]), 1)
+
+    def test_deleted_objects_are_tombstones(self):
+        """Test deletes are reported as tombstones, not changes."""
+        server = create_server(self.user)
+        cursor = self.sync()["cursor"]
+        server.title = "Renamed"
+        server.save()
+        server_id = server.id
+        server.delete()
+
+        data = self.sync(cursor)
+
+        self.assertEqual(data["changed"]["servers"], [])
+        self.assertEqual(data["deleted"]["servers"], [server_id])
+
+    def test_reverse_link_changes(self):
+        """Test linking from the tag side records the servers."""
+        server = create_server(self.user)
+        tag = Tag.objects.create(user=self.user, name="Fast")
+        cursor = self.sync()["cursor"]
+
+        tag.server_set.add(server)
+        data = self.sync(cursor)
+        tag.server_set.clear()
+        cleared = self.sync(data["cursor"])
+
+        self.assertEqual(
+            [item["id"] for item in data["changed"]["servers"]], [server.id],
+        )
+        self.assertEqual(
+            [item["id"] for item in cleared["changed"]["servers"]],
+            [server.id],
+        )
+
+    def test_feed_limited_to_user(self):
+        """Test other users' changes are not returned."""
+        other = get_user_model().objects.create_user(
+            email="other@example.com",
+            password="test123",
+        )
+        cursor = self.sync()["cursor"]
+        create_server(other)
+
+        data = self.sync(cursor)
+
+        self.assertEqual(data["changed"]["servers"], [])
+
+    @override_settings(CHANGE_FEED_PAGE_SIZE=2)
+    def test_paging(self):
+        """Test pages follow each other until no change is left."""
+        cursor = self.sync()["cursor"]
+        servers = [create_server(self.user) for _ in range(3)]
+
+        first = self.sync(cursor)
+        second = self.sync(first["cursor"])
+
+        self.assertTrue(first["more"])
+        self.assertFalse(second["more"])
+        self.assertEqual(
+            [item["id"] for item in first["changed"]["servers"]
+             + second["changed"]["servers"]],
+            [server.id for server in servers],
+        )
+
+    @override_settings(CHANGE_FEED_SETTLE=60)
+    def test_recent_changes_wait_to_settle(self):
+        """Test changes newer than the settle delay are held back."""
+        cursor = self.sync()["cursor"]
+        create_server(self.user)
+
+        data = self.sync(cursor)
+
+        self.assertEqual(data["changed"]["servers"], [])
+        self.assertEqual(data["cursor"], cursor)
+
+    def test_invalid_cursor(self):
+        """Test a forged cursor is rejected."""
+        res = self.client.get(CHANGES_URL, {"cursor": "forged"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(CHANGE_RETENTION=60)
+    def test_expired_cursor_resets(self):
+        """Test a cursor older than the retention asks for a resync."""
+        with patch("time.time", return_value=time.time() - 3600):
+            cursor = changes.make_cursor(0)
+
+        self.assertTrue(self.sync(cursor)["reset"])
+
+    @override_settings(CHANGE_RETENTION=3600, CHANGE_FEED_PAGE_SIZE=1)
+    def test_paging_cursor_expires_with_unread_changes(self):
+        """Test a page cursor expires with its oldest unread change."""
+        first = create_server(self.user)
+        create_server(self.user)
+        Change.objects.exclude(object_id=first.id).update(
+            changed_at=timezone.now() - timedelta(seconds=3500),
+        )
+        Change.objects.filter(object_id=first.id).update(
+            changed_at=timezone.now() - timedelta(seconds=3550),
+        )
+        data = self.sync(changes.make_cursor(0))
+        self.assertTrue(data["more"])
+        self.assertFalse(self.sync(data["cursor"])["reset"])
+
+        # Once the unread change falls out of the retention the cursor
+        # expires, however recently it was issued.
+        with self.settings(CHANGE_RETENTION=3450):
+            self.assertTrue(self.sync(data["cursor"])["reset"])
+
+    def test_user_delete(self):
+        """Test deleting a user with servers keeps its tombstones."""
+        server = create_server(self.user)
+        server.tags.add(Tag.objects.create(user=self.user, name="Fast"))
+
+        self.user.delete()
+
+        self.assertTrue(Change.objects.filter(
+            kind=Change.SERVER, object_id=server.id, deleted=True,
+        ).exists())
+
+    def test_prune_changes(self):
+        """Test the command deletes changes past the retention."""
+        create_server(self.user)
+        create_server(self.user)
+        old = Change.objects.order_by("id").first()
+        Change.objects.filter(id=old.id).update(
+            changed_at=timezone.now() - timedelta(days=60),
+        )
+        out = StringIO()
+
+        call_command("prune_changes", stdout=out)
+
+        self.assertFalse(Change.objects.filter(id=old.id).exists())
+        self.assertTrue(Change.objects.exists())
+        self.assertIn("Deleted 1 changes.", out.getvalue())
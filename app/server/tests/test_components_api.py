@@ -4,6 +4,7 @@ Tests for the components API.
 from decimal import Decimal
 
 from django.contrib.auth import get_user_model
+from django.db.models import Count
 from django.urls import reverse
 from django.test import TestCase
 
@@ -15,7 +16,7 @@ from core.models import (
     Server,
 )
 
-from server.serializers import ComponentSerializer
+from server.serializers import ComponentUsageSerializer
 
 
 COMPONENTS_URL = reverse("server:component-list")
@@ -59,8 +60,10 @@ class PrivateComponentsApiTests(TestCase):
 
         res = self.client.get(COMPONENTS_URL)
 
-        components = Component.objects.all().order_by("-name")
-        serializer = ComponentSerializer(components, many=True)
+        components = Component.objects.annotate(
+            server_count=Count("server"),
+        ).order_by("-name")
+        serializer = ComponentUsageSerializer(components, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
 
@@ -113,8 +116,10 @@ class PrivateComponentsApiTests(TestCase):
 
         res = self.client.get(COMPONENTS_URL, {'assigned_only': 1})
 
-        x1 = ComponentSerializer(comp1)
-        x2 = ComponentSerializer(comp2)
+        comp1.server_count = 1
+        comp2.server_count = 0
+        x1 = ComponentUsageSerializer(comp1)
+        x2 = ComponentUsageSerializer(comp2)
         self.assertIn(x1.data, res.data)
         self.assertNotIn(x2.data, res.data)
 
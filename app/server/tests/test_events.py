@@ -0,0 +1,225 @@
+"""
+Tests for the change event stream.
+"""
+import asyncio
+import threading
+from decimal import Decimal
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+
+from django.contrib.auth import get_user_model
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Server
+from server import events
+from user.tokens import issue_token
+
+
+def event_scope(token=None, query=b""):
+    """Return the ASGI scope of a request for the event stream."""
+    headers = [(b"authorization", f"Token {token}".encode())] if token else []
+    return {
+        "type": "http",
+        "method": "GET",
+        "path": "/api/server/events/",
+        "query_string": query,
+        "headers": headers,
+    }
+
+
+class BrokerTests(SimpleTestCase):
+    """Test fanning events out to subscribers."""
+
+    def test_publish_from_thread(self):
+        """Test events published by another thread reach the stream."""
+        broker = events.Broker()
+
+        async def run():
+            subscriber = broker.subscribe(1)
+            other = broker.subscribe(2)
+            thread = threading.Thread(
+                target=broker.publish, args=(1, [{"id": 5}]),
+            )
+            thread.start()
+            thread.join()
+            event = await asyncio.wait_for(subscriber.queue.get(), 1)
+            return event, other.queue.qsize()
+
+        event, other_size = asyncio.run(run())
+
+        self.assertEqual(event, {"id": 5})
+        self.assertEqual(other_size, 0)
+
+    @override_settings(EVENTS_QUEUE_SIZE=2)
+    def test_slow_consumer_is_reset(self):
+        """Test a full queue is replaced by a single reset event."""
+        async def run():
+            subscriber = events.Broker().subscribe(1)
+            for index in range(3):
+                subscriber.offer({"id": index})
+            return subscriber
+
+        subscriber = asyncio.run(run())
+
+        self.assertEqual(subscriber.queue.qsize(), 1)
+        self.assertEqual(subscriber.queue.get_nowait(), events.RESET)
+        self.assertEqual(subscriber.overflows, 1)
+
+    @override_settings(EVENTS_MAX_SUBSCRIBERS=1)
+    def test_subscriber_limit(self):
+        """Test subscriptions past the limit are refused."""
+        broker = events.Broker()
+
+        async def run():
+            first = broker.subscribe(1)
+            refused = broker.subscribe(2)
+            broker.unsubscribe(first)
+            return refused, broker.subscribe(2)
+
+        refused, accepted = asyncio.run(run())
+
+        self.assertIsNone(refused)
+        self.assertIsNotNone(accepted)
+
+    def test_encode(self):
+        """Test events are encoded as compact SSE messages."""
+        message = events.encode({"kind": "tag", "id": 3, "deleted": True})
+
+        self.assertEqual(
+            message,
+            b'event: change\ndata: {"kind":"tag","id":3,"deleted":true}\n\n',
+        )
+
+
+class EventStreamTests(TestCase):
+    """Test the event stream ASGI app."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com",
+            password="test123",
+        )
+
+    def run_app(self, scope, on_message=None):
+        """Run the app until it returns or on_message asks to stop."""
+        messages = []
+
+        async def run():
+            disconnect = asyncio.Event()
+
+            async def receive():
+                await disconnect.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                messages.append(message)
+                if on_message is None or on_message(messages):
+                    disconnect.set()
+
+            await events.events_application(scope, receive, send)
+
+        async_to_sync(run)()
+        return messages
+
+    def test_token_required(self):
+        """Test streams need a valid token."""
+        for token in (None, "forged"):
+            messages = self.run_app(event_scope(token))
+
+            self.assertEqual(messages[0]["status"], 401)
+
+    def test_token_not_accepted_in_query(self):
+        """Test tokens in the URL are refused, keeping them out of logs."""
+        query = f"token={issue_token(self.user)}".encode()
+
+        messages = self.run_app(event_scope(query=query))
+
+        self.assertEqual(messages[0]["status"], 401)
+
+    def test_stream_opened_with_ticket(self):
+        """Test a ticket from the ticket endpoint opens the stream."""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        res = client.post(reverse("server:event-ticket"))
+        query = f"ticket={res.data['ticket']}".encode()
+
+        messages = self.run_app(
+            event_scope(query=query), lambda messages: len(messages) == 2,
+        )
+
+        self.assertEqual(messages[0]["status"], 200)
+        self.assertTrue(messages[1]["body"].startswith(b"event: ready\n"))
+
+    @override_settings(EVENTS_TICKET_TTL=-1)
+    def test_expired_ticket_refused(self):
+        """Test a ticket older than EVENTS_TICKET_TTL is refused."""
+        query = f"ticket={events.issue_ticket(self.user)}".encode()
+
+        messages = self.run_app(event_scope(query=query))
+
+        self.assertEqual(messages[0]["status"], 401)
+
+    def test_stream_changes(self):
+        """Test the stream sends a ready event, then published changes."""
+        def on_message(messages):
+            if len(messages) == 2:
+                events.publish(self.user.id, [
+                    {"kind": "server", "id": 7, "deleted": False},
+                ])
+            return len(messages) == 3
+
+        messages = self.run_app(
+            event_scope(issue_token(self.user)), on_message,
+        )
+
+        self.assertEqual(messages[0]["status"], 200)
+        self.assertIn(
+            (b"content-type", b"text/event-stream"), messages[0]["headers"],
+        )
+        self.assertTrue(messages[1]["body"].startswith(b"event: ready\n"))
+        self.assertEqual(
+            messages[2]["body"],
+            b'event: change\ndata: {"kind":"server","id":7,'
+            b'"deleted":false}\n\n',
+        )
+        self.assertEqual(dict(events.BROKER._subscribers), {})
+
+    @override_settings(EVENTS_HEARTBEAT=0.01)
+    def test_heartbeat(self):
+        """Test idle streams send keepalive comments."""
+        messages = self.run_app(
+            event_scope(issue_token(self.user)),
+            lambda messages: len(messages) == 3,
+        )
+
+        self.assertEqual(messages[2]["body"], b": ping\n\n")
+
+    def test_writes_publish_on_commit(self):
+        """Test saving a server publishes its change after commit."""
+        with patch("server.changes.events.publish") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                server = Server.objects.create(
+                    user=self.user, title="Gaming", price=Decimal("5.00"),
+                )
+
+        publish.assert_called_once_with(self.user.id, [
+            {"kind": "server", "id": server.id, "deleted": False},
+        ])
+
+    def test_asgi_routes_event_path(self):
+        """Test the ASGI app sends the event path to the stream."""
+        from app import asgi
+
+        scope = event_scope()
+        with patch.object(asgi, "events_application") as stream:
+            async_to_sync(asgi.application)(scope, None, None)
+
+        stream.assert_called_once_with(scope, None, None)
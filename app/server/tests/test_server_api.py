@@ -8,7 +8,10 @@ import os
 from PIL import Image
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.test import (
+    TestCase,
+    override_settings,
+)
 from django.urls import reverse
 
 from rest_framework import status
@@ -19,7 +22,9 @@ from core.models import (
     Tag,
     Component,
 )
+from core.testing import QueryBudgetMixin
 
+from server.exports import server_csv_rows
 from server.serializers import (
     ServerSerializer,
     ServerDetailSerializer,
@@ -38,6 +43,15 @@ def image_upload_url(server_id):
     return reverse("server:server-upload-image", args=[server_id])
 
 
+def image_url(server_id):
+    """Create and return a protected image URL."""
+    return reverse("server:server-image", args=[server_id])
+
+
+EXPORT_URL = reverse("server:server-export")
+BATCH_URL = reverse("server:server-batch")
+
+
 def create_server(user, **params):
     """Create and return a sample server."""
     defaults = {
@@ -413,6 +427,234 @@ class PrivateServerApiTests(TestCase):
         self.assertIn(x2.data, res.data)
         self.assertNotIn(x3.data, res.data)
 
+    def test_export_servers_csv(self):
+        """Test exporting the user's servers as CSV."""
+        server = create_server(user=self.user, title="Gaming Server")
+        server.tags.add(Tag.objects.create(user=self.user, name="Fast"))
+        other_user = create_user(email="other@example.com", password="test123")
+        create_server(user=other_user, title="Other Server")
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], "text/csv")
+        lines = b"".join(res.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith("id,title,price"))
+        self.assertIn("Gaming Server", lines[1])
+        self.assertIn("Fast", lines[1])
+
+    def test_export_servers_in_batches(self):
+        """Test the export pages through every server."""
+        for index in range(5):
+            create_server(user=self.user, title=f"Server {index}")
+        queryset = Server.objects.filter(user=self.user).prefetch_related(
+            "tags", "components"
+        )
+
+        rows = list(server_csv_rows(queryset, batch_size=2))
+
+        self.assertEqual(len(rows), 6)
+        self.assertIn("Server 4", rows[1])
+        self.assertIn("Server 0", rows[5])
+
+
+class ServerQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test the number of queries run by the server endpoints."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email="user@example.com", password="test123")
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name="Fast")
+        self.component = Component.objects.create(
+            user=self.user,
+            name="AMD Ryzen 9 5950X",
+        )
+        for index in range(5):
+            server = create_server(user=self.user, title=f"Server {index}")
+            server.tags.add(self.tag)
+            server.components.add(self.component)
+
+    def test_list_servers_query_budget(self):
+        """Test listing servers prefetches nested tags and components."""
+        with self.assertQueryBudget(3):
+            res = self.client.get(SERVERS_URL)
+
+        self.assertEqual(len(res.data), 5)
+
+    def test_filter_servers_query_budget(self):
+        """Test filtering servers does not add per server queries."""
+        params = {"tags": str(self.tag.id)}
+        with self.assertQueryBudget(3):
+            res = self.client.get(SERVERS_URL, params)
+
+        self.assertEqual(len(res.data), 5)
+
+    def test_create_nested_query_budget(self):
+        """Test nested tags and components are looked up in one query each.
+        """
+        payload = {
+            "title": "Server",
+            "price": Decimal("5.00"),
+            "tags": [{"name": "Fast"}, {"name": "Cheap"}, {"name": "Quiet"}],
+            "components": [{"name": "AMD Ryzen 9 5950X"}],
+        }
+
+        # One stats update per dimension: price, tags and components.
+        with self.assertQueryBudget(26, n_plus_one_threshold=4) as inspector:
+            res = self.client.post(SERVERS_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        lookups = [
+            query.sql for query in inspector.queries
+            if '"name" IN' in query.sql
+        ]
+        self.assertEqual(len(lookups), 2)
+
+    def test_retrieve_server_query_budget(self):
+        """Test retrieving a server detail."""
+        server = Server.objects.filter(user=self.user).first()
+
+        with self.assertQueryBudget(3):
+            res = self.client.get(detail_url(server.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+class SparseFieldsetTests(QueryBudgetMixin, TestCase):
+    """Test choosing the fields of server responses."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email="user@example.com", password="test123")
+        self.client.force_authenticate(self.user)
+        self.server = create_server(user=self.user)
+        self.server.tags.add(Tag.objects.create(user=self.user, name="Fast"))
+
+    def test_list_only_requested_fields(self):
+        """Test fields= trims the payload, prefetches and columns."""
+        with self.assertQueryBudget(1) as inspector:
+            res = self.client.get(SERVERS_URL, {"fields": "id,title"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data, [{"id": self.server.id, "title": self.server.title}],
+        )
+        self.assertNotIn('"price"', inspector.queries[0].sql)
+
+    def test_list_omit_fields(self):
+        """Test omit= drops fields and their prefetches."""
+        with self.assertQueryBudget(2):
+            res = self.client.get(SERVERS_URL, {"omit": "components,link"})
+
+        self.assertEqual(
+            list(res.data[0]), ["id", "title", "price", "tags"],
+        )
+        self.assertEqual(res.data[0]["tags"][0]["name"], "Fast")
+
+    def test_list_expand_fields(self):
+        """Test expand= adds detail fields to the list."""
+        res = self.client.get(SERVERS_URL, {"expand": "description"})
+
+        self.assertEqual(
+            res.data[0]["description"], self.server.description,
+        )
+        self.assertNotIn("image", res.data[0])
+
+    def test_retrieve_only_requested_fields(self):
+        """Test fields= applies to the detail view."""
+        with self.assertQueryBudget(2):
+            res = self.client.get(
+                detail_url(self.server.id), {"fields": "id,tags"},
+            )
+
+        self.assertEqual(list(res.data), ["id", "tags"])
+
+    def test_unknown_field_rejected(self):
+        """Test naming a field that does not exist is a bad request."""
+        res = self.client.get(SERVERS_URL, {"fields": "id,secret"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("fields", res.data)
+
+    def test_update_ignores_field_selection(self):
+        """Test writes return every field and save the full server."""
+        res = self.client.patch(
+            detail_url(self.server.id) + "?fields=id",
+            {"title": "New title"},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn("description", res.data)
+        self.server.refresh_from_db()
+        self.assertEqual(self.server.title, "New title")
+
+
+class BatchRetrieveTests(QueryBudgetMixin, TestCase):
+    """Test retrieving several servers in one request."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email="user@example.com", password="test123")
+        self.client.force_authenticate(self.user)
+        self.servers = [
+            create_server(user=self.user, title=f"Server {index}")
+            for index in range(3)
+        ]
+        for server in self.servers:
+            server.tags.add(Tag.objects.create(user=self.user, name="Fast"))
+
+    def test_batch_retrieve(self):
+        """Test servers are returned by ID with detail payloads."""
+        ids = [server.id for server in self.servers]
+
+        with self.assertQueryBudget(3):
+            res = self.client.get(
+                BATCH_URL, {"ids": ",".join(map(str, ids))},
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        for server in self.servers:
+            self.assertEqual(
+                res.data["servers"][server.id],
+                ServerDetailSerializer(server).data,
+            )
+        self.assertEqual(res.data["missing"], [])
+        self.assertEqual(res.data["forbidden"], [])
+
+    def test_batch_reports_missing_and_forbidden(self):
+        """Test unknown and other users' IDs are reported apart."""
+        other_user = create_user(email="other@example.com", password="pass")
+        other_server = create_server(user=other_user)
+        ids = [self.servers[0].id, other_server.id, 9999]
+
+        res = self.client.get(BATCH_URL, {"ids": ",".join(map(str, ids))})
+
+        self.assertEqual(list(res.data["servers"]), [self.servers[0].id])
+        self.assertEqual(res.data["missing"], [9999])
+        self.assertEqual(res.data["forbidden"], [other_server.id])
+
+    def test_batch_sparse_fields(self):
+        """Test batch retrieve honours fields= without the id field."""
+        res = self.client.get(
+            BATCH_URL, {"ids": str(self.servers[0].id), "fields": "title"},
+        )
+
+        self.assertEqual(
+            res.data["servers"][self.servers[0].id], {"title": "Server 0"},
+        )
+
+    def test_batch_invalid_ids(self):
+        """Test missing, malformed and too many IDs are rejected."""
+        with self.settings(SERVER_BATCH_MAX_IDS=2):
+            for params in [{}, {"ids": "1,abc"}, {"ids": "1,2,3"}]:
+                res = self.client.get(BATCH_URL, params)
+
+                self.assertEqual(
+                    res.status_code, status.HTTP_400_BAD_REQUEST, params,
+                )
+
 
 class ImageUploadTests(TestCase):
     """Tests for the image upload API."""
@@ -444,6 +686,76 @@ class ImageUploadTests(TestCase):
         self.assertIn("image", res.data)
         self.assertTrue(os.path.exists(self.server.image.path))
 
+    def upload_image(self):
+        """Upload a small JPEG to the server and return the response."""
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as image_file:
+            Image.new("RGB", (10, 10)).save(image_file, format="JPEG")
+            image_file.seek(0)
+            return self.client.post(
+                image_upload_url(self.server.id),
+                {"image": image_file},
+                format="multipart",
+            )
+
+    def test_image_links_to_protected_endpoint(self):
+        """Test image URLs point at the owner checked endpoint."""
+        res = self.upload_image()
+
+        self.assertTrue(res.data["image"].endswith(image_url(self.server.id)))
+        res = self.client.get(detail_url(self.server.id))
+        self.assertTrue(res.data["image"].endswith(image_url(self.server.id)))
+
+    @override_settings(MEDIA_ACCEL_REDIRECT=True)
+    def test_image_redirects_to_proxy(self):
+        """Test the owner gets an X-Accel-Redirect to the internal path."""
+        self.upload_image()
+        self.server.refresh_from_db()
+
+        with self.assertNumQueries(1):
+            res = self.client.get(image_url(self.server.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res["X-Accel-Redirect"],
+            f"/protected/media/{self.server.image.name}",
+        )
+        self.assertNotIn("Content-Type", res)
+        self.assertEqual(res.content, b"")
+
+    @override_settings(MEDIA_ACCEL_REDIRECT=False)
+    def test_image_served_without_proxy(self):
+        """Test Django sends the file itself when there is no proxy."""
+        self.upload_image()
+        self.server.refresh_from_db()
+
+        res = self.client.get(image_url(self.server.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], "image/jpeg")
+        with self.server.image.open("rb") as image:
+            self.assertEqual(b"".join(res.streaming_content), image.read())
+
+    def test_image_of_other_user_not_found(self):
+        """Test images of other users' servers are not served."""
+        self.upload_image()
+        other = get_user_model().objects.create_user(
+            "other@example.com",
+            "password123",
+        )
+        client = APIClient()
+        client.force_authenticate(other)
+
+        res = client.get(image_url(self.server.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn("X-Accel-Redirect", res)
+
+    def test_missing_image_not_found(self):
+        """Test a server without an image returns 404."""
+        res = self.client.get(image_url(self.server.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_upload_image_bad_request(self):
         """Test uploading an invalid image."""
         url = image_upload_url(self.server.id)
@@ -0,0 +1,160 @@
+"""
+Tests for the server statistics rollups.
+"""
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Server,
+    ServerStat,
+    Tag,
+)
+from server import stats
+
+
+SERVERS_URL = reverse("server:server-list")
+STATS_URL = reverse("server:server-stats")
+
+
+def detail_url(server_id):
+    """Create and return a server detail URL."""
+    return reverse("server:server-detail", args=[server_id])
+
+
+def create_user(email="user@example.com", password="testpass123"):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email, password)
+
+
+class ServerStatsTests(TestCase):
+    """Test keeping the rollups in step with the servers."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+
+    def assertNoDrift(self):
+        self.assertEqual(stats.reconcile(dry_run=True), {})
+
+    def create(self, **params):
+        payload = {"title": "Server", "price": "5.00", "tags": [],
+                   "components": []}
+        payload.update(params)
+        res = self.client.post(SERVERS_URL, payload, format="json")
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return res.data["id"]
+
+    def test_price_bucket(self):
+        """Test prices map to buckets by their upper bounds."""
+        self.assertEqual(stats.price_bucket(Decimal("9.99")), "0-10")
+        self.assertEqual(stats.price_bucket(Decimal("10")), "10-50")
+        self.assertEqual(stats.price_bucket(Decimal("900")), "500+")
+
+    def test_stats_follow_api_writes(self):
+        """Test creates, updates and deletes keep the rollups exact."""
+        first = self.create(tags=[{"name": "Fast"}, {"name": "Cheap"}],
+                            components=[{"name": "CPU"}])
+        self.create(price="75.00", tags=[{"name": "Fast"}])
+        self.assertNoDrift()
+
+        self.client.patch(detail_url(first), {
+            "price": "120.00", "tags": [{"name": "Quiet"}],
+        }, format="json")
+        self.assertNoDrift()
+
+        self.client.put(detail_url(first), {
+            "title": "Server", "price": "1.00", "tags": [],
+            "components": [],
+        }, format="json")
+        self.assertNoDrift()
+
+        self.client.delete(detail_url(first))
+        self.assertNoDrift()
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data["servers"], 1)
+        self.assertEqual(
+            [(tag["name"], tag["count"]) for tag in res.data["tags"]],
+            [("Fast", 1)],
+        )
+        self.assertEqual(res.data["price_buckets"],
+                         [{"bucket": "50-100", "count": 1}])
+
+    def test_reverse_relation_changes(self):
+        """Test adding and removing servers from the tag's side."""
+        servers = [
+            Server.objects.create(user=self.user, title="S", price=1)
+            for _ in range(3)
+        ]
+        tag = Tag.objects.create(user=self.user, name="Rack")
+
+        tag.server_set.add(*servers)
+        self.assertNoDrift()
+        tag.server_set.remove(servers[0], servers[0])
+        self.assertNoDrift()
+        tag.server_set.clear()
+        self.assertNoDrift()
+
+    def test_deleting_tag_drops_rollup(self):
+        """Test a deleted tag disappears from the statistics."""
+        self.create(tags=[{"name": "Fast"}])
+
+        Tag.objects.get(name="Fast").delete()
+
+        self.assertFalse(ServerStat.objects.filter(
+            dimension=ServerStat.TAG,
+        ).exists())
+        self.assertNoDrift()
+
+    def test_stats_query_count_independent_of_servers(self):
+        """Test reading the statistics does not scan the servers."""
+        for _ in range(5):
+            self.create(tags=[{"name": "Fast"}], components=[{"name": "CPU"}])
+
+        with self.assertNumQueries(3):
+            res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data["servers"], 5)
+
+    def test_stats_limited_to_user(self):
+        """Test the statistics only cover the user's servers."""
+        other = create_user(email="other@example.com")
+        Server.objects.create(user=other, title="S", price=1)
+        self.create()
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data["servers"], 1)
+
+
+class ReconcileStatsCommandTests(TestCase):
+    """Test the reconcile_stats command."""
+
+    def test_repairs_drift(self):
+        """Test rollups written around the signals are repaired."""
+        user = create_user()
+        Server.objects.bulk_create([
+            Server(user=user, title="S", price=5) for _ in range(2)
+        ])
+        ServerStat.objects.create(
+            user=user, dimension=ServerStat.TAG, key="999", count=4,
+        )
+        out = StringIO()
+
+        call_command("reconcile_stats", stdout=out)
+
+        self.assertIn("Repaired 2 drifted rollups.", out.getvalue())
+        self.assertEqual(stats.reconcile(dry_run=True), {})
+        self.assertEqual(
+            ServerStat.objects.get(dimension=ServerStat.PRICE).count, 2,
+        )
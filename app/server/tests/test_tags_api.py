@@ -4,6 +4,7 @@ Tests for the tags API.
 from decimal import Decimal
 
 from django.contrib.auth import get_user_model
+from django.db.models import Count
 from django.urls import reverse
 from django.test import TestCase
 
@@ -14,8 +15,9 @@ from core.models import (
     Tag,
     Server,
 )
+from core.testing import QueryBudgetMixin
 
-from server.serializers import TagSerializer
+from server.serializers import TagUsageSerializer
 
 
 TAGS_URL = reverse("server:tag-list")
@@ -44,7 +46,7 @@ class PublicTagsApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateTagsApiTests(TestCase):
+class PrivateTagsApiTests(QueryBudgetMixin, TestCase):
     """Test authenticated API requests."""
 
     def setUp(self):
@@ -59,8 +61,10 @@ class PrivateTagsApiTests(TestCase):
 
         res = self.client.get(TAGS_URL)
 
-        tags = Tag.objects.all().order_by("-name")
-        serializer = TagSerializer(tags, many=True)
+        tags = Tag.objects.annotate(
+            server_count=Count("server"),
+        ).order_by("-name")
+        serializer = TagUsageSerializer(tags, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
 
@@ -113,8 +117,10 @@ class PrivateTagsApiTests(TestCase):
 
         res = self.client.get(TAGS_URL, {"assigned_only": 1})
 
-        x1 = TagSerializer(tag1)
-        x2 = TagSerializer(tag2)
+        tag1.server_count = 1
+        tag2.server_count = 0
+        x1 = TagUsageSerializer(tag1)
+        x2 = TagUsageSerializer(tag2)
         self.assertIn(x1.data, res.data)
         self.assertNotIn(x2.data, res.data)
 
@@ -138,3 +144,36 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.get(TAGS_URL, {"assigned_only": 1})
 
         self.assertEqual(len(res.data), 1)
+
+    def test_filtered_tags_query_budget(self):
+        """Test listing assigned tags runs a single query."""
+        server = Server.objects.create(
+            title="Gaming Server",
+            price=Decimal("5.00"),
+            user=self.user,
+        )
+        for name in ["Fast", "Storage", "Quiet"]:
+            server.tags.add(Tag.objects.create(user=self.user, name=name))
+
+        with self.assertQueryBudget(1):
+            res = self.client.get(TAGS_URL, {"assigned_only": 1})
+
+        self.assertEqual(len(res.data), 3)
+
+    def test_tags_include_server_count(self):
+        """Test each tag reports how many servers use it."""
+        fast = Tag.objects.create(user=self.user, name="Fast")
+        Tag.objects.create(user=self.user, name="Storage")
+        for title in ["Gaming Server", "Video Server"]:
+            server = Server.objects.create(
+                title=title,
+                price=Decimal("5.00"),
+                user=self.user,
+            )
+            server.tags.add(fast)
+
+        with self.assertQueryBudget(1):
+            res = self.client.get(TAGS_URL)
+
+        counts = {tag["name"]: tag["server_count"] for tag in res.data}
+        self.assertEqual(counts, {"Fast": 2, "Storage": 0})
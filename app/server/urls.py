@@ -1,6 +1,7 @@
 """
 URL mappings for the server app.
 """
+from django.conf import settings
 from django.urls import (
     path,
     include,
@@ -8,7 +9,10 @@ from django.urls import (
 
 from rest_framework.routers import DefaultRouter
 
-from server import views
+from server import (
+    async_views,
+    views,
+)
 
 
 router = DefaultRouter()
@@ -19,5 +23,17 @@ router.register('components', views.ComponentViewSet)
 app_name = "server"
 
 urlpatterns = [
+    path("changes/", views.ChangeFeedView.as_view(), name="changes"),
+    path(
+        "events/ticket/",
+        views.EventTicketView.as_view(),
+        name="event-ticket",
+    ),
     path("", include(router.urls)),
 ]
+
+if settings.ASYNC_VIEWS:
+    urlpatterns = [
+        path("servers/export/", async_views.export),
+        path("servers/<pk>/upload-image/", async_views.upload_image),
+    ] + urlpatterns
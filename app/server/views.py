@@ -1,33 +1,84 @@
 """
 Views for the server APIs
 """
+from urllib.parse import quote
+
 from drf_spectacular.utils import (
     extend_schema_view,
     extend_schema,
     OpenApiParameter,
     OpenApiTypes,
 )
+from django.conf import settings
+from django.db.models import (
+    Count,
+    Exists,
+    IntegerField,
+    OuterRef,
+    Subquery,
+)
+from django.db.models.functions import Coalesce
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    StreamingHttpResponse,
+)
+
 from rest_framework import (
     viewsets,
     mixins,
     status,
 )
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
 
+from core.coalescing import coalesced
+from core.deletion import mark_deleted
+from core.idempotency import IDEMPOTENCY_KEY, idempotent
 from core.models import (
+    Change,
     Server,
     Tag,
     Component,
 )
-from server import serializers
+from server import (
+    changes,
+    events,
+    serializers,
+    stats,
+)
+from server.exports import server_csv_rows
+from server.fieldsets import select_fields
+from user.authentication import SignedTokenAuthentication
+
+
+SPARSE_FIELD_PARAMETERS = [
+    OpenApiParameter(
+        "fields",
+        OpenApiTypes.STR,
+        description="Comma separated list of the only fields to return",
+    ),
+    OpenApiParameter(
+        "omit",
+        OpenApiTypes.STR,
+        description="Comma separated list of fields to leave out",
+    ),
+    OpenApiParameter(
+        "expand",
+        OpenApiTypes.STR,
+        description="Comma separated list of extra fields to return",
+    ),
+]
 
 
 @extend_schema_view(
     list=extend_schema(
-        parameters=[
+        parameters=SPARSE_FIELD_PARAMETERS + [
             OpenApiParameter(
                 "tags",
                 OpenApiTypes.STR,
@@ -39,20 +90,41 @@ from server import serializers
                 description="Comma separated list of component IDs to filter",
             ),
         ]
-    )
+    ),
+    retrieve=extend_schema(parameters=SPARSE_FIELD_PARAMETERS),
+    create=extend_schema(parameters=[IDEMPOTENCY_KEY]),
 )
 class ServerViewSet(viewsets.ModelViewSet):
     """View for manage server APIs."""
 
     serializer_class = serializers.ServerDetailSerializer
     queryset = Server.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [SignedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    # Relations prefetched only when their field is returned.
+    prefetched_fields = ["tags", "components"]
+    # Actions with their own request budget (core.throttles).
+    throttle_scopes = {"upload_image": "upload_image"}
 
     def _params_to_ints(self, qs):
         """Convert a list of strings to integers."""
         return [int(str_id) for str_id in qs.split(",")]
 
+    def selected_fields(self):
+        """Return the fields chosen by the request, or None for all."""
+        if self.action not in ("list", "retrieve", "batch"):
+            return None
+        if not hasattr(self, "_selected_fields"):
+            available = serializers.ServerDetailSerializer.Meta.fields
+            if self.action == "list":
+                default = serializers.ServerSerializer.Meta.fields
+            else:
+                default = available
+            self._selected_fields = select_fields(
+                self.request.query_params, available, default,
+            )
+        return self._selected_fields
+
     def get_queryset(self):
         """Retrieve servers for authenticated user."""
         tags = self.request.query_params.get("tags")
@@ -65,22 +137,59 @@ class ServerViewSet(viewsets.ModelViewSet):
             component_ids = self._params_to_ints(components)
             queryset = queryset.filter(components__id__in=component_ids)
 
-        return queryset.filter(user=self.request.user).order_by("-id").distinct()
+        queryset = (
+            queryset.filter(user=self.request.user)
+            .order_by("-id")
+            .distinct()
+        )
+        fields = self.selected_fields()
+        if fields is None:
+            return queryset.prefetch_related(*self.prefetched_fields)
+
+        columns = [
+            name for name in fields if name not in self.prefetched_fields
+        ]
+        return queryset.only("id", *columns).prefetch_related(
+            *[name for name in self.prefetched_fields if name in fields]
+        )
 
     def get_serializer_class(self):
         """Return the serializer class for request."""
         if self.action == "list":
+            list_fields = serializers.ServerSerializer.Meta.fields
+            if set(self.selected_fields()) - set(list_fields):
+                return serializers.ServerDetailSerializer
             return serializers.ServerSerializer
         elif self.action == "upload_image":
             return serializers.ServerImageSerializer
 
         return self.serializer_class
 
+    def get_serializer_context(self):
+        """Pass the fields chosen by the request to the serializer."""
+        context = super().get_serializer_context()
+        fields = self.selected_fields()
+        if fields is not None:
+            context["fields"] = fields
+        return context
+
+    @coalesced
+    def list(self, request, *args, **kwargs):
+        """List servers, sharing the work of identical concurrent lists."""
+        return super().list(request, *args, **kwargs)
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        """Create a server, once per Idempotency-Key."""
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         """Create a new server."""
         serializer.save(user=self.request.user)
 
+    @extend_schema(parameters=[IDEMPOTENCY_KEY])
     @action(methods=["POST"], detail=True, url_path="upload-image")
+    @idempotent
     def upload_image(self, request, pk=None):
         """Upload an image to server."""
         server = self.get_object()
@@ -92,6 +201,97 @@ class ServerViewSet(viewsets.ModelViewSet):
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @extend_schema(
+        parameters=SPARSE_FIELD_PARAMETERS + [
+            OpenApiParameter(
+                "ids",
+                OpenApiTypes.STR,
+                required=True,
+                description="Comma separated list of server IDs to return",
+            ),
+        ],
+        responses=OpenApiTypes.OBJECT,
+    )
+    @action(methods=["GET"], detail=False)
+    def batch(self, request):
+        """Retrieve several servers by ID in one request."""
+        ids = serializers.ServerBatchSerializer(data={
+            "ids": [
+                value for value in request.query_params.get("ids", "")
+                .split(",") if value
+            ],
+        })
+        ids.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(ids.validated_data["ids"]))
+
+        servers = list(self.get_queryset().filter(id__in=ids))
+        data = self.get_serializer(servers, many=True).data
+        found = {server.id: item for server, item in zip(servers, data)}
+        absent = [server_id for server_id in ids if server_id not in found]
+        forbidden = set()
+        if absent:
+            forbidden = set(
+                Server.objects.filter(id__in=absent)
+                .exclude(user=request.user)
+                .values_list("id", flat=True)
+            )
+        return Response({
+            "servers": {
+                server_id: found[server_id]
+                for server_id in ids if server_id in found
+            },
+            "missing": [
+                server_id for server_id in absent
+                if server_id not in forbidden
+            ],
+            "forbidden": [
+                server_id for server_id in absent if server_id in forbidden
+            ],
+        })
+
+    @extend_schema(responses={(200, "image/*"): OpenApiTypes.BINARY})
+    @action(methods=["GET"], detail=True)
+    def image(self, request, pk=None):
+        """Serve the server's image to its owner.
+
+        Behind the proxy the file is sent by nginx from an internal
+        location named in X-Accel-Redirect, so only the ownership check
+        runs here.
+        """
+        server = get_object_or_404(
+            Server.objects.only("id", "image"), pk=pk, user=request.user,
+        )
+        if not server.image:
+            raise Http404
+        if settings.MEDIA_ACCEL_REDIRECT:
+            response = HttpResponse()
+            # Let nginx pick the type from the file extension.
+            del response["Content-Type"]
+            response["X-Accel-Redirect"] = (
+                settings.MEDIA_ACCEL_PREFIX + quote(server.image.name)
+            )
+        else:
+            response = FileResponse(server.image.open("rb"))
+        response["Cache-Control"] = "private, max-age=3600"
+        return response
+
+    @extend_schema(responses=OpenApiTypes.OBJECT)
+    @action(methods=["GET"], detail=False)
+    def stats(self, request):
+        """Count the servers per tag, component and price bucket."""
+        return Response(stats.user_stats(request.user))
+
+    @extend_schema(responses=OpenApiTypes.STR)
+    @action(methods=["GET"], detail=False)
+    def export(self, request):
+        """Export the servers as CSV, streamed in batches."""
+        response = StreamingHttpResponse(
+            server_csv_rows(self.get_queryset()),
+            content_type="text/csv",
+        )
+        response["Content-Disposition"] = 'attachment; filename="servers.csv"'
+        return response
+
 
 @extend_schema_view(
     list=extend_schema(
@@ -113,28 +313,148 @@ class BaseServerAttrViewSet(
 ):
     """Base viewset for server attributes."""
 
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [SignedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
+    # Server M2M through model and its foreign key to the attribute.
+    server_links = None
+    server_link_field = None
+
     def get_queryset(self):
         """Filter queryset to authenticated user."""
-        assigned_only = bool(int(self.request.query_params.get("assigned_only", 0)))
-        queryset = self.queryset
+        assigned_only = bool(
+            int(self.request.query_params.get("assigned_only", 0))
+        )
+        links = self.server_links.objects.filter(
+            **{self.server_link_field: OuterRef("pk")}
+        )
+        server_count = (
+            links.order_by()
+            .values(self.server_link_field)
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        queryset = self.queryset.filter(user=self.request.user).annotate(
+            server_count=Coalesce(
+                Subquery(server_count, output_field=IntegerField()), 0,
+            ),
+        )
         if assigned_only:
-            queryset = queryset.filter(server__isnull=False)
+            queryset = queryset.filter(Exists(links))
+
+        return queryset.order_by("-name")
 
-        return queryset.filter(user=self.request.user).order_by("-name").distinct()
+    def perform_destroy(self, instance):
+        """Mark the item deleted; a worker purges its server links."""
+        mark_deleted(instance)
 
 
 class TagViewSet(BaseServerAttrViewSet):
     """Manage tags in the database."""
 
-    serializer_class = serializers.TagSerializer
+    serializer_class = serializers.TagUsageSerializer
     queryset = Tag.objects.all()
+    server_links = Server.tags.through
+    server_link_field = "tag"
 
 
 class ComponentViewSet(BaseServerAttrViewSet):
     """Manage components in the database."""
 
-    serializer_class = serializers.ComponentSerializer
+    serializer_class = serializers.ComponentUsageSerializer
     queryset = Component.objects.all()
+    server_links = Server.components.through
+    server_link_field = "component"
+
+
+class ChangeFeedView(APIView):
+    """Changes to the user's servers, tags and components after a cursor.
+
+    Without a cursor, or with an expired one, the response has ``reset``
+    set and a cursor at the latest change: the client downloads the full
+    lists again and continues from that cursor.
+    """
+
+    authentication_classes = [SignedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    # Kind of change, response key, model and serializer of each feed.
+    feeds = [
+        (
+            Change.SERVER, "servers", Server,
+            serializers.ServerChangeSerializer,
+        ),
+        (Change.TAG, "tags", Tag, serializers.TagSerializer),
+        (
+            Change.COMPONENT, "components", Component,
+            serializers.ComponentSerializer,
+        ),
+    ]
+
+    def _changed(self, model, serializer_class, ids):
+        """Return the payloads of the changed objects still present."""
+        if not ids:
+            return []
+        queryset = model.objects.filter(user=self.request.user, id__in=ids)
+        if model is Server:
+            queryset = queryset.prefetch_related("tags", "components")
+        return serializer_class(queryset.order_by("id"), many=True).data
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "cursor",
+                OpenApiTypes.STR,
+                description="Cursor returned by the previous call",
+            ),
+        ],
+        responses=OpenApiTypes.OBJECT,
+    )
+    def get(self, request):
+        """Return the next page of changes."""
+        seq = None
+        if request.query_params.get("cursor"):
+            try:
+                seq = changes.read_cursor(request.query_params["cursor"])
+            except changes.InvalidCursor:
+                raise ValidationError({"cursor": "Invalid cursor."})
+
+        if seq is None:
+            page = changes.ChangePage(changes.head(request.user), more=False)
+        else:
+            page = changes.read_changes(
+                request.user, seq, settings.CHANGE_FEED_PAGE_SIZE,
+            )
+        return Response({
+            "cursor": changes.make_cursor(page.seq, page.since),
+            "reset": seq is None,
+            "more": page.more,
+            "changed": {
+                key: self._changed(
+                    model, serializer_class, page.changed[kind],
+                )
+                for kind, key, model, serializer_class in self.feeds
+            },
+            "deleted": {
+                key: page.deleted[kind]
+                for kind, key, model, serializer_class in self.feeds
+            },
+        })
+
+
+class EventTicketView(APIView):
+    """Ticket opening the user's change event stream.
+
+    Browsers pass it as the stream's ``ticket`` query parameter, since
+    EventSource cannot send the token header.
+    """
+
+    authentication_classes = [SignedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(request=None, responses=OpenApiTypes.OBJECT)
+    def post(self, request):
+        """Return a ticket valid for EVENTS_TICKET_TTL seconds."""
+        return Response({
+            "ticket": events.issue_ticket(request.user),
+            "expires_in": settings.EVENTS_TICKET_TTL,
+        })
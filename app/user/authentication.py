@@ -0,0 +1,118 @@
+"""
+Authentication for the APIs.
+"""
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+)
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from user.tokens import (
+    InvalidToken,
+    is_signed_token,
+    read_token,
+)
+
+
+class UserCache:
+    """Users by id, kept in this process for TOKEN_USER_CACHE_TTL seconds.
+
+    Saves and deletes in this process drop the user at once; other
+    processes see a deactivated user within the TTL, as they see a
+    revoked token within TOKEN_REVOCATION_REFRESH.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._users = {}
+
+    def get(self, user_id):
+        """Return a copy of the cached user, or None."""
+        entry = self._users.get(user_id)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        # Requests may change their user; each gets its own instance.
+        return copy.copy(entry[0])
+
+    def set(self, user):
+        expires = time.monotonic() + settings.TOKEN_USER_CACHE_TTL
+        with self._lock:
+            if len(self._users) >= self.max_entries:
+                now = time.monotonic()
+                self._users = {
+                    user_id: entry for user_id, entry in self._users.items()
+                    if entry[1] > now
+                }
+            self._users[user.pk] = (copy.copy(user), expires)
+
+    def forget(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+
+USERS = UserCache()
+
+
+def user_changed(sender, instance, **kwargs):
+    """Drop a saved or deleted user from the cache (post_save/delete)."""
+    USERS.forget(instance.pk)
+
+
+def connect():
+    """Connect the user cache invalidation to the model signals."""
+    user_model = get_user_model()
+    post_save.connect(user_changed, sender=user_model)
+    post_delete.connect(user_changed, sender=user_model)
+
+
+def get_active_user(user_id):
+    """Return the active user of a token, from the cache when possible."""
+    user = USERS.get(user_id)
+    if user is None:
+        user = get_user_model().objects.filter(pk=user_id).first()
+        if user is None or not user.is_active:
+            return None
+        if settings.TOKEN_USER_CACHE_TTL > 0:
+            USERS.set(user)
+    return user
+
+
+class SignedTokenAuthentication(TokenAuthentication):
+    """Authenticate signed tokens, and stored tokens while allowed.
+
+    Signed tokens are verified without a query, and their user is kept in
+    a short-lived process cache; ``request.auth`` is their TokenClaims.
+    Stored authtoken keys are looked up as before.
+    """
+
+    def authenticate_credentials(self, key):
+        if not is_signed_token(key):
+            if not settings.TOKEN_ALLOW_LEGACY:
+                raise exceptions.AuthenticationFailed(_("Invalid token."))
+            return super().authenticate_credentials(key)
+
+        try:
+            claims = read_token(key)
+        except InvalidToken as error:
+            raise exceptions.AuthenticationFailed(str(error))
+
+        user = get_active_user(claims.user_id)
+        if user is None:
+            raise exceptions.AuthenticationFailed(
+                _("User inactive or deleted.")
+            )
+        return (user, claims)
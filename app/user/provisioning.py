@@ -0,0 +1,163 @@
+"""
+Bulk user provisioning.
+
+Accounts are validated together, checked for duplicates with one query and
+written with bulk_create. Passwords are hashed in a process pool; accounts
+without one get an unusable password and an invite token instead.
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.tokens import default_token_generator
+from django.core.exceptions import ValidationError
+from django.core.validators import EmailValidator
+from django.db import transaction
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+
+MIN_PASSWORD_LENGTH = 5
+
+
+class ProvisionResult:
+    """Outcome and timings of a provisioning run."""
+
+    def __init__(self):
+        self.created = []
+        self.errors = []
+        self.invites = []
+        self.timings = {"validate": 0.0, "hash": 0.0, "insert": 0.0}
+
+    @property
+    def seconds(self):
+        return sum(self.timings.values())
+
+    @property
+    def users_per_second(self):
+        if not self.seconds:
+            return 0.0
+        return len(self.created) / self.seconds
+
+    def as_dict(self):
+        return {
+            "created": len(self.created),
+            "errors": self.errors,
+            "invites": self.invites,
+            "seconds": round(self.seconds, 3),
+            "users_per_second": round(self.users_per_second, 1),
+            "timings": {
+                stage: round(seconds, 3)
+                for stage, seconds in self.timings.items()
+            },
+        }
+
+
+def validate_entries(entries):
+    """Return the valid, normalized entries and errors for the others."""
+    user_model = get_user_model()
+    validator = EmailValidator()
+    valid = []
+    errors = []
+    seen = set()
+    for entry in entries:
+        email = user_model.objects.normalize_email(
+            str(entry.get("email") or "").strip()
+        )
+        password = entry.get("password") or None
+        try:
+            validator(email)
+        except ValidationError:
+            errors.append({"email": email, "error": "Invalid email."})
+            continue
+        if email.lower() in seen:
+            errors.append({"email": email, "error": "Duplicate email."})
+            continue
+        if password is not None and len(password) < MIN_PASSWORD_LENGTH:
+            errors.append({"email": email, "error": "Password too short."})
+            continue
+        seen.add(email.lower())
+        valid.append({
+            "email": email,
+            "name": entry.get("name") or "",
+            "password": password,
+        })
+
+    existing = set(
+        user_model.objects.filter(
+            email__in=[entry["email"] for entry in valid],
+        ).values_list("email", flat=True)
+    )
+    if existing:
+        errors.extend(
+            {"email": entry["email"], "error": "User already exists."}
+            for entry in valid if entry["email"] in existing
+        )
+        valid = [entry for entry in valid if entry["email"] not in existing]
+    return valid, errors
+
+
+def hash_passwords(passwords, workers=1):
+    """Hash passwords, spread over worker processes when it pays off."""
+    if workers <= 1 or len(passwords) < workers * 2:
+        return [make_password(password) for password in passwords]
+    # Deferred: multiprocessing is only needed for large imports.
+    from concurrent.futures import ProcessPoolExecutor
+
+    chunksize = max(1, len(passwords) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(make_password, passwords, chunksize=chunksize))
+
+
+def invite_for(user):
+    """Return the invite a provisioned user needs to set a password."""
+    return {
+        "email": user.email,
+        "uid": urlsafe_base64_encode(force_bytes(user.pk)),
+        "token": default_token_generator.make_token(user),
+    }
+
+
+def provision_users(entries, workers=1, batch_size=1000):
+    """Create users from dicts with email, name and optional password."""
+    user_model = get_user_model()
+    result = ProvisionResult()
+
+    start = time.perf_counter()
+    valid, result.errors = validate_entries(entries)
+    result.timings["validate"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with_password = [entry for entry in valid if entry["password"]]
+    hashes = dict(zip(
+        (entry["email"] for entry in with_password),
+        hash_passwords(
+            [entry["password"] for entry in with_password],
+            workers=workers,
+        ),
+    ))
+    result.timings["hash"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    emails = [entry["email"] for entry in valid]
+    with transaction.atomic():
+        user_model.objects.bulk_create(
+            (
+                user_model(
+                    email=entry["email"],
+                    name=entry["name"],
+                    password=hashes.get(entry["email"], make_password(None)),
+                )
+                for entry in valid
+            ),
+            batch_size=batch_size,
+        )
+    result.created = list(
+        user_model.objects.filter(email__in=emails).order_by("id")
+    )
+    result.invites = [
+        invite_for(user) for user in result.created
+        if user.email not in hashes
+    ]
+    result.timings["insert"] = time.perf_counter() - start
+    return result
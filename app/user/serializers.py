@@ -1,16 +1,33 @@
 """
 Serializers for the user API View.
 """
+from django.conf import settings
 from django.contrib.auth import (
     get_user_model,
     authenticate,
 )
+from django.contrib.auth.tokens import default_token_generator
+from django.utils.http import urlsafe_base64_decode
 from django.utils.translation import gettext as _
 
-from rest_framework import serializers
+from rest_framework import (
+    exceptions,
+    serializers,
+)
+
+from core.hashers import (
+    HashingBusy,
+    hashing_slot,
+)
+from core.instrumentation import TimedSerializerMixin
+from core.models import DeletionJob
+from user.provisioning import MIN_PASSWORD_LENGTH
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(
+    TimedSerializerMixin,
+    serializers.ModelSerializer,
+):
     """Serializer for the user object."""
 
     class Meta:
@@ -47,14 +64,114 @@ class AuthTokenSerializer(serializers.Serializer):
         """Validate and authenticate the user."""
         email = attrs.get("email")
         password = attrs.get("password")
-        user = authenticate(
-            request=self.context.get("request"),
-            username=email,
-            password=password,
-        )
+        try:
+            with hashing_slot():
+                user = authenticate(
+                    request=self.context.get("request"),
+                    username=email,
+                    password=password,
+                )
+        except HashingBusy:
+            raise exceptions.Throttled(
+                detail=_("Too many logins in progress, try again shortly."),
+            )
         if not user:
             msg = _("Unable to authenticate with provided credentials.")
             raise serializers.ValidationError(msg, code="authorization")
 
         attrs["user"] = user
         return attrs
+
+
+class ProvisionEntrySerializer(serializers.Serializer):
+    """Serializer for one user of a bulk provisioning request.
+
+    A blank or missing password makes the user an invite.
+    """
+
+    email = serializers.EmailField(max_length=255)
+    name = serializers.CharField(
+        required=False, allow_blank=True, max_length=255,
+    )
+    password = serializers.CharField(
+        required=False,
+        allow_blank=True,
+        trim_whitespace=False,
+        min_length=MIN_PASSWORD_LENGTH,
+    )
+
+
+class ProvisionUsersSerializer(serializers.Serializer):
+    """Serializer for a bulk provisioning request.
+
+    Each entry is checked on its own by ProvisionEntrySerializer; the
+    duplicate and existing account checks run in batch in
+    user.provisioning. Passwords are hashed in the request, so at most
+    PROVISION_MAX_PASSWORDS entries may have one.
+    """
+
+    users = serializers.ListField(
+        child=ProvisionEntrySerializer(),
+        allow_empty=False,
+        max_length=settings.PROVISION_MAX_USERS,
+    )
+
+    def validate_users(self, users):
+        """Limit the passwords hashed by one request."""
+        passwords = sum(1 for entry in users if entry.get("password"))
+        if passwords > settings.PROVISION_MAX_PASSWORDS:
+            msg = _(
+                "At most {limit} users may have a password; provision the "
+                "others without one to send them invites."
+            ).format(limit=settings.PROVISION_MAX_PASSWORDS)
+            raise serializers.ValidationError(msg, code="max_passwords")
+        return users
+
+
+class AcceptInviteSerializer(serializers.Serializer):
+    """Serializer for setting the password of a provisioned user."""
+
+    uid = serializers.CharField()
+    token = serializers.CharField()
+    password = serializers.CharField(
+        style={"input_type": "password"},
+        trim_whitespace=False,
+        min_length=5,
+    )
+
+    def validate(self, attrs):
+        """Validate the invite token against the user it was issued for."""
+        try:
+            pk = urlsafe_base64_decode(attrs["uid"]).decode()
+            user = get_user_model().objects.get(pk=pk)
+        except (ValueError, get_user_model().DoesNotExist):
+            user = None
+        if user is None or not default_token_generator.check_token(
+            user, attrs["token"],
+        ):
+            msg = _("Invalid or expired invite.")
+            raise serializers.ValidationError(msg, code="invalid")
+
+        attrs["user"] = user
+        return attrs
+
+
+class DeletionJobSerializer(serializers.ModelSerializer):
+    """Serializer for the progress of a background delete."""
+
+    progress = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = DeletionJob
+        fields = [
+            "id",
+            "kind",
+            "object_id",
+            "status",
+            "total",
+            "purged",
+            "progress",
+            "created_at",
+            "finished_at",
+        ]
+        read_only_fields = fields
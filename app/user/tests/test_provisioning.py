@@ -0,0 +1,205 @@
+"""
+Tests for bulk user provisioning.
+"""
+import csv
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import (
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user.provisioning import provision_users
+
+
+PROVISION_URL = reverse("user:provision")
+ACCEPT_INVITE_URL = reverse("user:invite-accept")
+ME_URL = reverse("user:me")
+
+
+def create_user(email="user@example.com", password="testpass123"):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email, password)
+
+
+class ProvisioningTests(TestCase):
+    """Test creating users in bulk."""
+
+    def test_provision_users(self):
+        """Test valid entries are created and the rest reported."""
+        create_user(email="taken@example.com")
+        entries = [
+            {"email": "one@Example.com", "name": "One", "password": "pass-1"},
+            {"email": "two@example.com"},
+            {"email": "one@example.com"},
+            {"email": "taken@example.com"},
+            {"email": "not-an-email"},
+            {"email": "short@example.com", "password": "pw"},
+        ]
+
+        # Duplicate check, savepoint, insert, release and read back.
+        with self.assertNumQueries(5):
+            result = provision_users(entries)
+
+        self.assertEqual(
+            [user.email for user in result.created],
+            ["one@example.com", "two@example.com"],
+        )
+        self.assertEqual(
+            [error["email"] for error in result.errors],
+            ["one@example.com", "not-an-email", "short@example.com",
+             "taken@example.com"],
+        )
+        one, two = result.created
+        self.assertTrue(one.check_password("pass-1"))
+        self.assertFalse(two.has_usable_password())
+        self.assertEqual([invite["email"] for invite in result.invites],
+                         ["two@example.com"])
+
+    def test_hash_in_process_pool(self):
+        """Test passwords hashed by worker processes verify."""
+        entries = [
+            {"email": f"user{index}@example.com", "password": f"pass-{index}"}
+            for index in range(4)
+        ]
+
+        result = provision_users(entries, workers=2)
+
+        self.assertEqual(len(result.created), 4)
+        self.assertTrue(result.created[3].check_password("pass-3"))
+
+
+class ProvisioningApiTests(TestCase):
+    """Test the provisioning and invite API."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_superuser(
+            "admin@example.com", "testpass123",
+        )
+
+    def test_provision_requires_admin(self):
+        """Test non admin users cannot provision users."""
+        self.client.force_authenticate(create_user())
+
+        res = self.client.post(
+            PROVISION_URL, {"users": [{"email": "new@example.com"}]},
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_provision_rejects_non_string_fields(self):
+        """Test entries with fields of the wrong type are a bad request."""
+        self.client.force_authenticate(self.admin)
+        users = [
+            {"email": "a@example.com", "password": {"secret": "x"}},
+            {"email": "b@example.com", "name": ["B"]},
+            {"email": 123},
+        ]
+
+        res = self.client.post(
+            PROVISION_URL, {"users": users}, format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(sorted(res.data["users"]), [0, 1, 2])
+        self.assertEqual(get_user_model().objects.count(), 1)
+
+    def test_provision_numeric_password(self):
+        """Test a number given as password is taken as its digits."""
+        self.client.force_authenticate(self.admin)
+
+        res = self.client.post(
+            PROVISION_URL,
+            {"users": [{"email": "a@example.com", "password": 123456}]},
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        user = get_user_model().objects.get(email="a@example.com")
+        self.assertTrue(user.check_password("123456"))
+
+    @override_settings(PROVISION_MAX_PASSWORDS=1)
+    def test_provision_limits_passwords(self):
+        """Test a request hashes no more passwords than allowed."""
+        self.client.force_authenticate(self.admin)
+        users = [
+            {"email": f"user{index}@example.com", "password": "pass-123"}
+            for index in range(2)
+        ]
+
+        res = self.client.post(
+            PROVISION_URL, {"users": users}, format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("users", res.data)
+        self.assertFalse(get_user_model().objects.filter(
+            email__startswith="user",
+        ).exists())
+
+    def test_provision_and_accept_invite(self):
+        """Test a provisioned user sets a password through the invite."""
+        self.client.force_authenticate(self.admin)
+
+        res = self.client.post(
+            PROVISION_URL,
+            {"users": [{"email": "new@example.com", "name": "New"}]},
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data["created"], 1)
+        self.assertIn("users_per_second", res.data)
+        invite = res.data["invites"][0]
+
+        self.client.force_authenticate(None)
+        payload = {"uid": invite["uid"], "token": invite["token"],
+                   "password": "newpass123"}
+        res = self.client.post(ACCEPT_INVITE_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user = get_user_model().objects.get(email="new@example.com")
+        self.assertTrue(user.check_password("newpass123"))
+        token = res.data["token"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token}")
+        self.assertEqual(self.client.get(ME_URL).status_code,
+                         status.HTTP_200_OK)
+
+        res = self.client.post(ACCEPT_INVITE_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ProvisionCommandTests(TestCase):
+    """Test the provision_users command."""
+
+    def test_provision_from_csv(self):
+        """Test users are created from a CSV file and invites written."""
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, "users.csv")
+            invites = os.path.join(directory, "invites.csv")
+            with open(source, "w", newline="") as handle:
+                writer = csv.writer(handle)
+                writer.writerow(["email", "name", "password"])
+                writer.writerow(["a@example.com", "A", "pass-123"])
+                writer.writerow(["b@example.com", "B", ""])
+            out = StringIO()
+
+            call_command("provision_users", source, "--workers", "1",
+                         "--invites", invites, stdout=out)
+
+            with open(invites, newline="") as handle:
+                rows = list(csv.DictReader(handle))
+
+        self.assertIn("Created 2 users", out.getvalue())
+        self.assertEqual([row["email"] for row in rows], ["b@example.com"])
@@ -0,0 +1,187 @@
+"""
+Tests for signed auth tokens.
+"""
+import datetime
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import (
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+
+from core.models import RevokedToken
+from user import tokens
+from user.authentication import (
+    USERS,
+    SignedTokenAuthentication,
+)
+
+
+ME_URL = reverse("user:me")
+REFRESH_URL = reverse("user:token-refresh")
+REVOKE_URL = reverse("user:token-revoke")
+
+
+def create_user(email="user@example.com", password="testpass123"):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email, password)
+
+
+class TokenTests(TestCase):
+    """Test issuing and verifying tokens."""
+
+    def setUp(self):
+        self.user = create_user()
+        tokens.REVOCATIONS.clear()
+
+    def test_read_issued_token(self):
+        """Test an issued token verifies to its user."""
+        claims = tokens.read_token(tokens.issue_token(self.user))
+
+        self.assertEqual(claims.user_id, self.user.id)
+
+    def test_tampered_token_rejected(self):
+        """Test a token with a changed user id is rejected."""
+        key = tokens.issue_token(self.user)
+
+        with self.assertRaises(tokens.InvalidToken):
+            tokens.read_token("9" + key)
+
+    def test_expired_token_rejected(self):
+        """Test a token is rejected once its lifetime has passed."""
+        key = tokens.issue_token(self.user)
+
+        with override_settings(TOKEN_TTL=0):
+            with self.assertRaises(tokens.InvalidToken):
+                tokens.read_token(key)
+
+    def test_verify_without_queries(self):
+        """Test verifying needs no query between revocation refreshes."""
+        key = tokens.issue_token(self.user)
+        tokens.read_token(key)
+
+        with self.assertNumQueries(0):
+            tokens.read_token(key)
+
+    def test_revocation_picked_up_on_refresh(self):
+        """Test revocations from other processes apply after a refresh."""
+        key = tokens.issue_token(self.user)
+        claims = tokens.read_token(key)
+        RevokedToken.objects.create(
+            jti=claims.jti,
+            expires_at=timezone.now() + datetime.timedelta(hours=1),
+        )
+
+        with patch.object(tokens.REVOCATIONS, "_next_refresh", 0):
+            with self.assertRaises(tokens.InvalidToken):
+                tokens.read_token(key)
+
+    def test_revoke_prunes_expired(self):
+        """Test revoking drops revocations of expired tokens."""
+        RevokedToken.objects.create(jti="old", expires_at=timezone.now())
+
+        tokens.revoke_token(tokens.read_token(tokens.issue_token(self.user)))
+
+        self.assertFalse(RevokedToken.objects.filter(jti="old").exists())
+        self.assertEqual(RevokedToken.objects.count(), 1)
+
+
+class TokenApiTests(TestCase):
+    """Test the token lifecycle through the API."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        tokens.REVOCATIONS.clear()
+
+    def authenticate(self, key):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {key}")
+
+    def test_refresh_rotates_token(self):
+        """Test refreshing returns a new token and revokes the old one."""
+        old_key = tokens.issue_token(self.user)
+        self.authenticate(old_key)
+
+        res = self.client.post(REFRESH_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res.data["token"], old_key)
+        self.assertEqual(self.client.get(ME_URL).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+        self.authenticate(res.data["token"])
+        self.assertEqual(self.client.get(ME_URL).status_code,
+                         status.HTTP_200_OK)
+
+    def test_revoke_token(self):
+        """Test a revoked token can no longer authenticate."""
+        self.authenticate(tokens.issue_token(self.user))
+
+        res = self.client.post(REVOKE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.get(ME_URL).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+
+    def test_inactive_user_rejected(self):
+        """Test tokens of deactivated users are rejected."""
+        self.authenticate(tokens.issue_token(self.user))
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_user_cached_between_requests(self):
+        """Test a token's user is loaded once, then kept in memory."""
+        key = tokens.issue_token(self.user)
+        USERS.clear()
+        auth = SignedTokenAuthentication()
+        auth.authenticate_credentials(key)
+
+        with self.assertNumQueries(0):
+            user, _ = auth.authenticate_credentials(key)
+
+        self.assertEqual(user, self.user)
+        self.assertIsNot(user, auth.authenticate_credentials(key)[0])
+
+    def test_user_save_drops_cached_user(self):
+        """Test a deactivation in this process applies at once."""
+        key = tokens.issue_token(self.user)
+        auth = SignedTokenAuthentication()
+        auth.authenticate_credentials(key)
+
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            auth.authenticate_credentials(key)
+
+    def test_legacy_token(self):
+        """Test stored tokens work until legacy tokens are disabled."""
+        token = Token.objects.create(user=self.user)
+        self.authenticate(token.key)
+
+        self.assertEqual(self.client.get(ME_URL).status_code,
+                         status.HTTP_200_OK)
+        with override_settings(TOKEN_ALLOW_LEGACY=False):
+            self.assertEqual(self.client.get(ME_URL).status_code,
+                             status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_legacy_token(self):
+        """Test refreshing a stored token replaces it with a signed one."""
+        token = Token.objects.create(user=self.user)
+        self.authenticate(token.key)
+
+        res = self.client.post(REFRESH_URL)
+
+        self.assertTrue(tokens.is_signed_token(res.data["token"]))
+        self.assertFalse(Token.objects.filter(key=token.key).exists())
@@ -1,13 +1,23 @@
 """
 Tests for the user API.
 """
+from unittest.mock import patch
+
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
 from django.urls import reverse
 
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core.hashers import HashingBusy
+from user.throttles import (
+    LoginEmailRateThrottle,
+    LoginIPRateThrottle,
+)
+
 
 CREATE_USER_URL = reverse("user:create")
 TOKEN_URL = reverse("user:token")
@@ -156,3 +166,66 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(self.user.name, payload["name"])
         self.assertTrue(self.user.check_password(payload["password"]))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+class LoginProtectionTests(TestCase):
+    """Test the cost controls of the token endpoint."""
+
+    def setUp(self):
+        self.client = APIClient()
+        caches["throttle"].clear()
+        self.payload = {"email": "test@example.com", "password": "test-123"}
+        self.user = create_user(**self.payload)
+
+    def test_legacy_hash_upgraded_on_login(self):
+        """Test a PBKDF2 password is rehashed with argon2 on login."""
+        self.user.password = make_password(
+            self.payload["password"], hasher="pbkdf2_sha256",
+        )
+        self.user.save()
+
+        res = self.client.post(TOKEN_URL, self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("argon2$"))
+
+    @patch.object(LoginEmailRateThrottle, "rate", "2/min", create=True)
+    def test_login_throttled_per_email(self):
+        """Test repeated logins for one email are rejected."""
+        for _ in range(2):
+            res = self.client.post(TOKEN_URL, self.payload)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.post(TOKEN_URL, self.payload)
+        other = self.client.post(
+            TOKEN_URL, {"email": "other@example.com", "password": "x"},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(other.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_login_with_list_body_rejected(self):
+        """Test a login body that is not an object is a bad request."""
+        res = self.client.post(TOKEN_URL, [self.payload], format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @patch.object(LoginIPRateThrottle, "rate", "2/min", create=True)
+    def test_login_throttled_per_ip(self):
+        """Test repeated logins from one IP are rejected."""
+        for index in range(2):
+            payload = {"email": f"user{index}@example.com", "password": "x"}
+            self.client.post(TOKEN_URL, payload)
+
+        res = self.client.post(TOKEN_URL, self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @patch("user.serializers.hashing_slot", side_effect=HashingBusy)
+    def test_login_rejected_when_hashing_busy(self, patched_slot):
+        """Test logins are turned away when no hashing slot is free."""
+        res = self.client.post(TOKEN_URL, self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertNotIn("token", res.data)
@@ -0,0 +1,45 @@
+"""
+Throttles for the user API.
+"""
+from django.core.cache import caches
+
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class LoginRateThrottle(SimpleRateThrottle):
+    """Base throttle for login attempts, kept in the local throttle cache."""
+
+    cache = caches["throttle"]
+
+    def get_ident_for(self, request):
+        """Return the identity the attempts are counted against.
+
+        Defaults to the client IP; return None to skip the throttle.
+        """
+        return self.get_ident(request)
+
+    def get_cache_key(self, request, view):
+        ident = self.get_ident_for(request)
+        if not ident:
+            return None
+        return self.cache_format % {"scope": self.scope, "ident": ident}
+
+
+class LoginIPRateThrottle(LoginRateThrottle):
+    """Limit login attempts per client IP."""
+
+    scope = "login_ip"
+
+
+class LoginEmailRateThrottle(LoginRateThrottle):
+    """Limit login attempts per account email."""
+
+    scope = "login_email"
+
+    def get_ident_for(self, request):
+        if not isinstance(request.data, dict):
+            return None
+        email = request.data.get("email")
+        if not isinstance(email, str):
+            return None
+        return email.strip().lower()
@@ -0,0 +1,140 @@
+"""
+Signed, expiring auth tokens.
+
+A token is ``<user id>.<token id>.<issued at>`` signed with the secret key,
+so it is verified without a database query. Revoked token ids are kept in
+a per-process list refreshed incrementally from RevokedToken, so a
+revocation reaches every process within ``TOKEN_REVOCATION_REFRESH``
+seconds.
+"""
+import datetime
+import secrets
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+from django.utils.baseconv import base62
+
+from core.models import RevokedToken
+
+
+SALT = "user.tokens"
+SEPARATOR = ":"
+
+
+def _signer():
+    return signing.Signer(sep=SEPARATOR, salt=SALT)
+
+
+class InvalidToken(Exception):
+    """Token is malformed, tampered with, expired or revoked."""
+
+
+class TokenClaims(namedtuple("TokenClaims", "user_id jti issued_at")):
+    """Contents of a verified token."""
+
+    @property
+    def expires_at(self):
+        return self.issued_at + settings.TOKEN_TTL
+
+
+def is_signed_token(key):
+    """Tell signed tokens apart from stored authtoken keys."""
+    return SEPARATOR in key
+
+
+def issue_token(user):
+    """Return a new signed token for the user."""
+    jti = secrets.token_urlsafe(12)
+    issued_at = base62.encode(int(time.time()))
+    return _signer().sign(f"{user.pk}.{jti}.{issued_at}")
+
+
+def read_token(key):
+    """Return the claims of a valid token or raise InvalidToken."""
+    try:
+        value = _signer().unsign(key)
+        user_id, jti, issued_at = value.split(".")
+        claims = TokenClaims(int(user_id), jti, base62.decode(issued_at))
+    except (signing.BadSignature, ValueError):
+        raise InvalidToken("Invalid token.")
+    if time.time() >= claims.expires_at:
+        raise InvalidToken("Token has expired.")
+    if REVOCATIONS.is_revoked(claims.jti):
+        raise InvalidToken("Token has been revoked.")
+    return claims
+
+
+def revoke_token(claims):
+    """Revoke a token everywhere, and drop revocations that expired."""
+    expires_at = datetime.datetime.fromtimestamp(
+        claims.expires_at, tz=datetime.timezone.utc,
+    )
+    RevokedToken.objects.get_or_create(
+        jti=claims.jti,
+        defaults={"expires_at": expires_at},
+    )
+    RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    REVOCATIONS.add(claims.jti, claims.expires_at)
+
+
+class RevocationList:
+    """In-memory set of revoked, unexpired token ids."""
+
+    # Revocations committed late are still picked up if they are at most
+    # this many seconds older than the previous refresh.
+    overlap = 60
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._revoked = {}
+        self._since = None
+        self._next_refresh = 0
+
+    def add(self, jti, expires_at):
+        """Record a revocation made by this process."""
+        with self._lock:
+            self._revoked[jti] = expires_at
+
+    def is_revoked(self, jti):
+        """Return whether the token id is revoked."""
+        if time.monotonic() >= self._next_refresh:
+            self.refresh()
+        return jti in self._revoked
+
+    def refresh(self):
+        """Load revocations made since the previous refresh."""
+        with self._lock:
+            if time.monotonic() < self._next_refresh:
+                return
+            now = timezone.now()
+            rows = RevokedToken.objects.filter(expires_at__gt=now)
+            if self._since is not None:
+                rows = rows.filter(revoked_at__gte=self._since)
+
+            cutoff = time.time()
+            revoked = {
+                jti: expires_at for jti, expires_at in self._revoked.items()
+                if expires_at > cutoff
+            }
+            for jti, expires_at in rows.values_list("jti", "expires_at"):
+                revoked[jti] = expires_at.timestamp()
+            self._revoked = revoked
+
+            self._since = now - datetime.timedelta(seconds=self.overlap)
+            self._next_refresh = (
+                time.monotonic() + settings.TOKEN_REVOCATION_REFRESH
+            )
+
+    def clear(self):
+        """Forget all revocations and reload them on the next check."""
+        with self._lock:
+            self._revoked = {}
+            self._since = None
+            self._next_refresh = 0
+
+
+REVOCATIONS = RevocationList()
@@ -11,5 +11,30 @@ app_name = "user"
 urlpatterns = [
     path("create/", views.CreateUserView.as_view(), name="create"),
     path("token/", views.CreateTokenView.as_view(), name="token"),
+    path(
+        "token/refresh/",
+        views.RefreshTokenView.as_view(),
+        name="token-refresh",
+    ),
+    path(
+        "token/revoke/",
+        views.RevokeTokenView.as_view(),
+        name="token-revoke",
+    ),
     path('me/', views.ManageUserView.as_view(), name='me'),
+    path(
+        "deletions/",
+        views.DeletionJobListView.as_view(),
+        name="deletions",
+    ),
+    path(
+        "provision/",
+        views.ProvisionUsersView.as_view(),
+        name="provision",
+    ),
+    path(
+        "invite/accept/",
+        views.AcceptInviteView.as_view(),
+        name="invite-accept",
+    ),
 ]
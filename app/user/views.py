@@ -1,14 +1,51 @@
 """
 Views for the user API.
 """
-from rest_framework import generics, authentication, permissions
+from django.conf import settings
+
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+from rest_framework import generics, permissions, status
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from core.deletion import mark_deleted
+from core.idempotency import IDEMPOTENCY_KEY, idempotent
+from core.models import DeletionJob
+from user.authentication import SignedTokenAuthentication
 
+from user.provisioning import provision_users
 from user.serializers import (
     UserSerializer,
     AuthTokenSerializer,
+    DeletionJobSerializer,
+    ProvisionUsersSerializer,
+    AcceptInviteSerializer,
+)
+from user.throttles import (
+    LoginEmailRateThrottle,
+    LoginIPRateThrottle,
 )
+from user.tokens import (
+    TokenClaims,
+    issue_token,
+    revoke_token,
+)
+
+
+def token_response(user):
+    """Return the response body for a newly issued token."""
+    return {"token": issue_token(user), "expires_in": settings.TOKEN_TTL}
+
+
+def revoke(auth):
+    """Revoke the signed token or delete the stored token in use."""
+    if isinstance(auth, TokenClaims):
+        revoke_token(auth)
+    else:
+        auth.delete()
 
 
 class CreateUserView(generics.CreateAPIView):
@@ -22,15 +59,117 @@ class CreateTokenView(ObtainAuthToken):
 
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = [LoginIPRateThrottle, LoginEmailRateThrottle]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(token_response(serializer.validated_data["user"]))
+
+
+class RefreshTokenView(APIView):
+    """Replace the token in use with a new one."""
+
+    authentication_classes = [SignedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    @extend_schema(request=None, responses=OpenApiTypes.OBJECT)
+    def post(self, request):
+        data = token_response(request.user)
+        revoke(request.auth)
+        return Response(data)
+
+
+class RevokeTokenView(APIView):
+    """Revoke the token in use."""
+
+    authentication_classes = [SignedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
 
+    @extend_schema(request=None, responses={204: None})
+    def post(self, request):
+        revoke(request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+
+class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
     """Manage the authenticated user."""
 
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [SignedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
         """Retrieve and return the authenticated user."""
         return self.request.user
+
+    @extend_schema(responses={202: DeletionJobSerializer})
+    def delete(self, request, *args, **kwargs):
+        """Deactivate the user now and purge their data in background.
+
+        The response is the last the user sees of the job, as they can no
+        longer authenticate to list it.
+        """
+        job = mark_deleted(self.get_object())
+        return Response(
+            DeletionJobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
+class DeletionJobListView(generics.ListAPIView):
+    """List the progress of the user's background deletes.
+
+    Tag and component deletes only: deleting the account deactivates the
+    user, whose job is then only shown in the delete response.
+    """
+
+    serializer_class = DeletionJobSerializer
+    authentication_classes = [SignedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        """Return the user's deletes, newest first."""
+        return DeletionJob.objects.filter(
+            user=self.request.user,
+        ).order_by("-id")
+
+
+class ProvisionUsersView(APIView):
+    """Create many users at once (admin only)."""
+
+    authentication_classes = [SignedTokenAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+
+    @extend_schema(
+        request=ProvisionUsersSerializer,
+        responses=OpenApiTypes.OBJECT,
+        parameters=[IDEMPOTENCY_KEY],
+    )
+    @idempotent
+    def post(self, request):
+        serializer = ProvisionUsersSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = provision_users(
+            serializer.validated_data["users"],
+            workers=settings.PROVISION_HASH_WORKERS,
+        )
+        return Response(result.as_dict(), status=status.HTTP_201_CREATED)
+
+
+class AcceptInviteView(APIView):
+    """Set the password of a provisioned user and log them in."""
+
+    throttle_classes = [LoginIPRateThrottle]
+
+    @extend_schema(
+        request=AcceptInviteSerializer,
+        responses=OpenApiTypes.OBJECT,
+    )
+    def post(self, request):
+        serializer = AcceptInviteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data["user"]
+        user.set_password(serializer.validated_data["password"])
+        user.save(update_fields=["password"])
+        return Response(token_response(user))
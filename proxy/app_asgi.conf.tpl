@@ -0,0 +1,9 @@
+proxy_pass              http://app;
+proxy_http_version      1.1;
+proxy_set_header        Connection "";
+proxy_set_header        Host $host;
+proxy_set_header        X-Forwarded-For $proxy_add_x_forwarded_for;
+proxy_set_header        X-Forwarded-Proto $scheme;
+proxy_buffer_size       ${UPSTREAM_BUFFER_SIZE};
+proxy_buffers           ${UPSTREAM_BUFFERS};
+proxy_busy_buffers_size ${UPSTREAM_BUSY_BUFFERS_SIZE};
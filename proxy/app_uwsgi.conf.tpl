@@ -0,0 +1,5 @@
+uwsgi_pass              app;
+include                 /etc/nginx/uwsgi_params;
+uwsgi_buffer_size       ${UPSTREAM_BUFFER_SIZE};
+uwsgi_buffers           ${UPSTREAM_BUFFERS};
+uwsgi_busy_buffers_size ${UPSTREAM_BUSY_BUFFERS_SIZE};
@@ -1,13 +1,54 @@
+upstream app {
+    server ${APP_HOST}:${APP_PORT};
+    # Idle connections kept open to the app, per nginx worker.
+    keepalive ${UPSTREAM_KEEPALIVE};
+    keepalive_timeout ${UPSTREAM_KEEPALIVE_TIMEOUT};
+}
+
 server {
     listen ${LISTEN_PORT};
+    http2 ${HTTP2};
+
+    sendfile on;
+    tcp_nopush on;
+
+    # Keep open file handles and metadata of served files.
+    open_file_cache max=${OPEN_FILE_CACHE_MAX} inactive=60s;
+    open_file_cache_valid 60s;
+    open_file_cache_min_uses 2;
+    open_file_cache_errors on;
+
+    # Collected static files whose name carries a content hash never
+    # change, so clients may keep them for good.
+    location ~* "^/static/static/(.+\.[0-9a-f]{12}\.\w+)$" {
+        alias /vol/static/static/$1;
+        add_header Cache-Control "public, max-age=31536000, immutable";
+        access_log off;
+    }
 
     location /static {
         alias /vol/static;
+        expires ${STATIC_EXPIRES};
+    }
+
+    # Server images are only served through the API, which checks the
+    # owner and names the file in X-Accel-Redirect (MEDIA_ACCEL_PREFIX).
+    location /static/media/ {
+        return 404;
+    }
+
+    location /protected/media/ {
+        internal;
+        alias /vol/static/media/;
+    }
+
+    # Metrics are scraped from the app directly, never through the proxy.
+    location = /metrics {
+        return 404;
     }
 
     location / {
-        uwsgi_pass              ${APP_HOST}:${APP_PORT};
-        include                 /etc/nginx/uwsgi_params;
+        include                 /etc/nginx/app_server.conf;
         client_max_body_size    10M;
     }
-}
\ No newline at end of file
+}
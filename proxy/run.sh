@@ -2,5 +2,12 @@
 
 set -e
 
-envsubst < /etc/nginx/default.conf.tpl > /etc/nginx/conf.d/default.conf
-nginx -g 'daemon off;'
\ No newline at end of file
+# Only substitute our variables so nginx variables such as $host survive.
+envsubst '${LISTEN_PORT} ${HTTP2} ${APP_HOST} ${APP_PORT}
+          ${UPSTREAM_KEEPALIVE} ${UPSTREAM_KEEPALIVE_TIMEOUT}
+          ${OPEN_FILE_CACHE_MAX} ${STATIC_EXPIRES}' \
+    < /etc/nginx/default.conf.tpl > /etc/nginx/conf.d/default.conf
+envsubst '${UPSTREAM_BUFFER_SIZE} ${UPSTREAM_BUFFERS}
+          ${UPSTREAM_BUSY_BUFFERS_SIZE}' \
+    < "/etc/nginx/app_${APP_SERVER}.conf.tpl" > /etc/nginx/app_server.conf
+nginx -g 'daemon off;'
@@ -2,8 +2,68 @@
 
 set -e
 
-python manage.py wait_for_db
-python manage.py collectstatic --noinput
-python manage.py migrate
+# Waits for the database, then runs collectstatic and migrate only when
+# the static files or the migration plan changed.
+python manage.py prestart
 
-uwsgi --socket :9000 --workers 4 --master --enable-threads --module app.wsgi
\ No newline at end of file
+# The change event stream (server.events) is served by run_asgi.sh only;
+# uwsgi deployments have the change feed but no stream.
+
+# Size uwsgi from the machine unless overridden in the environment.
+# uwsgi reads the exported UWSGI_* variables as options.
+# nproc counts the CPUs of the host, so cap it with the cgroup CPU quota,
+# read like the memory limit ("max" or "<quota> <period>").
+CPU_COUNT=$(nproc)
+CPU_LIMIT=$(cat /sys/fs/cgroup/cpu.max 2>/dev/null || \
+    echo "$(cat /sys/fs/cgroup/cpu/cpu.cfs_quota_us 2>/dev/null)" \
+        "$(cat /sys/fs/cgroup/cpu/cpu.cfs_period_us 2>/dev/null)")
+set -- $CPU_LIMIT
+case "$1:$2" in
+    *[!0-9:]*|:*|*:) ;;
+    *)
+        if [ "$2" -gt 0 ]; then
+            CPU_QUOTA=$((($1 + $2 - 1) / $2))
+            if [ "$CPU_QUOTA" -lt "$CPU_COUNT" ]; then
+                CPU_COUNT=$CPU_QUOTA
+            fi
+        fi
+        ;;
+esac
+MEMORY_LIMIT=$(cat /sys/fs/cgroup/memory.max 2>/dev/null || \
+    cat /sys/fs/cgroup/memory/memory.limit_in_bytes 2>/dev/null || \
+    echo max)
+PROCESSES=$((CPU_COUNT * 2 + 1))
+case "$MEMORY_LIMIT" in
+    ''|*[!0-9]*) ;;
+    *)
+        MEMORY_WORKERS=$((MEMORY_LIMIT / 1048576 / ${WORKER_MEMORY_MB:-128}))
+        if [ "$MEMORY_WORKERS" -lt "$PROCESSES" ]; then
+            PROCESSES=$MEMORY_WORKERS
+        fi
+        ;;
+esac
+if [ "$PROCESSES" -lt 1 ]; then
+    PROCESSES=1
+fi
+
+export UWSGI_PROCESSES=${UWSGI_PROCESSES:-$PROCESSES}
+export UWSGI_THREADS=${UWSGI_THREADS:-2}
+export UWSGI_MAX_REQUESTS=${UWSGI_MAX_REQUESTS:-5000}
+export UWSGI_RELOAD_ON_RSS=${UWSGI_RELOAD_ON_RSS:-${WORKER_MEMORY_MB:-128}}
+export UWSGI_LISTEN=${UWSGI_LISTEN:-128}
+export UWSGI_HARAKIRI=${UWSGI_HARAKIRI:-30}
+# Bound on all interfaces so an exporter container on the same network
+# can read it; the port is not published outside that network.
+export UWSGI_STATS=${UWSGI_STATS:-:9191}
+# Plain HTTP listener for scraping /metrics on the deployment's network,
+# also not published; the proxy only forwards the uwsgi socket.
+export UWSGI_HTTP_SOCKET=${UWSGI_HTTP_SOCKET:-:9100}
+
+# Workers write their metrics here for /metrics to add up; emptied on
+# start, as a restarted app begins its series again.
+export METRICS_DIR=${METRICS_DIR:-/vol/metrics}
+mkdir -p "$METRICS_DIR"
+rm -f "$METRICS_DIR"/*.json
+
+echo "Starting uwsgi with $UWSGI_PROCESSES processes x $UWSGI_THREADS threads"
+uwsgi --ini /scripts/uwsgi.ini
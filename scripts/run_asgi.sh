@@ -0,0 +1,38 @@
+#!/bin/sh
+
+# ASGI deployment: serve app.asgi with uvicorn instead of uwsgi. Request
+# bodies are read by the event loop and the I/O-bound endpoints run in a
+# thread pool (ASYNC_VIEWS), so slow clients do not hold a worker each.
+# Point the proxy at it with APP_SERVER=asgi.
+
+set -e
+
+python manage.py prestart
+
+export ASYNC_VIEWS=${ASYNC_VIEWS:-1}
+
+# Workers write their metrics here for /metrics, on ASGI_PORT, to add up.
+export METRICS_DIR=${METRICS_DIR:-/vol/metrics}
+mkdir -p "$METRICS_DIR"
+rm -f "$METRICS_DIR"/*.json
+
+# The change event stream (server.events) fans out within one process, so
+# a stream only sees the writes of its own worker: run one worker while
+# the stream is on, and refuse more. An empty EVENTS_PATH turns it off.
+ASGI_WORKERS=${ASGI_WORKERS:-1}
+if [ -n "${EVENTS_PATH-/api/server/events/}" ] && [ "$ASGI_WORKERS" != 1 ]
+then
+    echo "ASGI_WORKERS=$ASGI_WORKERS needs the event stream off:" \
+        "set EVENTS_PATH= to run more than one worker." >&2
+    exit 1
+fi
+
+exec uvicorn app.asgi:application \
+    --host 0.0.0.0 \
+    --port "${ASGI_PORT:-9000}" \
+    --workers "$ASGI_WORKERS" \
+    --proxy-headers \
+    --forwarded-allow-ips "${ASGI_FORWARDED_ALLOW_IPS:-*}" \
+    --limit-concurrency "${ASGI_LIMIT_CONCURRENCY:-1000}" \
+    --backlog "${ASGI_BACKLOG:-2048}" \
+    --timeout-keep-alive "${ASGI_KEEPALIVE:-5}"